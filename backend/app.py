@@ -1,28 +1,81 @@
 from flask import Flask
-from backend.extensions import db
+from backend.extensions import db, cache, cors
+from backend.bus import bus
+from backend.slotInventory import slot_inventory
+from backend.authCache import token_cache
+from backend.passwords import password_hasher
+from backend.metrics import request_metrics
+from backend.jsonProvider import FastJSONProvider
+from backend.slowQueries import slow_query_log
+from backend.createData import seed_command
+from backend.syntheticData import generate_data_command
+from backend.indexes import ensure_indexes_command
+from backend.stats import reconcile_stats_command
+from backend.searchIndex import rebuild_search_index_command
+from backend.schedules import extend_schedules_command
+from backend.jobs import celery_init_app
 from backend.models import User, Role
 from backend.config import LocalDevelopmentConfig
 from flask_security import Security, SQLAlchemyUserDatastore
+import os
+import weakref
 
-app = None
+_apps = weakref.WeakSet()
 
-def start():
+def create_app(config=LocalDevelopmentConfig):
+    """Builds a configured app without touching the database; run
+    `flask seed` once to create the schema and sample data."""
     app = Flask(__name__, static_folder='static', static_url_path='/static')
-    app.config.from_object(LocalDevelopmentConfig)
+    app.config.from_object(config)
+    # Flask-Security wraps whatever class is set here with its own provider
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    # First, so its timing covers the other request hooks
+    request_metrics.init_app(app)
     db.init_app(app)
+    slow_query_log.init_app(app)
+    cache.init_app(app)
+    cors.init_app(app)
+    bus.init_app(app)
+    slot_inventory.init_app(app, bus)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(generate_data_command)
+    app.cli.add_command(ensure_indexes_command)
+    app.cli.add_command(reconcile_stats_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(extend_schedules_command)
+    celery_init_app(app)
     datastore = SQLAlchemyUserDatastore(db, User, Role)
     app.security = Security(app, datastore)
-    app.app_context().push()
-    
+    token_cache.init_app(app, bus)
+    password_hasher.init_app(app)
+    register_routes(app)
+    _apps.add(app)
     return app
-    
-app = start()
 
-from backend.createData import *
-from backend.routes.authRoutes import *   
-from backend.routes.adminRoutes import *   
-from backend.routes.patientRoutes import *   
-from backend.routes.doctorRoutes import *   
+def register_routes(app):
+    from backend.routes import authRoutes, adminRoutes, patientRoutes, doctorRoutes
+    for module in (authRoutes, adminRoutes, patientRoutes, doctorRoutes):
+        app.register_blueprint(module.bp)
+
+def _after_fork():
+    # A forked child (gunicorn --preload, Celery prefork) inherits the parent's
+    # pooled connections and the state of its threads; neither may be used.
+    # close=False leaves the sockets to the parent instead of shutting them.
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+    password_hasher.after_fork()
+    bus.after_fork()
+    request_metrics.after_fork()
+    slow_query_log.after_fork()
+
+os.register_at_fork(after_in_child=_after_fork)
+
+# WSGI entry point for gunicorn (backend.app:app), `flask` and the Celery
+# worker. Every request pushes its own app context and gets its own session.
+app = create_app()
 
 if __name__ == '__main__':
-    app.run()
\ No newline at end of file
+    app.run()
@@ -0,0 +1,234 @@
+from flask import current_app, g
+from flask_security.utils import get_request_attr, set_request_attr
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from collections import OrderedDict
+from .extensions import db
+from .models import User, Role, UserRoles
+import threading
+import time as clock
+
+TOPIC = 'auth_cache'
+
+_USER_COLUMNS = [column.key for column in inspect(User).column_attrs]
+_ROLE_COLUMNS = [column.key for column in inspect(Role).column_attrs]
+
+class TokenCache:
+    """Bounded LRU map from an already verified auth token (or signed session
+    identity) to a snapshot of its user and roles. Entries expire after
+    AUTH_CACHE_TTL seconds, or when the token itself does
+    (SECURITY_TOKEN_MAX_AGE), and are dropped whenever the user logs out or
+    their row or roles change. Drops reach other workers only over a shared
+    bus; without one, several workers keep entries for AUTH_CACHE_UNSHARED_TTL.
+
+    The cache wraps the request and user loaders Flask-Security registers with
+    Flask-Login, so a miss is verified by exactly the code that runs without
+    it."""
+
+    def __init__(self):
+        self.bus = None
+        self._verify_request = None
+        self._verify_session = None
+        self.ttl = 300
+        self.maxsize = 10000
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._entries = OrderedDict()  # token -> (expires_at, user snapshot)
+        self._lock = threading.Lock()
+
+    def init_app(self, app, bus):
+        self.bus = bus
+        self.ttl = app.config.get('AUTH_CACHE_TTL', 300)
+        if not bus.shared and app.config.get('WEB_CONCURRENCY', 1) > 1:
+            # Other workers never hear of a logout or role change, so only the
+            # TTL bounds how long they keep accepting the old identity
+            self.ttl = min(self.ttl, app.config.get('AUTH_CACHE_UNSHARED_TTL', 5))
+        self.maxsize = app.config.get('AUTH_CACHE_SIZE', 10000)
+        bus.subscribe(TOPIC, self._on_message, reset=self.clear)
+        # Must run after Security(app), whose loaders these become
+        self._verify_request = app.login_manager.request_callback
+        self._verify_session = app.login_manager.user_callback
+        app.login_manager.request_loader(self._load_user)
+        app.login_manager.user_loader(self._load_session_user)
+        app.extensions['auth_cache'] = self
+
+    def get(self, token):
+        now = clock.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] < now:
+                self._entries.pop(token, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token, user, generation=None):
+        lifetime = min(self.ttl, _token_lifetime(token))
+        if lifetime <= 0:
+            return
+        snapshot = (
+            {key: getattr(user, key) for key in _USER_COLUMNS},
+            [{key: getattr(role, key) for key in _ROLE_COLUMNS} for role in user.roles],
+            {}  # profile ids resolved for this token, see backend.profiles
+        )
+        with self._lock:
+            # A user invalidated while we were verifying may have been read
+            # before the change committed, so skip caching that result
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[token] = (clock.monotonic() + lifetime, snapshot)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def profile(self, token, kind):
+        with self._lock:
+            entry = self._entries.get(token)
+            return entry[1][2].get(kind) if entry else None
+
+    def remember_profile(self, token, kind, profile_id):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry:
+                entry[1][2][kind] = profile_id
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id):
+        """Drops every cached token of a user, in this and every other worker."""
+        self.bus.publish(TOPIC, {'user_id': user_id})
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
+
+    def _on_message(self, message):
+        with self._lock:
+            self._generation += 1
+            stale = [token for token, (_, (user, _, _)) in self._entries.items() if user['id'] == message['user_id']]
+            for token in stale:
+                del self._entries[token]
+            self.invalidations += 1
+
+    def _load_user(self, request):
+        """Flask-Login request loader: serves cached identities and falls back
+        to Flask-Security's own token verification on a miss."""
+        token = _header_token(request)
+        if not token or get_request_attr('fs_authn_via') == 'token':
+            return self._verify_request(request)
+
+        snapshot = self.get(token)
+        if snapshot is not None:
+            set_request_attr('fs_authn_via', 'token')
+            g.auth_cache_key = token
+            return _attach(snapshot)
+
+        generation = self._generation
+        user = self._verify_request(request)
+        if get_request_attr('fs_authn_via') == 'token':
+            g.auth_cache_key = token
+            self.put(token, user, generation)
+        return user
+
+    def _load_session_user(self, user_id):
+        """Flask-Login session loader. Browsers send the session cookie set at
+        login along with the token, so this path is cached the same way, keyed
+        by the fs_uniquifier the signed cookie carries."""
+        key = ('session', user_id)
+        snapshot = self.get(key)
+        if snapshot is not None:
+            set_request_attr('fs_authn_via', 'session')
+            g.auth_cache_key = key
+            return _attach(snapshot)
+
+        generation = self._generation
+        user = self._verify_session(user_id)
+        if user is not None:
+            g.auth_cache_key = key
+            self.put(key, user, generation)
+        return user
+
+def _header_token(request):
+    """The token of the Auth-Token header, when that is the only token the
+    request carries. Requests that also send one in the query string or JSON
+    body go uncached, leaving Flask-Security to decide which one counts."""
+    security = current_app.security
+    key = security.token_authentication_key
+    if key in request.args:
+        return None
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and key in data:
+            return None
+    return request.headers.get(security.token_authentication_header)
+
+def _token_lifetime(token):
+    """Seconds until a token passes SECURITY_TOKEN_MAX_AGE (infinite for
+    session keys or when tokens never expire); read from the signed issue
+    time, so the cache never outlives the token."""
+    max_age = current_app.config.get('SECURITY_TOKEN_MAX_AGE')
+    if not max_age or not isinstance(token, str):
+        return float('inf')
+    try:
+        _, issued_at = current_app.security.remember_token_serializer.loads(token, return_timestamp=True)
+    except Exception:
+        return 0
+    return issued_at.timestamp() + max_age - clock.time()
+
+def _attach(snapshot):
+    """Rebuilds the cached user as a detached instance and merges it into the
+    request session without emitting any SQL."""
+    user_data, roles_data, _ = snapshot
+    user = User(**user_data)
+    make_transient_to_detached(user)
+    roles = []
+    for role_data in roles_data:
+        role = Role(**role_data)
+        make_transient_to_detached(role)
+        roles.append(role)
+    set_committed_value(user, 'roles', roles)
+    return db.session.merge(user, load=False)
+
+token_cache = TokenCache()
+
+# --- Invalidation on user and role changes
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('auth_cache_users', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and (obj in session.deleted or session.is_modified(obj)):
+            changed.add(obj.id)
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, UserRoles):
+            changed.add(obj.user_id)
+    # Drop now so no request in this worker keeps serving the old identity...
+    for user_id in changed:
+        token_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    # ...and again once committed, in case a concurrent miss re-cached the
+    # pre-commit row in between
+    for user_id in session.info.pop('auth_cache_users', ()):
+        token_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('auth_cache_users', None)
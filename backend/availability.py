@@ -0,0 +1,74 @@
+from sqlalchemy import delete, or_, select
+from .extensions import db
+from .models import Appointment, DoctorAvailability
+from .upsert import dialect_insert
+
+class SlotConflict(Exception):
+    """Raised when a write would remove slots that still hold a booking."""
+
+    def __init__(self, slots):
+        super().__init__("Cannot remove slots that already hold a booking")
+        self.slots = slots  # [(date, start_time), ...]
+
+def sync_availability(doctor_id, slots, window_start, window_end, removable=None):
+    """Makes the doctor's availability match `slots`, a list of
+    (date, start_time, end_time), by writing only the difference.
+
+    Existing slots dated window_start..window_end that are missing from `slots`
+    are deleted, or only those for which removable(date, start_time, end_time)
+    is true when given; submitted slots are inserted, or updated in place through
+    ON CONFLICT on unique_doctor_slot, so untouched rows keep their ids.
+    Raises SlotConflict, writing nothing, when a slot to delete is booked.
+    Returns the number of rows inserted, updated, deleted and left unchanged.
+    Runs on the session's connection; the caller commits."""
+    conn = db.session.connection()
+    table = DoctorAvailability.__table__
+    desired = {(day, start): end for day, start, end in slots}
+
+    existing = {
+        (row.date, row.start_time): row
+        for row in conn.execute(select(table.c.id, table.c.date, table.c.start_time, table.c.end_time, table.c.is_available).where(
+            table.c.doctor_id == doctor_id,
+            or_(
+                table.c.date.between(window_start, window_end),
+                table.c.date.in_({day for day, _ in desired})
+            )
+        ))
+    }
+
+    removed = [
+        key for key, row in existing.items()
+        if key not in desired and window_start <= key[0] <= window_end and (removable is None or removable(*key, row.end_time))
+    ]
+    inserted = [key for key in desired if key not in existing]
+    updated = [key for key in desired if key in existing and (existing[key].end_time != desired[key] or not existing[key].is_available)]
+
+    if removed:
+        booked = conn.execute(select(Appointment.date, Appointment.time).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.status == 'Booked',
+            Appointment.date.in_({day for day, _ in removed}),
+            Appointment.time.in_({start for _, start in removed})
+        )).all()
+        booked = sorted(set(booked) & set(removed))
+        if booked:
+            raise SlotConflict(booked)
+        conn.execute(delete(table).where(table.c.id.in_([existing[key].id for key in removed])))
+
+    if inserted or updated:
+        stmt = dialect_insert(conn, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['doctor_id', 'date', 'start_time'],
+            set_={'end_time': stmt.excluded.end_time, 'is_available': stmt.excluded.is_available}
+        )
+        conn.execute(stmt, [
+            {'doctor_id': doctor_id, 'date': day, 'start_time': start, 'end_time': desired[(day, start)], 'is_available': True}
+            for day, start in inserted + updated
+        ])
+
+    return {
+        'inserted': len(inserted),
+        'updated': len(updated),
+        'deleted': len(removed),
+        'unchanged': len(desired) - len(inserted) - len(updated)
+    }
@@ -0,0 +1,106 @@
+from sqlalchemy import literal, select, update
+from .extensions import db
+from .models import Appointment, DoctorAvailability
+from .upsert import dialect_insert
+from . import stats
+from datetime import datetime
+
+class SlotTaken(Exception):
+    """The slot already holds a Booked or Completed appointment."""
+
+    def __init__(self, status):
+        super().__init__("This slot is already completed" if status == 'Completed' else "Time slot already booked")
+        self.status = status
+
+class SlotNotOffered(Exception):
+    """The doctor has no open availability at that date and time."""
+
+    def __init__(self):
+        super().__init__("Doctor not available at this time")
+
+class NotBooked(Exception):
+    """The appointment is no longer Booked."""
+
+    def __init__(self):
+        super().__init__("Can only reschedule booked appointments")
+
+def book_slot(patient_id, doctor_id, day, slot_time, reason, deltas=None):
+    """Books a slot without a read-check-write race and returns the
+    appointment id. Raises SlotTaken or SlotNotOffered instead of failing on
+    the unique constraint when requests collide.
+
+    A fresh slot is claimed with one INSERT ... SELECT from the open
+    availability row, ON CONFLICT DO NOTHING on unique_doctor_appointment. If
+    an appointment row already holds the slot, it is taken over only when
+    Cancelled, with an UPDATE conditioned on the status and patient that were
+    read, so at most one of any number of racing requests can win. Runs on the
+    session's connection; the caller commits. `deltas` collects the counter
+    changes instead of applying them (see stats.appointment_booked)."""
+    conn = db.session.connection()
+    table = Appointment.__table__
+    availability = DoctorAvailability.__table__
+    now = datetime.now()
+
+    claim = dialect_insert(conn, table).from_select(
+        ['patient_id', 'doctor_id', 'date', 'time', 'reason', 'status', 'created_at', 'updated_at'],
+        select(
+            literal(patient_id), availability.c.doctor_id, availability.c.date, availability.c.start_time,
+            literal(reason), literal('Booked'), literal(now), literal(now)
+        ).where(
+            availability.c.doctor_id == doctor_id,
+            availability.c.date == day,
+            availability.c.start_time == slot_time,
+            availability.c.is_available == True
+        )
+    ).on_conflict_do_nothing(index_elements=['doctor_id', 'date', 'time']).returning(table.c.id)
+    row = conn.execute(claim).first()
+    if row:
+        stats.appointment_booked(conn, doctor_id, day, patient_id, deltas=deltas)
+        return row.id
+
+    existing = conn.execute(select(table.c.id, table.c.status, table.c.patient_id).where(
+        table.c.doctor_id == doctor_id,
+        table.c.date == day,
+        table.c.time == slot_time
+    )).first()
+    if existing is None:
+        raise SlotNotOffered()
+    if existing.status != 'Cancelled':
+        raise SlotTaken(existing.status)
+
+    # Reactivate the cancelled appointment, unless someone else just did
+    reactivated = conn.execute(update(table).where(
+        table.c.id == existing.id,
+        table.c.status == 'Cancelled',
+        table.c.patient_id == existing.patient_id
+    ).values(status='Booked', patient_id=patient_id, reason=reason, updated_at=now))
+    if reactivated.rowcount != 1:
+        raise SlotTaken('Booked')
+    stats.appointment_booked(conn, doctor_id, day, patient_id, previous=('Cancelled', existing.patient_id), deltas=deltas)
+    return existing.id
+
+def reschedule(appointment, day, slot_time):
+    """Moves a Booked appointment to another slot of its doctor and returns
+    the id of the appointment now holding that slot.
+
+    The new slot is claimed with book_slot, so it must be offered and a
+    Cancelled appointment holding it is taken over, exactly as for a new
+    booking. The old appointment is then cancelled with an UPDATE conditioned
+    on it still being Booked, which frees its slot. The counter changes of
+    both writes are applied together, so a move within one day leaves them
+    untouched. Raises SlotTaken, SlotNotOffered or NotBooked. Runs on the
+    session's connection; the caller commits."""
+    deltas = stats.Deltas()
+    appointment_id = book_slot(appointment.patient_id, appointment.doctor_id, day, slot_time, appointment.reason, deltas=deltas)
+
+    conn = db.session.connection()
+    table = Appointment.__table__
+    cancelled = conn.execute(update(table).where(
+        table.c.id == appointment.id,
+        table.c.status == 'Booked'
+    ).values(status='Cancelled', updated_at=datetime.now()))
+    if cancelled.rowcount != 1:
+        raise NotBooked()
+    stats.appointment_cancelled(conn, appointment.doctor_id, appointment.date, appointment.patient_id, deltas=deltas)
+    stats.apply_deltas(conn, deltas)
+    return appointment_id
@@ -0,0 +1,93 @@
+from collections import defaultdict
+import json
+import threading
+import time as clock
+import uuid
+import redis
+
+class LocalBus:
+    """Message bus used to keep per-worker caches in step. Handlers in this
+    process run as soon as a message is published; with BUS_REDIS_URL set,
+    messages also go out over Redis pub/sub to every other worker, where a
+    listener thread hands them to the same handlers. Messages are plain
+    JSON-friendly dicts."""
+
+    def __init__(self):
+        self.redis_url = None
+        self.channel = 'bus'
+        self._subscribers = defaultdict(list)
+        self._resets = []
+        self._client = None
+        self._origin = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.redis_url = app.config.get('BUS_REDIS_URL')
+        self.channel = app.config.get('CACHE_KEY_PREFIX', '') + 'bus'
+        if self.redis_url:
+            self._start()
+
+    def after_fork(self):
+        """A forked worker needs its own connection and listener thread."""
+        if self.redis_url:
+            self._start()
+
+    @property
+    def shared(self):
+        """True when messages reach the other workers too."""
+        return self._client is not None
+
+    def subscribe(self, topic, handler, reset=None):
+        """`reset` is called instead of `handler` when messages from other
+        workers may have been lost (Redis connection dropped)."""
+        with self._lock:
+            if handler not in self._subscribers[topic]:
+                self._subscribers[topic].append(handler)
+            if reset is not None and reset not in self._resets:
+                self._resets.append(reset)
+
+    def publish(self, topic, message):
+        self._deliver(topic, message)
+        if self._client is not None:
+            envelope = json.dumps({'origin': self._origin, 'topic': topic, 'message': message})
+            try:
+                self._client.publish(self.channel, envelope)
+            except redis.RedisError as e:
+                # Other workers fall back on their cache TTLs
+                print(f"Error publishing {topic} message: {str(e)}")
+
+    def _deliver(self, topic, message):
+        with self._lock:
+            handlers = list(self._subscribers[topic])
+        for handler in handlers:
+            handler(message)
+
+    def _reset(self):
+        with self._lock:
+            resets = list(self._resets)
+        for reset in resets:
+            reset()
+
+    def _start(self):
+        self._origin = uuid.uuid4().hex
+        self._client = redis.Redis.from_url(self.redis_url)
+        threading.Thread(target=self._listen, args=(self._client, self._origin), name='bus-listener', daemon=True).start()
+
+    def _listen(self, client, origin):
+        missed = False
+        while client is self._client:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                if missed:
+                    self._reset()
+                    missed = False
+                for item in pubsub.listen():
+                    envelope = json.loads(item['data'])
+                    if envelope['origin'] != origin:
+                        self._deliver(envelope['topic'], envelope['message'])
+            except Exception:
+                missed = True
+                clock.sleep(1)
+
+bus = LocalBus()
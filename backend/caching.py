@@ -0,0 +1,64 @@
+from flask import request, make_response
+from functools import wraps
+from .extensions import cache
+import uuid
+
+# Tag-based invalidation on top of Flask-Caching. Every cache key embeds the
+# current version of each tag it depends on; invalidating a tag replaces its
+# version, so every entry built under the old one is never read again and
+# simply ages out. This works the same on SimpleCache and on Redis, where the
+# versions are shared by all workers.
+
+# Response headers worth replaying from the cache (paging headers included)
+_KEPT_HEADERS = ('Content-Type', 'X-Next-Cursor', 'X-Total-Count', 'Link')
+
+def _tag_versions(tags):
+    keys = [f'tag:{tag}' for tag in tags]
+    versions = cache.get_many(*keys)
+    for i, version in enumerate(versions):
+        if version is None:
+            # Never derive a missing version deterministically: an evicted tag
+            # must not resurrect entries stored under its previous version
+            cache.add(keys[i], uuid.uuid4().hex, timeout=0)
+            versions[i] = cache.get(keys[i])
+    return ':'.join(f'{tag}={version}' for tag, version in zip(tags, versions))
+
+def invalidate(*tags):
+    cache.set_many({f'tag:{tag}': uuid.uuid4().hex for tag in tags}, timeout=0)
+
+def cached_response(*tags, timeout=None):
+    """Caches successful GET responses of a view, keyed by endpoint, view
+    arguments and query string. Place it below the auth decorators so access
+    checks still run on every request."""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated_view(*args, **kwargs):
+            if request.method != 'GET':
+                return fn(*args, **kwargs)
+            query = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+            key = f'view:{request.endpoint}:{sorted(kwargs.items())}:{query}:{_tag_versions(tags)}'
+            hit = cache.get(key)
+            if hit is not None:
+                body, status, headers = hit
+                return make_response(body, status, headers)
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+                cache.set(key, (response.get_data(), response.status_code, headers), timeout=timeout)
+            return response
+        return decorated_view
+    return wrapper
+
+def cached_result(*tags, timeout=None):
+    """Caches the return value of a function by its arguments."""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated(*args):
+            key = f'fn:{fn.__module__}.{fn.__name__}:{args!r}:{_tag_versions(tags)}'
+            value = cache.get(key)
+            if value is None:
+                value = fn(*args)
+                cache.set(key, value, timeout=timeout)
+            return value
+        return decorated
+    return wrapper
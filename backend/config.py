@@ -1,8 +1,75 @@
+from celery.schedules import crontab
 import os
 
 class Config():
     DEBUG = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Seconds a worker trusts its in-memory slot inventory before reloading a day
+    SLOT_INVENTORY_TTL = 60
+    # Keyset pagination on list endpoints
+    PAGE_SIZE_DEFAULT = 100
+    PAGE_SIZE_MAX = 500
+    # Cross-origin API access (Flask-CORS). The bundled frontend is same-origin
+    # behind its dev proxy and rewrites; other origins need the pagination
+    # headers exposed to read past the first page
+    CORS_RESOURCES = r'/api/*'
+    CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:5173').split(',')
+    CORS_EXPOSE_HEADERS = ['X-Next-Cursor', 'Link', 'X-Total-Count']
+    # Rows fetched and written per batch by ?format=ndjson listings
+    STREAM_BATCH_SIZE = 500
+    # Results returned by the admin patient search unless ?limit= asks otherwise
+    SEARCH_LIMIT_DEFAULT = 50
+    # Days ahead that template changes and `flask extend-schedules` materialize
+    SCHEDULE_HORIZON_DAYS = 28
+    # Redis shared by all workers: response/result cache, job results and the
+    # cache-invalidation bus unless those are configured separately
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    # Background jobs (backend.jobs). Without a broker, tasks run eagerly in
+    # the web process and the submitting request gets the result; the job
+    # endpoints find it later through CACHE_REDIS_URL, or else only in the
+    # worker that ran it.
+    CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL')
+    CELERY = dict(
+        broker_url=CELERY_BROKER_URL or 'memory://',
+        result_backend=os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL or CACHE_REDIS_URL or 'cache+memory://'),
+        task_always_eager=not CELERY_BROKER_URL,
+        task_store_eager_result=True,
+        result_expires=24 * 3600,
+        beat_schedule={
+            'reconcile-stats-nightly': {'task': 'recompute.stats', 'schedule': crontab(hour=3, minute=0)},
+            'extend-schedules-nightly': {'task': 'recompute.schedules', 'schedule': crontab(hour=3, minute=30)},
+        },
+    )
+    # Response/result cache; per worker without CACHE_REDIS_URL
+    CACHE_TYPE = 'RedisCache' if CACHE_REDIS_URL else 'SimpleCache'
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_KEY_PREFIX = 'curanet:'
+    # Cache invalidations (auth tokens, slot inventory) reach other workers over
+    # Redis pub/sub when set; otherwise they stay in the worker that made them
+    BUS_REDIS_URL = os.environ.get('BUS_REDIS_URL', CACHE_REDIS_URL)
+    # Web worker processes; gunicorn.conf.py exports it
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+    # Verified auth tokens kept in memory per worker; dropped on logout and user or role changes
+    AUTH_CACHE_TTL = 300
+    # Used instead when several workers run without BUS_REDIS_URL
+    AUTH_CACHE_UNSHARED_TTL = 5
+    AUTH_CACHE_SIZE = 10000
+    # bcrypt cost; raising or lowering it rehashes each password at its next login
+    SECURITY_PASSWORD_HASH_PASSLIB_OPTIONS = {'bcrypt__rounds': int(os.environ.get('BCRYPT_ROUNDS', 12))}
+    # Hashing pool (backend.passwords); 0 workers hashes in the request thread
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+    # Per-endpoint request, latency and SQL metrics at /api/admin/metrics
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    # Statements slower than this are kept with their plan at /api/admin/slow-queries (0 turns it off)
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_LOG_SIZE = 100
+    SLOW_QUERY_EXPLAIN = True
+    # Parameters bound to these columns are never stored with a slow query
+    SLOW_QUERY_REDACT = ('name', 'email', 'phone', 'address', 'pincode', 'password', 'fs_uniquifier', 'date_of_birth',
+                         'gender', 'blood_group', 'medical_history', 'emergency_contact', 'reason', 'diagnosis',
+                         'prescription', 'notes')
     
 class LocalDevelopmentConfig(Config):
     # Use the DATABASE_URL environment variable if it exists (Production), 
@@ -1,51 +1,63 @@
 from flask import current_app as app
+from flask.cli import with_appcontext
 from flask_security import hash_password
 from .extensions import db
-from .models import Department, Doctor, Patient, DoctorAvailability
+from .models import Department, Doctor, Patient, ScheduleTemplate
+from .indexes import ensure_indexes
+from .stats import ensure_stats
+from .searchIndex import ensure_search_index
+from .schedules import rematerialize
 from datetime import date, time, timedelta
+import click
 
-with app.app_context():
+DEPARTMENTS = [
+    ('Cardiology', 'Heart and cardiovascular diseases'),
+    ('Neurology', 'Nervous system disorders'),
+    ('Orthopedics', 'Bone and joint diseases'),
+    ('Pediatrics', 'Child healthcare'),
+]
+
+def seed():
+    """Creates the schema, roles, departments and the sample accounts that
+    are missing. Safe to run any number of times; on a seeded database it only
+    runs the existence checks."""
     db.create_all()
-    
+    # create_all() skips indexes on tables that already exist
+    ensure_indexes()
+    ensure_stats()
+    ensure_search_index()
+
     app.security.datastore.find_or_create_role(name='admin', description = 'admin')
     app.security.datastore.find_or_create_role(name='patient', description = 'patient')
     app.security.datastore.find_or_create_role(name='doctor', description = 'doctor')
     db.session.commit()
-    
+
     # Create departments if not exist
-    if not Department.query.filter_by(name='Cardiology').first():
-        cardiology = Department(name='Cardiology', description='Heart and cardiovascular diseases')
-        db.session.add(cardiology)
-    if not Department.query.filter_by(name='Neurology').first():
-        neurology = Department(name='Neurology', description='Nervous system disorders')
-        db.session.add(neurology)
-    if not Department.query.filter_by(name='Orthopedics').first():
-        orthopedics = Department(name='Orthopedics', description='Bone and joint diseases')
-        db.session.add(orthopedics)
-    if not Department.query.filter_by(name='Pediatrics').first():
-        pediatrics = Department(name='Pediatrics', description='Child healthcare')
-        db.session.add(pediatrics)
+    existing = {name for (name,) in db.session.query(Department.name)}
+    for name, description in DEPARTMENTS:
+        if name not in existing:
+            db.session.add(Department(name=name, description=description))
     db.session.commit()
-    
+
     # Create Admin if not exist
     if not app.security.datastore.find_user(email= 'admin@gmail.com'):
         admin_user = app.security.datastore.create_user(
             email='admin@gmail.com',
-            name='Admin', 
-            password=hash_password('helloadmin'), 
+            name='Admin',
+            password=hash_password('helloadmin'),
             roles=['admin'],
             active=True
         )
         db.session.commit()
-    
+
     # Create sample patient
     if not app.security.datastore.find_user(email= 'ram@gmail.com'):
         user = app.security.datastore.create_user(
             email='ram@gmail.com',
-            name='Ram Kumar', 
-            password=hash_password('ram123'), 
-            address="Delhi", 
-            pincode="000001", 
+            name='Ram Kumar',
+            password=hash_password('ram123'),
+            address="Delhi",
+            pincode="000001",
             roles=['patient'],
             active=True
         )
@@ -53,35 +65,35 @@ with app.app_context():
         patient = Patient(user_id=user.id, date_of_birth=date(1990, 1, 1), gender='Male', blood_group='O+')
         db.session.add(patient)
         db.session.commit()
-        
+
     # Create sample doctor
     if not app.security.datastore.find_user(email= 'doctor@gmail.com'):
         user = app.security.datastore.create_user(
             email='doctor@gmail.com',
-            name='Dr. John Smith', 
-            password=hash_password('doctor123'), 
-            address="Delhi", 
-            pincode="000001", 
+            name='Dr. John Smith',
+            password=hash_password('doctor123'),
+            address="Delhi",
+            pincode="000001",
             roles=['doctor'],
             active=True
         )
         db.session.commit()
-        
+
+        cardiology = Department.query.filter_by(name='Cardiology').first()
         doctor = Doctor(user_id=user.id, specialization='Cardiology', department_id=cardiology.id, qualification='MD, MBBS', experience='10', bio='Expert in cardiovascular diseases')
         db.session.add(doctor)
         db.session.commit()
-        
-        # Create availability for next 7 days
-        for i in range(7):
-            avail_date = date.today() + timedelta(days=i+1)
-            if avail_date.weekday() < 5:  # Monday to Friday
-                for hour in range(9, 17):  # 9 AM to 5 PM
-                    availability = DoctorAvailability(
-                        doctor_id=doctor.id,
-                        date=avail_date,
-                        start_time=time(hour, 0),
-                        end_time=time(hour+1, 0),
-                        is_available=True
-                    )
-                    db.session.add(availability)
-        db.session.commit()
\ No newline at end of file
+
+        # Weekly hours: Monday to Friday, 9 AM to 5 PM in hourly slots
+        for weekday in range(5):
+            db.session.add(ScheduleTemplate(doctor_id=doctor.id, weekday=weekday, start_time=time(9, 0), end_time=time(17, 0), slot_minutes=60))
+        db.session.flush()
+        rematerialize(doctor.id)
+        db.session.commit()
+
+@click.command('seed')
+@with_appcontext
+def seed_command():
+    """Create tables, roles, departments and sample accounts (idempotent)."""
+    seed()
+    click.echo('Database seeded')
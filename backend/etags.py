@@ -0,0 +1,86 @@
+from flask import g, request, make_response
+from flask_security import current_user
+from functools import wraps
+from sqlalchemy import select
+from datetime import date
+from .extensions import db
+from .models import ResourceVersion
+from .upsert import dialect_insert
+import hashlib
+
+# Conditional GET for the views the frontends refetch on every navigation.
+# The ETag hashes the request (endpoint, arguments, query string), today's
+# date and the change counters of the resources the view shows. Write paths
+# bump those counters in the transaction that makes the change, so every
+# worker hands out a new ETag the moment it commits. A request whose
+# If-None-Match still matches gets 304 after one primary-key lookup, before
+# the view queries or serializes anything.
+#
+# The versions read for the ETag are kept for the view (seen_version), and
+# bodies built from per-process state (the slot inventory, SimpleCache) check
+# their entries against them, so a worker that missed another process's
+# invalidation reloads instead of pairing a new ETag with an old body.
+#
+# Materializing template slots needs no bump: the slots follow from the
+# templates, and template changes bump through rematerialize's caller.
+
+# Reference data shown next to appointments (doctor names, departments)
+DOCTORS = 'doctors'
+DEPARTMENTS = 'departments'
+
+def patient_appointments(patient_id):
+    return f'patient:{patient_id}:appointments'
+
+def doctor_slots(doctor_id):
+    return f'doctor:{doctor_id}:slots'
+
+def bump(*keys):
+    """Marks resources changed. Call before the writing transaction commits."""
+    table = ResourceVersion.__table__
+    conn = db.session.connection()
+    # One statement for all keys, in a fixed order so concurrent writers lock
+    # the rows the same way round
+    stmt = dialect_insert(conn, table).values([{'key': key, 'version': 1} for key in sorted(set(keys))])
+    conn.execute(stmt.on_conflict_do_update(index_elements=['key'], set_={'version': table.c.version + stmt.excluded.version}))
+
+def current_etag(keys):
+    versions = dict(db.session.execute(
+        select(ResourceVersion.key, ResourceVersion.version).where(ResourceVersion.key.in_(keys))
+    ).all())
+    g.resource_versions = {key: versions.get(key, 0) for key in keys}
+    # The caller and the key names are part of it, so equal counters of two
+    # users never give the same ETag
+    parts = (current_user.id, g.get('profile_id'), request.endpoint, sorted(request.view_args.items()),
+             sorted(request.args.items(multi=True)), date.today().isoformat(),
+             sorted(g.resource_versions.items()))
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+def seen_version(key):
+    """The version `key` had when this request's ETag was computed."""
+    return g.resource_versions[key]
+
+def conditional(*keys):
+    """Adds an ETag to successful GETs and answers a matching If-None-Match
+    with 304 without calling the view; other methods pass straight through.
+    Keys may be functions of the caller's profile id; place the decorator
+    below profile_required."""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated_view(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return fn(*args, **kwargs)
+            etag = current_etag([key(g.profile_id) if callable(key) else key for key in keys])
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Per user, and revalidated on every use; shared caches must key
+            # on the token
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Auth-Token')
+            return response
+        return decorated_view
+    return wrapper
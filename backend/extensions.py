@@ -1,3 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_caching import Cache
+from flask_cors import CORS
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+cache = Cache()
+cors = CORS()
\ No newline at end of file
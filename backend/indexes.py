@@ -0,0 +1,41 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+from .extensions import db
+import click
+
+def missing_indexes(engine):
+    """Indexes declared on the models that the database does not have yet."""
+    inspector = inspect(engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        missing.extend(ix for ix in sorted(table.indexes, key=lambda ix: ix.name) if ix.name not in existing)
+    return missing
+
+def ensure_indexes(engine=None):
+    """Creates any declared index missing from an existing database.
+
+    db.create_all() only creates indexes together with new tables, so this is
+    the upgrade path for databases created before an index was declared. Every
+    statement is CREATE INDEX IF NOT EXISTS, so it is safe to run repeatedly.
+    Returns the names of the indexes created."""
+    engine = engine or db.engine
+    created = []
+    for index in missing_indexes(engine):
+        with engine.begin() as conn:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+        created.append(index.name)
+    return created
+
+@click.command('ensure-indexes')
+@with_appcontext
+def ensure_indexes_command():
+    """Create declared indexes that are missing from the database."""
+    created = ensure_indexes()
+    for name in created:
+        click.echo(f'created {name}')
+    click.echo(f'{len(created)} index(es) created on {current_app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0]}')
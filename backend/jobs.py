@@ -0,0 +1,72 @@
+from celery import Celery, Task, shared_task
+from celery.result import AsyncResult
+from flask import current_app
+from . import reports, schedules, searchIndex, stats
+
+# Background jobs. With CELERY_BROKER_URL unset, tasks run eagerly in the
+# calling process, so the job endpoints work without a worker (development,
+# smoke tests). The submitting request then answers with the result, as the
+# in-memory result backend used without Redis is per process.
+#
+#     celery -A backend.worker worker --loglevel=info
+#     celery -A backend.worker beat
+
+def celery_init_app(app):
+    class FlaskTask(Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery_app = Celery(app.name, task_cls=FlaskTask)
+    celery_app.config_from_object(app.config['CELERY'])
+    celery_app.set_default()
+    app.extensions['celery'] = celery_app
+    return celery_app
+
+def job_status(job_id):
+    return result_status(AsyncResult(job_id, app=current_app.extensions['celery']))
+
+def result_status(result):
+    status = {'job_id': result.id, 'state': result.state, 'ready': result.ready()}
+    if result.failed():
+        status['error'] = str(result.result)
+    return status
+
+def job_result(job_id):
+    """(ready, value) of a job; value is the task's return value once it
+    succeeded, or the exception it raised."""
+    result = AsyncResult(job_id, app=current_app.extensions['celery'])
+    return result.ready(), result.result
+
+# --- Reports
+
+@shared_task(name='reports.doctor_activity')
+def doctor_activity_report(doctor_id, month):
+    return reports.doctor_monthly_report(doctor_id, month)
+
+@shared_task(name='reports.department_summary')
+def department_summary_report(month):
+    return reports.department_summary_report(month)
+
+# --- Recomputations
+
+@shared_task(name='recompute.stats')
+def reconcile_stats():
+    stats.reconcile_stats()
+    return {'recomputed': 'stats'}
+
+@shared_task(name='recompute.search_index')
+def rebuild_search_index():
+    searchIndex.rebuild_search_index()
+    return {'recomputed': 'search-index'}
+
+@shared_task(name='recompute.schedules')
+def extend_schedules(days=None):
+    created = schedules.extend_horizons(days or current_app.config['SCHEDULE_HORIZON_DAYS'])
+    return {'recomputed': 'schedules', 'slots_materialized': created}
+
+RECOMPUTATIONS = {
+    'stats': reconcile_stats,
+    'search-index': rebuild_search_index,
+    'schedules': extend_schedules,
+}
@@ -0,0 +1,53 @@
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, time
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+# JSON behind jsonify, request.get_json and current_app.json: orjson when it
+# is installed, Python's json otherwise. Both write dates, datetimes and times
+# in ISO 8601 (Flask's default writes dates as HTTP dates and rejects times),
+# so a view may return date objects as they are and get the same output from
+# either encoder. Keys stay sorted, and responses are compact, or indented by
+# two in debug mode, as with Flask's default. Unlike Flask's default, non-ASCII
+# text is written as UTF-8 rather than \uXXXX escapes (orjson cannot escape
+# it), and the stdlib path does the same so the bytes never depend on whether
+# orjson is installed. Explicit keyword arguments (dumps(obj, indent=4), ...)
+# take the stdlib path.
+
+def _default(obj):
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = self._encode(self._prepare_response_obj(args, kwargs), indent)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+    def _encode(self, obj, indent=False):
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            # Past orjson's limits (integers over 64 bits, ...); json writes
+            # it or raises the usual TypeError
+            return super().dumps(obj, **({'indent': 2} if indent else {'separators': (',', ':')})).encode()
@@ -0,0 +1,159 @@
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from bisect import bisect_left
+from contextvars import ContextVar
+import os
+import threading
+import time as clock
+
+# Per-endpoint request metrics in Prometheus text format, served by
+# /api/admin/metrics. The request hooks time each request and the engine
+# events count the statements it runs (and the time spent in them) into a
+# per-request sample held in a context variable, so queries made outside a
+# request (CLI, Celery, the password pool) cost one lookup and are not counted.
+#
+# Numbers are kept per process. Every series carries a `worker` label with the
+# pid, so under gunicorn sum them with `sum without (worker) (...)`; a scrape
+# only reaches the worker that serves it, which is enough for rates.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_sample = ContextVar('request_metrics_sample', default=None)
+
+class _Sample:
+    __slots__ = ('started', 'statements', 'db_seconds')
+
+    def __init__(self):
+        self.started = clock.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+
+class _Series:
+    __slots__ = ('statuses', 'buckets', 'seconds', 'statements', 'db_seconds', 'response_bytes')
+
+    def __init__(self, n_buckets):
+        self.statuses = {}
+        self.buckets = [0] * (n_buckets + 1)  # the last one is +Inf
+        self.seconds = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+
+class RequestMetrics:
+    def __init__(self):
+        self.enabled = True
+        self.buckets = DEFAULT_BUCKETS
+        self._series = {}  # (endpoint, method) -> _Series
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.buckets = tuple(sorted(app.config.get('METRICS_LATENCY_BUCKETS', DEFAULT_BUCKETS)))
+        if self.enabled:
+            app.before_request(self._before_request)
+            app.after_request(self._after_request)
+            app.teardown_request(self._teardown_request)
+        app.extensions['request_metrics'] = self
+
+    def after_fork(self):
+        """A forked worker starts from zero under its own pid."""
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _before_request(self):
+        g._metrics_token = _sample.set(_Sample())
+
+    def _after_request(self, response):
+        sample = _sample.get()
+        if sample is None:
+            return response
+        elapsed = clock.perf_counter() - sample.started
+        key = (request.endpoint or 'unmatched', request.method)
+        # Measuring a generator body would buffer it all in memory
+        size = 0 if response.is_streamed else response.calculate_content_length() or 0
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+            series.statuses[response.status_code] = series.statuses.get(response.status_code, 0) + 1
+            series.buckets[bisect_left(self.buckets, elapsed)] += 1
+            series.seconds += elapsed
+            series.statements += sample.statements
+            series.db_seconds += sample.db_seconds
+            series.response_bytes += size
+        return response
+
+    def _teardown_request(self, exc):
+        token = g.pop('_metrics_token', None)
+        if token is not None:
+            _sample.reset(token)
+
+    def render(self):
+        """The request series in Prometheus text exposition format."""
+        with self._lock:
+            snapshot = [(key, series.statuses.copy(), list(series.buckets), series.seconds, series.statements,
+                         series.db_seconds, series.response_bytes) for key, series in sorted(self._series.items())]
+        worker = os.getpid()
+        lines = [
+            '# HELP curanet_http_requests_total Requests served, by endpoint, method and status.',
+            '# TYPE curanet_http_requests_total counter',
+        ]
+        for (endpoint, method), statuses, *_ in snapshot:
+            for status, count in sorted(statuses.items()):
+                lines.append(f'curanet_http_requests_total{_labels(endpoint=endpoint, method=method, status=status, worker=worker)} {count}')
+
+        lines += [
+            '# HELP curanet_http_request_duration_seconds Time from the first request hook to the response.',
+            '# TYPE curanet_http_request_duration_seconds histogram',
+        ]
+        for (endpoint, method), statuses, buckets, seconds, *_ in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), buckets):
+                cumulative += count
+                lines.append(f'curanet_http_request_duration_seconds_bucket{_labels(endpoint=endpoint, method=method, worker=worker, le=bound)} {cumulative}')
+            lines.append(f'curanet_http_request_duration_seconds_sum{_labels(endpoint=endpoint, method=method, worker=worker)} {seconds:.6f}')
+            lines.append(f'curanet_http_request_duration_seconds_count{_labels(endpoint=endpoint, method=method, worker=worker)} {cumulative}')
+
+        for name, index, help_text, fmt in (
+            ('curanet_db_statements_total', 4, 'SQL statements executed while serving the endpoint.', '{}'),
+            ('curanet_db_seconds_total', 5, 'Time spent executing those statements.', '{:.6f}'),
+            ('curanet_http_response_bytes_total', 6, 'Response body bytes sent (streamed bodies count 0).', '{}'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for row in snapshot:
+                (endpoint, method) = row[0]
+                lines.append(f'{name}{_labels(endpoint=endpoint, method=method, worker=worker)} {fmt.format(row[index])}')
+        return '\n'.join(lines) + '\n'
+
+def render_stats(prefix, stats, help_text):
+    """Gauges for a dict of numbers such as token_cache.stats()."""
+    worker = os.getpid()
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = f'{prefix}_{key}'
+            lines += [f'# HELP {name} {help_text} ({key}).', f'# TYPE {name} gauge', f'{name}{_labels(worker=worker)} {value}']
+    return '\n'.join(lines) + '\n'
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+request_metrics = RequestMetrics()
+
+# --- Statement counting, for every engine
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _sample.get() is not None:
+        conn.info['metrics_started'] = clock.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sample = _sample.get()
+    started = conn.info.pop('metrics_started', None)
+    if sample is not None and started is not None:
+        sample.statements += 1
+        sample.db_seconds += clock.perf_counter() - started
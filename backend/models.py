@@ -14,6 +14,9 @@ class UserRoles(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable = False)
     role_id = db.Column(db.Integer, db.ForeignKey('role.id'), nullable = False)
     
+    # Role lookups on every authenticated request filter by user_id
+    __table_args__ = (db.Index('ix_user_roles_user_id', 'user_id'),)
+    
 class User(db.Model, UserMixin):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key = True)
@@ -35,7 +38,8 @@ class Department(db.Model):
     __tablename__ = 'department'
     id = db.Column(db.Integer, primary_key = True)
     name = db.Column(db.String, nullable = False, unique = True)
-    description = db.Column(db.Text, nullable = False)
+    # Large text is deferred: loaded only by the serializer views that show it
+    description = db.deferred(db.Column(db.Text, nullable = False))
     doctors_registered = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
@@ -49,12 +53,18 @@ class Doctor(db.Model):
     department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable = True)
     qualification = db.Column(db.String, nullable = False)
     experience = db.Column(db.String, nullable = False)
-    bio = db.Column(db.Text, nullable = False)
+    bio = db.deferred(db.Column(db.Text, nullable = False))
     is_active = db.Column(db.Boolean, default=True, nullable = False)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
     appointments = db.relationship('Appointment', backref='doctor', lazy=True, cascade='all, delete-orphan')
     availabilities = db.relationship('DoctorAvailability', backref='doctor', lazy=True, cascade='all, delete-orphan')
+    
+    # Partial: listings only ever look at active doctors
+    __table_args__ = (
+        db.Index('ix_doctor_active_department', 'department_id', sqlite_where=is_active == True, postgresql_where=is_active == True),
+        db.Index('ix_doctor_active_specialization', 'specialization', sqlite_where=is_active == True, postgresql_where=is_active == True),
+    )
 
 class Patient(db.Model):
     __tablename__ = 'patient'
@@ -63,12 +73,15 @@ class Patient(db.Model):
     date_of_birth = db.Column(db.Date, nullable = False)
     gender = db.Column(db.String(10), nullable = False)
     blood_group = db.Column(db.String(5), nullable = False)
-    medical_history = db.Column(db.Text, nullable = True)
+    medical_history = db.deferred(db.Column(db.Text, nullable = True))
     emergency_contact = db.Column(db.String(15), nullable = True)
     is_active = db.Column(db.Boolean, default=True, nullable = False)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
     appointments = db.relationship('Appointment', backref='patient', lazy=True, cascade='all, delete-orphan')
+    
+    # Partial: lets the active-patient listing walk ids without touching inactive rows
+    __table_args__ = (db.Index('ix_patient_active_id', 'id', sqlite_where=is_active == True, postgresql_where=is_active == True),)
 
 class DoctorAvailability(db.Model):
     __tablename__ = 'doctor_availability'
@@ -79,7 +92,44 @@ class DoctorAvailability(db.Model):
     end_time = db.Column(db.Time, nullable = False)
     is_available = db.Column(db.Boolean, default=True, nullable = False)
     
-    __table_args__ = (db.UniqueConstraint('doctor_id', 'date', 'start_time', name='unique_doctor_slot'),)
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'date', 'start_time', name='unique_doctor_slot'),
+        db.Index('ix_availability_open_doctor_date', 'doctor_id', 'date', sqlite_where=is_available == True, postgresql_where=is_available == True),
+    )
+
+class ScheduleTemplate(db.Model):
+    """Recurring weekly hours of a doctor, cut into slot_minutes slots when
+    materialized into DoctorAvailability rows (see backend.schedules)."""
+    __tablename__ = 'schedule_template'
+    id = db.Column(db.Integer, primary_key = True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable = False)
+    weekday = db.Column(db.Integer, nullable = False)  # 0 = Monday
+    start_time = db.Column(db.Time, nullable = False)
+    end_time = db.Column(db.Time, nullable = False)
+    slot_minutes = db.Column(db.Integer, default=60, nullable = False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    
+    __table_args__ = (db.Index('ix_schedule_template_doctor', 'doctor_id'),)
+
+class ScheduleException(db.Model):
+    """A day, or part of one when start_time/end_time are set, on which a
+    doctor's templates produce no slots."""
+    __tablename__ = 'schedule_exception'
+    id = db.Column(db.Integer, primary_key = True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable = False)
+    date = db.Column(db.Date, nullable = False)
+    start_time = db.Column(db.Time, nullable = True)
+    end_time = db.Column(db.Time, nullable = True)
+    reason = db.Column(db.String, nullable = True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    
+    __table_args__ = (db.Index('ix_schedule_exception_doctor_date', 'doctor_id', 'date'),)
+
+class ScheduleHorizon(db.Model):
+    """Last date up to which a doctor's templates have been materialized."""
+    __tablename__ = 'schedule_horizon'
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), primary_key = True)
+    materialized_until = db.Column(db.Date, nullable = False)
 
 class Appointment(db.Model):
     __tablename__ = 'appointment'
@@ -95,7 +145,15 @@ class Appointment(db.Model):
     
     treatment = db.relationship('Treatment', backref='appointment', uselist=False, cascade='all, delete-orphan')
     
-    __table_args__ = (db.UniqueConstraint('doctor_id', 'date', 'time', name='unique_doctor_appointment'),)
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'date', 'time', name='unique_doctor_appointment'),
+        db.Index('ix_appointment_doctor_date_status', 'doctor_id', 'date', 'status'),
+        db.Index('ix_appointment_patient_date', 'patient_id', 'date'),
+        # Serves the (date, time, id) ordering of the admin listing and its keyset cursor
+        db.Index('ix_appointment_date_time', 'date', 'time'),
+        # Partial: upcoming-appointment counts only ever look at Booked rows
+        db.Index('ix_appointment_booked_date', 'date', sqlite_where=status == 'Booked', postgresql_where=status == 'Booked'),
+    )
 
 class Treatment(db.Model):
     __tablename__ = 'treatment'
@@ -103,7 +161,34 @@ class Treatment(db.Model):
     appointment_id = db.Column(db.Integer, db.ForeignKey('appointment.id'), nullable = False, unique = True)
     diagnosis = db.Column(db.Text, nullable = True)
     prescription = db.Column(db.Text, nullable = True)
-    notes = db.Column(db.Text, nullable = True)
+    notes = db.deferred(db.Column(db.Text, nullable = True))
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
-    
\ No newline at end of file
+    
+class StatCounter(db.Model):
+    """Hospital-wide counters kept current by backend.stats."""
+    __tablename__ = 'stat_counter'
+    key = db.Column(db.String(64), primary_key = True)
+    value = db.Column(db.Integer, nullable = False, default=0)
+
+class ResourceVersion(db.Model):
+    """Change counters behind the ETags of backend.etags."""
+    __tablename__ = 'resource_version'
+    key = db.Column(db.String(64), primary_key = True)
+    version = db.Column(db.Integer, nullable = False, default=0)
+
+class AppointmentDayStat(db.Model):
+    """Appointment counts per doctor, date and status. doctor_id 0 holds the
+    totals across all doctors."""
+    __tablename__ = 'appointment_day_stat'
+    doctor_id = db.Column(db.Integer, primary_key = True)
+    date = db.Column(db.Date, primary_key = True)
+    status = db.Column(db.String(20), primary_key = True)
+    count = db.Column(db.Integer, nullable = False, default=0)
+
+class DoctorPatientStat(db.Model):
+    """Number of appointments linking a doctor and a patient."""
+    __tablename__ = 'doctor_patient_stat'
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), primary_key = True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), primary_key = True)
+    appointments = db.Column(db.Integer, nullable = False, default=0)
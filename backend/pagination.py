@@ -0,0 +1,89 @@
+from flask import current_app, request, url_for
+from sqlalchemy import and_, or_
+from datetime import date, time
+import base64
+import json
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, time)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, order):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(order):
+            raise ValueError
+        decoded = []
+        for (column, _), value in zip(order, values):
+            python_type = column.type.python_type
+            if python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type is time:
+                value = time.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+def keyset_filter(order, values):
+    """Builds the WHERE clause selecting rows strictly after `values` in the
+    given ordering, e.g. (a < x) OR (a = x AND b < y) OR ... for descending keys.
+    Spelled out rather than as a row-value comparison so that mixed directions
+    and every backend work."""
+    clauses = []
+    for i, (column, direction) in enumerate(order):
+        equal = [col == values[j] for j, (col, _) in enumerate(order[:i])]
+        after = column < values[i] if direction == 'desc' else column > values[i]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+def order_clauses(order):
+    return [column.desc() if direction == 'desc' else column.asc() for column, direction in order]
+
+class Page:
+    def __init__(self, items, next_cursor, total):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total = total
+
+    def headers(self):
+        headers = {}
+        if self.next_cursor:
+            headers['X-Next-Cursor'] = self.next_cursor
+            args = request.args.to_dict()
+            args['cursor'] = self.next_cursor
+            headers['Link'] = f'<{url_for(request.endpoint, _external=True, **request.view_args, **args)}>; rel="next"'
+        if self.total is not None:
+            headers['X-Total-Count'] = str(self.total)
+        return headers
+
+def paginate(query, order):
+    """Keyset-paginates `query` on `order`, a list of (column, 'asc'|'desc')
+    pairs whose last column is unique. Reads `cursor`, `limit` and
+    `include_total` from the request arguments."""
+    config = current_app.config
+    try:
+        limit = int(request.args.get('limit', config['PAGE_SIZE_DEFAULT']))
+    except ValueError:
+        limit = config['PAGE_SIZE_DEFAULT']
+    limit = max(1, min(limit, config['PAGE_SIZE_MAX']))
+
+    total = None
+    if request.args.get('include_total') in ('1', 'true'):
+        total = query.order_by(None).count()
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(keyset_filter(order, decode_cursor(cursor, order)))
+
+    # One extra row tells us whether another page follows
+    rows = query.order_by(*order_clauses(order)).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column, _ in order])
+    return Page(rows, next_cursor, total)
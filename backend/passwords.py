@@ -0,0 +1,114 @@
+from flask import current_app
+from flask_security import hash_password as _hash_password, verify_password as _verify_password
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import os
+import threading
+
+# bcrypt costs 100-300 ms of CPU per call. Running it in the request thread
+# lets a burst of logins occupy every worker, so hashing goes through a small
+# pool instead: at most PASSWORD_HASH_WORKERS hashes run at once (the bcrypt
+# extension releases the GIL, so they use separate cores), at most
+# PASSWORD_HASH_QUEUE more may wait, and anything beyond that, or waiting longer
+# than PASSWORD_HASH_TIMEOUT seconds, fails fast with PasswordHasherBusy (503)
+# while the remaining threads keep serving other endpoints.
+
+class PasswordHasherBusy(Exception):
+    """The hashing pool is saturated or did not answer in time."""
+
+    def __init__(self):
+        super().__init__("Server busy, please retry shortly")
+
+class PasswordHasher:
+    def __init__(self):
+        self.workers = 0
+        self.queue_limit = 0
+        self.timeout = 5.0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.rehashed = 0
+        self._pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+        self.queue_limit = app.config.get('PASSWORD_HASH_QUEUE', 32)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 5.0)
+        self._start()
+        app.extensions['password_hasher'] = self
+
+    def _start(self):
+        # 0 workers hashes inline in the request thread (old behaviour)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash') if self.workers else None
+
+    def after_fork(self):
+        """Pool threads do not survive a fork, so a child starts its own."""
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._start()
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+
+        app = current_app._get_current_object()
+        def call():
+            # Flask-Security reads its salt and hash settings from the app config
+            with app.app_context():
+                return fn(*args)
+
+        future = self._executor.submit(call)
+        future.add_done_callback(self._done)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordHasherBusy()
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def hash(self, password):
+        return self._run(_hash_password, password)
+
+    def verify(self, password, user):
+        """Checks `password` against the user's hash. When the stored hash was
+        made with other settings than the current ones (e.g. BCRYPT_ROUNDS
+        changed), it is replaced with a fresh one; the caller commits. A busy
+        pool only postpones that rehash to a later login."""
+        if not user.password or not self._run(_verify_password, password, user.password):
+            return False
+        if current_app.security.pwd_context.needs_update(user.password):
+            try:
+                user.password = self.hash(password)
+            except PasswordHasherBusy:
+                return True
+            with self._lock:
+                self.rehashed += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_limit': self.queue_limit,
+                'in_flight': self._pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'rehashed': self.rehashed
+            }
+
+password_hasher = PasswordHasher()
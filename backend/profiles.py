@@ -0,0 +1,34 @@
+from flask import g, jsonify
+from flask_security import current_user
+from functools import wraps
+from .extensions import db
+from .authCache import token_cache
+
+def resolve_profile(model):
+    """Returns the id of the caller's `model` (Doctor or Patient) row, or None.
+
+    Resolved at most once per request and remembered on the cached auth token,
+    so repeat calls with the same token skip the lookup entirely."""
+    if 'profile_id' in g:
+        return g.profile_id
+    kind = model.__name__
+    key = g.get('auth_cache_key')
+    profile_id = token_cache.profile(key, kind) if key else None
+    if profile_id is None:
+        profile_id = db.session.query(model.id).filter(model.user_id == current_user.id).scalar()
+        if profile_id is not None and key:
+            token_cache.remember_profile(key, kind, profile_id)
+    g.profile_id = profile_id
+    return profile_id
+
+def profile_required(model):
+    """Stores the caller's profile id in `g.profile_id`, answering 404 when the
+    user has no `model` profile."""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated(*args, **kwargs):
+            if resolve_profile(model) is None:
+                return jsonify({"message": f"{model.__name__} profile not found"}), 404
+            return fn(*args, **kwargs)
+        return decorated
+    return wrapper
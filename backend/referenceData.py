@@ -0,0 +1,22 @@
+from .caching import cached_result
+from .extensions import db
+from .models import Doctor, Department
+from . import serializers
+
+# Reference data read on most page loads but changed only by admin writes,
+# which invalidate the tags below (see adminRoutes).
+
+@cached_result('departments', 'doctors')
+def department_summaries(versions=None):
+    """`versions` only keys the cache: callers that know the database versions
+    of departments and doctors (backend.etags) pass them, so a worker that
+    missed an invalidation rebuilds the list once the data changed."""
+    return serializers.department_summary.many(serializers.department_summary.load(Department.query).all())
+
+@cached_result('doctors')
+def specializations_matching(term):
+    rows = db.session.query(Doctor.specialization).filter(
+        Doctor.is_active == True,
+        Doctor.specialization.ilike(f'%{term}%')
+    ).distinct().order_by(Doctor.specialization).all()
+    return [{'specialization': specialization} for (specialization,) in rows]
@@ -0,0 +1,95 @@
+from sqlalchemy import func
+from .extensions import db
+from .models import Appointment, AppointmentDayStat, Department, Doctor, Treatment, User
+from datetime import datetime, timedelta
+import csv
+import io
+
+# Reports are plain dicts holding a table (columns + rows) so they can be
+# stored as a job result and downloaded as JSON or CSV. They read the per-day
+# counters maintained by backend.stats wherever those carry the numbers.
+
+STATUSES = ['Booked', 'Completed', 'Cancelled']
+
+def month_range(month):
+    """First and last date of a 'YYYY-MM' month."""
+    start = datetime.strptime(month, '%Y-%m').date()
+    end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+def _report(name, params, columns, rows, totals):
+    return {
+        'report': name,
+        'params': params,
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'columns': columns,
+        'rows': rows,
+        'totals': totals
+    }
+
+def doctor_monthly_report(doctor_id, month):
+    start, end = month_range(month)
+    doctor = db.session.query(Doctor.id, Doctor.specialization, User.name).join(User, User.id == Doctor.user_id).filter(Doctor.id == doctor_id).first()
+    if doctor is None:
+        raise ValueError(f'Doctor {doctor_id} not found')
+
+    per_day = {}
+    for day, status, count in db.session.query(AppointmentDayStat.date, AppointmentDayStat.status, AppointmentDayStat.count).filter(
+        AppointmentDayStat.doctor_id == doctor_id,
+        AppointmentDayStat.date >= start,
+        AppointmentDayStat.date <= end,
+        AppointmentDayStat.count > 0
+    ):
+        per_day.setdefault(day, dict.fromkeys(STATUSES, 0))[status] = count
+
+    rows = [[day.strftime('%Y-%m-%d')] + [counts[status] for status in STATUSES] + [sum(counts.values())]
+            for day, counts in sorted(per_day.items())]
+    month_filter = (Appointment.doctor_id == doctor_id, Appointment.date >= start, Appointment.date <= end)
+    totals = {status.lower(): sum(row[i + 1] for row in rows) for i, status in enumerate(STATUSES)}
+    totals.update({
+        'appointments': sum(row[-1] for row in rows),
+        'unique_patients': db.session.query(func.count(func.distinct(Appointment.patient_id))).filter(*month_filter).scalar(),
+        'treatments_recorded': db.session.query(func.count(Treatment.id)).join(Appointment, Appointment.id == Treatment.appointment_id).filter(*month_filter).scalar()
+    })
+    params = {'doctor_id': doctor.id, 'doctor_name': doctor.name, 'specialization': doctor.specialization, 'month': month}
+    return _report('doctor-activity', params, ['date', 'booked', 'completed', 'cancelled', 'total'], rows, totals)
+
+def department_summary_report(month):
+    start, end = month_range(month)
+    departments = Department.query.order_by(Department.name).all()
+
+    active_doctors = dict(db.session.query(Doctor.department_id, func.count(Doctor.id)).filter(
+        Doctor.is_active == True
+    ).group_by(Doctor.department_id).all())
+    counts = {}
+    for department_id, status, count in db.session.query(Doctor.department_id, AppointmentDayStat.status, func.sum(AppointmentDayStat.count)).join(
+        Doctor, Doctor.id == AppointmentDayStat.doctor_id
+    ).filter(
+        AppointmentDayStat.date >= start,
+        AppointmentDayStat.date <= end
+    ).group_by(Doctor.department_id, AppointmentDayStat.status):
+        counts.setdefault(department_id, dict.fromkeys(STATUSES, 0))[status] = count
+    patients = dict(db.session.query(Doctor.department_id, func.count(func.distinct(Appointment.patient_id))).join(
+        Doctor, Doctor.id == Appointment.doctor_id
+    ).filter(
+        Appointment.date >= start,
+        Appointment.date <= end
+    ).group_by(Doctor.department_id).all())
+
+    rows = []
+    for dept in departments:
+        dept_counts = counts.get(dept.id, dict.fromkeys(STATUSES, 0))
+        rows.append([dept.name, active_doctors.get(dept.id, 0)] + [dept_counts[status] for status in STATUSES] + [patients.get(dept.id, 0)])
+    totals = {
+        'active_doctors': sum(row[1] for row in rows),
+        'appointments': sum(sum(row[2:5]) for row in rows),
+        'patients': sum(row[5] for row in rows)
+    }
+    return _report('department-summary', {'month': month}, ['department', 'active_doctors', 'booked', 'completed', 'cancelled', 'patients'], rows, totals)
+
+def to_csv(report):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(report['columns'])
+    writer.writerows(report['rows'])
+    return out.getvalue()
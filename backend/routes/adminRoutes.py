@@ -1,23 +1,34 @@
-from flask import current_app as app, jsonify, request
+from flask import Blueprint, current_app as app, jsonify, request, Response
 from flask_security import auth_required, roles_accepted
 from ..extensions import db
+from ..pagination import paginate, InvalidCursor
+from ..streaming import stream, wants_stream
+from .. import etags, jobs, serializers, stats
+from ..reports import month_range, to_csv
+from ..caching import cached_response, invalidate
+from ..referenceData import specializations_matching
+from ..searchIndex import search_patients
+from ..authCache import token_cache
+from ..passwords import password_hasher, PasswordHasherBusy
+from ..metrics import request_metrics, render_stats
+from ..slowQueries import slow_query_log
 from ..models import User, Doctor, Patient, Department, Appointment, Treatment, DoctorAvailability
 from datetime import date, datetime, timedelta
 from sqlalchemy import func, or_
 import re
 
-@app.route('/api/admin/dashboard', methods=['GET'])
+bp = Blueprint('admin', __name__)
+
+@bp.route('/api/admin/dashboard', methods=['GET'])
 @auth_required('token')
 @roles_accepted('admin')
 def admin_dashboard():
     try:
-        total_doctors = Doctor.query.filter_by(is_active=True).count()
-        total_patients = Patient.query.filter_by(is_active=True).count()
-        total_appointments = Appointment.query.count()
-        upcoming_appointments = Appointment.query.filter(
-            Appointment.date >= date.today(),
-            Appointment.status == 'Booked'
-        ).count()
+        # Precomputed counters, kept current by backend.stats
+        total_doctors = stats.counter('doctors.active')
+        total_patients = stats.counter('patients.active')
+        total_appointments = stats.counter('appointments.total')
+        upcoming_appointments = stats.booked_count(date.today(), None)
         
         return jsonify({
             'total_doctors': total_doctors,
@@ -28,31 +39,137 @@ def admin_dashboard():
     except Exception as e:
         return jsonify({"message": "Error fetching dashboard data", "error": str(e)}), 500
 
-@app.route('/api/admin/doctors', methods=['GET', 'POST'])
+@bp.route('/api/admin/cache-stats', methods=['GET'])
+@auth_required('token')
+@roles_accepted('admin')
+def admin_cache_stats():
+    return jsonify({'auth_tokens': token_cache.stats()}), 200
+
+@bp.route('/api/admin/metrics', methods=['GET'])
+@auth_required('token')
+@roles_accepted('admin')
+def admin_metrics():
+    # Prometheus text format; numbers belong to the worker that answers
+    body = (request_metrics.render()
+            + render_stats('curanet_auth_cache', token_cache.stats(), 'Verified auth token cache')
+            + render_stats('curanet_password_hasher', password_hasher.stats(), 'Password hashing pool'))
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/admin/slow-queries', methods=['GET'])
+@auth_required('token')
+@roles_accepted('admin')
+def admin_slow_queries():
+    # Newest first; ?route= keeps entries whose route contains the text
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"message": "limit must be a number"}), 400
+    return jsonify({
+        'threshold_ms': slow_query_log.threshold * 1000,
+        'capacity': slow_query_log.capacity,
+        'captured': slow_query_log.captured,
+        'queries': slow_query_log.entries(max(1, limit), request.args.get('route'))
+    }), 200
+
+# --- Background jobs (backend.jobs): submit, poll, download
+
+def _job_accepted(result):
+    body = {'job_id': result.id, 'status_url': f'/api/admin/jobs/{result.id}'}
+    if not result.ready():
+        return jsonify(body), 202
+    # Ran eagerly (no broker): return the result now, since polling may reach
+    # a worker whose in-memory result backend never saw this job
+    body.update(jobs.result_status(result))
+    if not result.successful():
+        return jsonify({"message": "Job failed", **body}), 500
+    return jsonify({**body, 'result': result.result}), 200
+
+def _valid_month(data):
+    month = data.get('month') or date.today().strftime('%Y-%m')
+    month_range(month)
+    return month
+
+@bp.route('/api/admin/reports/doctor-activity', methods=['POST'])
+@auth_required('token')
+@roles_accepted('admin')
+def admin_doctor_activity_report():
+    data = request.get_json() or {}
+    try:
+        month = _valid_month(data)
+    except ValueError:
+        return jsonify({"message": "Invalid month format. Use YYYY-MM"}), 400
+    doctor = db.session.get(Doctor, data.get('doctor_id') or 0)
+    if not doctor:
+        return jsonify({"message": "Doctor not found"}), 404
+    try:
+        return _job_accepted(jobs.doctor_activity_report.delay(doctor.id, month))
+    except Exception as e:
+        return jsonify({"message": "Error submitting report", "error": str(e)}), 500
+
+@bp.route('/api/admin/reports/department-summary', methods=['POST'])
+@auth_required('token')
+@roles_accepted('admin')
+def admin_department_summary_report():
+    try:
+        month = _valid_month(request.get_json() or {})
+    except ValueError:
+        return jsonify({"message": "Invalid month format. Use YYYY-MM"}), 400
+    try:
+        return _job_accepted(jobs.department_summary_report.delay(month))
+    except Exception as e:
+        return jsonify({"message": "Error submitting report", "error": str(e)}), 500
+
+@bp.route('/api/admin/recompute/<kind>', methods=['POST'])
+@auth_required('token')
+@roles_accepted('admin')
+def admin_recompute(kind):
+    task = jobs.RECOMPUTATIONS.get(kind)
+    if task is None:
+        return jsonify({"message": f"Unknown recomputation. Use one of: {', '.join(jobs.RECOMPUTATIONS)}"}), 404
+    try:
+        return _job_accepted(task.delay())
+    except Exception as e:
+        return jsonify({"message": "Error submitting recomputation", "error": str(e)}), 500
+
+@bp.route('/api/admin/jobs/<job_id>', methods=['GET'])
+@auth_required('token')
+@roles_accepted('admin')
+def admin_job_status(job_id):
+    try:
+        return jsonify(jobs.job_status(job_id)), 200
+    except Exception as e:
+        return jsonify({"message": "Error fetching job status", "error": str(e)}), 500
+
+@bp.route('/api/admin/jobs/<job_id>/result', methods=['GET'])
 @auth_required('token')
 @roles_accepted('admin')
+def admin_job_result(job_id):
+    try:
+        ready, result = jobs.job_result(job_id)
+    except Exception as e:
+        return jsonify({"message": "Error fetching job result", "error": str(e)}), 500
+    if not ready:
+        return jsonify({"message": "Job not finished yet", **jobs.job_status(job_id)}), 409
+    if isinstance(result, Exception):
+        return jsonify({"message": "Job failed", "error": str(result)}), 500
+    if request.args.get('format') == 'csv':
+        if not isinstance(result, dict) or 'columns' not in result:
+            return jsonify({"message": "This job has no tabular result"}), 400
+        filename = f"{result['report']}-{result['params'].get('month', '')}.csv"
+        return Response(to_csv(result), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    return jsonify(result), 200
+
+@bp.route('/api/admin/doctors', methods=['GET', 'POST'])
+@auth_required('token')
+@roles_accepted('admin')
+@cached_response('doctors')
 def manage_doctors():
     try:
         if request.method == 'GET':
-            doctors = Doctor.query.join(User).filter(Doctor.is_active == True).all()
-            doctors_list = []
-            for doctor in doctors:
-                doctors_list.append({
-                    'id': doctor.id,
-                    'user_id': doctor.user_id,
-                    'name': doctor.user.name,
-                    'email': doctor.user.email,
-                    'specialization': doctor.specialization,
-                    'department_id': doctor.department_id,
-                    'department_name': doctor.department.name if doctor.department else None,
-                    'qualification': doctor.qualification,
-                    'experience': doctor.experience,
-                    'bio': doctor.bio,
-                    'phone': doctor.user.phone,
-                    'address': doctor.user.address,
-                    'pincode': doctor.user.pincode
-                })
-            return jsonify(doctors_list), 200
+            query = serializers.admin_doctor.load(Doctor.query.filter(Doctor.is_active == True))
+            page = paginate(query, [(Doctor.id, 'asc')])
+            return jsonify(serializers.admin_doctor.many(page.items)), 200, page.headers()
         
         elif request.method == 'POST':
             data = request.get_json()
@@ -77,10 +194,9 @@ def manage_doctors():
             if app.security.datastore.find_user(email=email):
                 return jsonify({"message": "Email already exists"}), 409
             
-            from flask_security import hash_password
             user = app.security.datastore.create_user(
                 email=email,
-                password=hash_password(password),
+                password=password_hasher.hash(password),
                 name=name,
                 address=address or 'Patna',
                 pincode=pincode or '123456',
@@ -105,18 +221,25 @@ def manage_doctors():
                 if dept:
                     dept.doctors_registered = Doctor.query.filter_by(department_id=department_id, is_active=True).count()
             
+            etags.bump(etags.DOCTORS, etags.DEPARTMENTS)
             db.session.commit()
+            invalidate('doctors', 'departments')
             
             return jsonify({
                 "message": "Doctor created successfully",
                 "doctor_id": doctor.id
             }), 201
             
+    except InvalidCursor as e:
+        return jsonify({"message": str(e)}), 400
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({"message": str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Error managing doctors", "error": str(e)}), 500
 
-@app.route('/api/admin/doctors/<int:doctor_id>', methods=['PUT', 'DELETE'])
+@bp.route('/api/admin/doctors/<int:doctor_id>', methods=['PUT', 'DELETE'])
 @auth_required('token')
 @roles_accepted('admin')
 def update_delete_doctor(doctor_id):
@@ -162,7 +285,9 @@ def update_delete_doctor(doctor_id):
             if 'bio' in data:
                 doctor.bio = data['bio']
             
+            etags.bump(etags.DOCTORS, etags.DEPARTMENTS)
             db.session.commit()
+            invalidate('doctors', 'departments')
             return jsonify({"message": "Doctor updated successfully"}), 200
         
         elif request.method == 'DELETE':
@@ -176,14 +301,16 @@ def update_delete_doctor(doctor_id):
                 if dept:
                     dept.doctors_registered = Doctor.query.filter_by(department_id=doctor.department_id, is_active=True).count()
             
+            etags.bump(etags.DOCTORS, etags.DEPARTMENTS)
             db.session.commit()
+            invalidate('doctors', 'departments')
             return jsonify({"message": "Doctor removed successfully"}), 200
             
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Error updating/deleting doctor", "error": str(e)}), 500
 
-@app.route('/api/admin/appointments', methods=['GET'])
+@bp.route('/api/admin/appointments', methods=['GET'])
 @auth_required('token')
 @roles_accepted('admin')
 def admin_appointments():
@@ -198,30 +325,19 @@ def admin_appointments():
         if date_filter:
             query = query.filter(Appointment.date == datetime.strptime(date_filter, '%Y-%m-%d').date())
         
-        appointments = query.order_by(Appointment.date.desc(), Appointment.time.desc()).all()
+        order = [(Appointment.date, 'desc'), (Appointment.time, 'desc'), (Appointment.id, 'desc')]
+        if wants_stream():
+            return stream(query, serializers.admin_appointment, order)
         
-        appointments_list = []
-        for apt in appointments:
-            appointments_list.append({
-                'id': apt.id,
-                'patient_id': apt.patient_id,
-                'patient_name': apt.patient.user.name,
-                'patient_email': apt.patient.user.email,
-                'doctor_id': apt.doctor_id,
-                'doctor_name': apt.doctor.user.name,
-                'doctor_specialization': apt.doctor.specialization,
-                'date': apt.date.strftime('%Y-%m-%d'),
-                'time': apt.time.strftime('%H:%M'),
-                'status': apt.status,
-                'reason': apt.reason,
-                'created_at': apt.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            })
+        page = paginate(serializers.admin_appointment.load(query), order)
         
-        return jsonify(appointments_list), 200
+        return jsonify(serializers.admin_appointment.many(page.items)), 200, page.headers()
+    except InvalidCursor as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": "Error fetching appointments", "error": str(e)}), 500
 
-@app.route('/api/admin/search', methods=['GET'])
+@bp.route('/api/admin/search', methods=['GET'])
 @auth_required('token')
 @roles_accepted('admin')
 def admin_search():
@@ -233,7 +349,7 @@ def admin_search():
             return jsonify({"message": "Search term required"}), 400
         
         if query_type == 'doctor':
-            doctors = Doctor.query.join(User).filter(
+            doctors = serializers.doctor_search_result.load(Doctor.query.join(User)).filter(
                 Doctor.is_active == True,
                 or_(
                     User.name.ilike(f'%{search_term}%'),
@@ -241,77 +357,45 @@ def admin_search():
                 )
             ).all()
             
-            results = []
-            for doctor in doctors:
-                results.append({
-                    'id': doctor.id,
-                    'name': doctor.user.name,
-                    'email': doctor.user.email,
-                    'specialization': doctor.specialization,
-                    'department': doctor.department.name if doctor.department else None,
-                    'qualification': doctor.qualification,
-                    'experience': doctor.experience
-                })
-            return jsonify(results), 200
+            return jsonify(serializers.doctor_search_result.many(doctors)), 200
         
         elif query_type == 'patient':
-            patients = Patient.query.join(User).filter(
-                Patient.is_active == True,
-                or_(
-                    User.name.ilike(f'%{search_term}%'),
-                    User.email.ilike(f'%{search_term}%'),
-                    User.phone.ilike(f'%{search_term}%')
-                )
-            ).all()
+            try:
+                limit = int(request.args.get('limit', app.config['SEARCH_LIMIT_DEFAULT']))
+            except ValueError:
+                limit = app.config['SEARCH_LIMIT_DEFAULT']
+            limit = max(1, min(limit, app.config['PAGE_SIZE_MAX']))
             
-            results = []
-            for patient in patients:
-                results.append({
-                    'id': patient.id,
-                    'user_id': patient.user_id,
-                    'name': patient.user.name,
-                    'email': patient.user.email,
-                    'phone': patient.user.phone,
-                    'address': patient.user.address,
-                    'date_of_birth': patient.date_of_birth.strftime('%Y-%m-%d') if patient.date_of_birth else None,
-                    'gender': patient.gender,
-                    'blood_group': patient.blood_group
-                })
-            return jsonify(results), 200
+            # Ranked ids from the search index, then one query for the rows
+            patient_ids = search_patients(search_term, limit)
+            patients = serializers.patient_search_result.load(Patient.query).filter(Patient.id.in_(patient_ids)).all()
+            rank = {patient_id: i for i, patient_id in enumerate(patient_ids)}
+            patients.sort(key=lambda patient: rank[patient.id])
+            
+            return jsonify(serializers.patient_search_result.many(patients)), 200
         
         elif query_type == 'specialization':
-            specializations = Doctor.query.filter(
-                Doctor.is_active == True,
-                Doctor.specialization.ilike(f'%{search_term}%')
-            ).distinct(Doctor.specialization).all()
-            
-            results = [{'specialization': doc.specialization} for doc in specializations]
-            return jsonify(results), 200
+            return jsonify(specializations_matching(search_term)), 200
         
         return jsonify({"message": "Invalid search type"}), 400
         
     except Exception as e:
         return jsonify({"message": "Error in search", "error": str(e)}), 500
 
-@app.route('/api/admin/departments', methods=['GET', 'POST'])
+@bp.route('/api/admin/departments', methods=['GET', 'POST'])
 @auth_required('token')
 @roles_accepted('admin')
+@cached_response('departments', 'doctors')
 def manage_departments():
     try:
         if request.method == 'GET':
-            departments = Department.query.all()
-            dept_list = []
-            for dept in departments:
-                # Calculate the count dynamically based on the actual Doctor table
-                doc_count = Doctor.query.filter_by(department_id=dept.id, is_active=True).count()
-                
-                dept_list.append({
-                    'id': dept.id,
-                    'name': dept.name,
-                    'description': dept.description,
-                    'doctors_registered': doc_count, # Use the dynamic count here
-                    'created_at': dept.created_at.strftime('%Y-%m-%d')
-                })
+            departments = serializers.admin_department.load(Department.query).all()
+            # Calculate the counts dynamically based on the actual Doctor table, in one grouped query
+            doc_counts = dict(db.session.query(Doctor.department_id, func.count(Doctor.id)).filter(
+                Doctor.is_active == True
+            ).group_by(Doctor.department_id).all())
+            
+            dept_list = [serializers.admin_department(dept, doc_counts.get(dept.id, 0)) for dept in departments]
             return jsonify(dept_list), 200
         
         elif request.method == 'POST':
@@ -328,7 +412,9 @@ def manage_departments():
             # We don't need to pass doctors_registered here, it defaults to 0 or is calculated on GET
             department = Department(name=name, description=description)
             db.session.add(department)
+            etags.bump(etags.DEPARTMENTS)
             db.session.commit()
+            invalidate('departments')
             
             return jsonify({
                 "message": "Department created successfully",
@@ -339,7 +425,7 @@ def manage_departments():
         db.session.rollback()
         return jsonify({"message": "Error managing departments", "error": str(e)}), 500
 
-@app.route('/api/admin/patients/<int:patient_id>', methods=['PUT', 'DELETE'])
+@bp.route('/api/admin/patients/<int:patient_id>', methods=['PUT', 'DELETE'])
 @auth_required('token')
 @roles_accepted('admin')
 def update_delete_patient(patient_id):
@@ -386,92 +472,44 @@ def update_delete_patient(patient_id):
         db.session.rollback()
         return jsonify({"message": "Error updating/deleting patient", "error": str(e)}), 500
 
-@app.route('/api/admin/patients', methods=['GET'])
+@bp.route('/api/admin/patients', methods=['GET'])
 @auth_required('token')
 @roles_accepted('admin')
 def get_all_patients():
     try:
-        patients = Patient.query.join(User).filter(Patient.is_active == True).all()
-        patients_list = []
-        for patient in patients:
-            patients_list.append({
-                'id': patient.id,
-                'user_id': patient.user_id,
-                'name': patient.user.name,
-                'email': patient.user.email,
-                'phone': patient.user.phone,
-                'address': patient.user.address,
-                'pincode': patient.user.pincode,
-                'date_of_birth': patient.date_of_birth.strftime('%Y-%m-%d') if patient.date_of_birth else None,
-                'gender': patient.gender,
-                'blood_group': patient.blood_group,
-                'medical_history': patient.medical_history,
-                'emergency_contact': patient.emergency_contact
-            })
-        return jsonify(patients_list), 200
+        query = Patient.query.filter(Patient.is_active == True)
+        if wants_stream():
+            return stream(query, serializers.patient_full, [(Patient.id, 'asc')])
+        page = paginate(serializers.patient_full.load(query), [(Patient.id, 'asc')])
+        return jsonify(serializers.patient_full.many(page.items)), 200, page.headers()
+    except InvalidCursor as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": "Error fetching patients", "error": str(e)}), 500
 
-@app.route('/api/admin/patient-history/<int:patient_id>', methods=['GET'])
+@bp.route('/api/admin/patient-history/<int:patient_id>', methods=['GET'])
 @auth_required('token')
 @roles_accepted('admin')
 def admin_patient_history(patient_id):
     try:
-        patient = Patient.query.get_or_404(patient_id)
-        appointments = Appointment.query.filter(
+        patient = serializers.patient_contact.load(Patient.query).filter(Patient.id == patient_id).first_or_404()
+        appointments = serializers.admin_history_entry.load(Appointment.query).filter(
             Appointment.patient_id == patient_id
         ).order_by(Appointment.date.desc(), Appointment.time.desc()).all()
         
-        history = []
-        for apt in appointments:
-            entry = {
-                'appointment_id': apt.id,
-                'date': apt.date.strftime('%Y-%m-%d'),
-                'time': apt.time.strftime('%H:%M'),
-                'status': apt.status,
-                'doctor_name': apt.doctor.user.name,
-                'doctor_specialization': apt.doctor.specialization,
-                'reason': apt.reason
-            }
-            if apt.treatment:
-                entry.update({
-                    'diagnosis': apt.treatment.diagnosis,
-                    'prescription': apt.treatment.prescription,
-                    'notes': apt.treatment.notes
-                })
-            history.append(entry)
-        
-        patient_info = {
-            'id': patient.id,
-            'name': patient.user.name,
-            'email': patient.user.email,
-            'phone': patient.user.phone,
-            'address': patient.user.address,
-        }
+        history = serializers.admin_history_entry.many(appointments)
+        patient_info = serializers.patient_contact(patient)
         
         return jsonify({ 'patient': patient_info, 'history': history }), 200
     except Exception as e:
         return jsonify({"message": "Error fetching patient history", "error": str(e)}), 500
 
-@app.route('/api/admin/patients/<int:patient_id>', methods=['GET'])
+@bp.route('/api/admin/patients/<int:patient_id>', methods=['GET'])
 @auth_required('token')
 @roles_accepted('admin')
 def get_single_patient(patient_id):
     try:
-        patient = Patient.query.get_or_404(patient_id)
-        return jsonify({
-            'id': patient.id,
-            'user_id': patient.user_id,
-            'name': patient.user.name,
-            'email': patient.user.email,
-            'phone': patient.user.phone,
-            'address': patient.user.address,
-            'pincode': patient.user.pincode,
-            'date_of_birth': patient.date_of_birth.strftime('%Y-%m-%d') if patient.date_of_birth else None,
-            'gender': patient.gender,
-            'blood_group': patient.blood_group,
-            'medical_history': patient.medical_history,
-            'emergency_contact': patient.emergency_contact
-        }), 200
+        patient = serializers.patient_full.load(Patient.query).filter(Patient.id == patient_id).first_or_404()
+        return jsonify(serializers.patient_full(patient)), 200
     except Exception as e:
         return jsonify({"message": "Error fetching patient", "error": str(e)}), 500
\ No newline at end of file
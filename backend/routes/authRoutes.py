@@ -1,13 +1,15 @@
-from flask import current_app as app, jsonify, request
-from flask_security import login_user, hash_password, verify_password, auth_required, logout_user
+from flask import Blueprint, current_app as app, jsonify, request
+from flask_security import login_user, auth_required, logout_user, current_user
 from  ..extensions import db
+from ..authCache import token_cache
+from ..passwords import password_hasher, PasswordHasherBusy
 from ..models import Patient
 import re
 from datetime import datetime
 
-datastore = app.security.datastore
+bp = Blueprint('auth', __name__)
 
-@app.route('/api/login', methods=['POST'])
+@bp.route('/api/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
@@ -22,23 +24,30 @@ def login():
         user = app.security.datastore.find_user(email=email)
         if not user:
             return jsonify({"message": "User not found"}), 404
-        if not verify_password(password, user.password):
+        if not password_hasher.verify(password, user):
             return jsonify({"message": "Invalid credentials"}), 401
         
         login_user(user)
+        # Also saves a password rehashed with the current cost
+        db.session.commit()
         user_role = user.roles[0].name
+        auth_token = user.get_auth_token()
+        # Roles are loaded now, so the first authenticated request is a cache hit
+        token_cache.put(auth_token, user)
         return jsonify({
             "message": "Login successful",
-            "auth_token": user.get_auth_token(),
+            "auth_token": auth_token,
             "user_id": user.id,
             "user_role": user_role,
         }), 200
         
+    except PasswordHasherBusy as e:
+        return jsonify({"message": str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({"message": "Problem in Login", "error": str(e)}), 500
     
     
-@app.route('/api/register', methods=['POST'])
+@bp.route('/api/register', methods=['POST'])
 def register():
     try:
         data = request.get_json()
@@ -82,7 +91,7 @@ def register():
         # 4. Create User
         user = app.security.datastore.create_user(
             email=email,
-            password=hash_password(password),
+            password=password_hasher.hash(password),
             name=name,
             address=address,
             pincode=pincode,
@@ -117,13 +126,17 @@ def register():
             "user_id": user.id
         }), 201
 
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({"message": str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback() # Undo changes if error occurs
         print(f"Registration Error: {e}") # Print to server console for debugging
         return jsonify({"message": "Internal Error in registration", "error": str(e)}), 500
     
-@app.route('/api/logout', methods=['POST'])
+@bp.route('/api/logout', methods=['POST'])
 @auth_required('token')
 def logout():
+    token_cache.invalidate_user(current_user.id)
     logout_user()
     return jsonify({"message": "Logged out successfully"}), 200
\ No newline at end of file
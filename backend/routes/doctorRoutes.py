@@ -1,75 +1,51 @@
-from flask import current_app as app, jsonify, request
+from flask import Blueprint, current_app as app, jsonify, request, g
 from flask_security import auth_required, roles_accepted, current_user
 from ..extensions import db
-from ..models import User, Doctor, Patient, Appointment, Treatment, DoctorAvailability
+from ..profiles import profile_required
+from ..slotInventory import slot_inventory
+from ..availability import sync_availability, SlotConflict
+from ..schedules import rematerialize, template_windows
+from .. import etags, serializers, stats
+from ..models import User, Doctor, Patient, Appointment, Treatment, DoctorAvailability, DoctorPatientStat, ScheduleTemplate, ScheduleException, ScheduleHorizon
 from datetime import date, datetime, timedelta, time as dt_time
 from sqlalchemy import or_
 
-@app.route('/api/doctor/dashboard', methods=['GET'])
+bp = Blueprint('doctor', __name__)
+
+@bp.route('/api/doctor/dashboard', methods=['GET'])
 @auth_required('token')
 @roles_accepted('doctor')
+@profile_required(Doctor)
 def doctor_dashboard():
     try:
-        doctor = Doctor.query.filter_by(user_id=current_user.id).first()
-        if not doctor:
-            return jsonify({"message": "Doctor profile not found"}), 404
+        doctor_id = g.profile_id
         
         today = date.today()
         week_start = today
         week_end = today + timedelta(days=7)
         
-        # Today's appointments
-        today_appointments = Appointment.query.filter(
-            Appointment.doctor_id == doctor.id,
-            Appointment.date == today,
-            Appointment.status == 'Booked'
-        ).count()
-        
-        # Week's appointments
-        week_appointments = Appointment.query.filter(
-            Appointment.doctor_id == doctor.id,
-            Appointment.date >= week_start,
-            Appointment.date <= week_end,
-            Appointment.status == 'Booked'
-        ).count()
+        # Today's and the week's appointments, from the per-day counters
+        today_appointments = stats.booked_count(today, today, doctor_id)
+        week_appointments = stats.booked_count(week_start, week_end, doctor_id)
         
         # Upcoming appointments
-        upcoming = Appointment.query.filter(
-            Appointment.doctor_id == doctor.id,
+        upcoming = serializers.doctor_upcoming_appointment.load(Appointment.query).filter(
+            Appointment.doctor_id == doctor_id,
             Appointment.date >= today,
             Appointment.status == 'Booked'
         ).order_by(Appointment.date.asc(), Appointment.time.asc()).limit(10).all()
         
-        upcoming_list = []
-        for apt in upcoming:
-            upcoming_list.append({
-                'id': apt.id,
-                'patient_id': apt.patient_id,
-                'patient_name': apt.patient.user.name,
-                'patient_email': apt.patient.user.email,
-                'patient_phone': apt.patient.user.phone,
-                'date': apt.date.strftime('%Y-%m-%d'),
-                'time': apt.time.strftime('%H:%M'),
-                'status': apt.status,
-                'reason': apt.reason
-            })
+        upcoming_list = serializers.doctor_upcoming_appointment.many(upcoming)
         
         # Assigned patients
-        patients_query = db.session.query(Patient).join(Appointment).filter(
-            Appointment.doctor_id == doctor.id
-        ).distinct().all()
-        
-        patients_list = []
-        for patient in patients_query:
-            patients_list.append({
-                'id': patient.id,
-                'name': patient.user.name,
-                'email': patient.user.email,
-                'phone': patient.user.phone,
-                'date_of_birth': patient.date_of_birth.strftime('%Y-%m-%d') if patient.date_of_birth else None,
-                'gender': patient.gender,
-                'blood_group': patient.blood_group
-            })
+        patients_query = serializers.assigned_patient.load(db.session.query(Patient)).join(
+            DoctorPatientStat, DoctorPatientStat.patient_id == Patient.id
+        ).filter(
+            DoctorPatientStat.doctor_id == doctor_id,
+            DoctorPatientStat.appointments > 0
+        ).order_by(Patient.id).all()
+        
+        patients_list = serializers.assigned_patient.many(patients_query)
         
         return jsonify({
             'today_appointments': today_appointments,
@@ -81,19 +57,18 @@ def doctor_dashboard():
     except Exception as e:
         return jsonify({"message": "Error fetching dashboard data", "error": str(e)}), 500
 
-@app.route('/api/doctor/appointments', methods=['GET'])
+@bp.route('/api/doctor/appointments', methods=['GET'])
 @auth_required('token')
 @roles_accepted('doctor')
+@profile_required(Doctor)
 def doctor_appointments():
     try:
-        doctor = Doctor.query.filter_by(user_id=current_user.id).first()
-        if not doctor:
-            return jsonify({"message": "Doctor profile not found"}), 404
+        doctor_id = g.profile_id
         
         status_filter = request.args.get('status')
         date_filter = request.args.get('date')
         
-        query = Appointment.query.filter(Appointment.doctor_id == doctor.id)
+        query = serializers.doctor_appointment.load(Appointment.query).filter(Appointment.doctor_id == doctor_id)
         
         if status_filter:
             query = query.filter(Appointment.status == status_filter)
@@ -104,50 +79,22 @@ def doctor_appointments():
         
         appointments = query.order_by(Appointment.date.asc(), Appointment.time.asc()).all()
         
-        appointments_list = []
-        for apt in appointments:
-            treatment_info = None
-            if apt.treatment:
-                treatment_info = {
-                    'diagnosis': apt.treatment.diagnosis,
-                    'prescription': apt.treatment.prescription,
-                    'notes': apt.treatment.notes
-                }
-            
-            appointments_list.append({
-                'id': apt.id,
-                'patient_id': apt.patient_id,
-                'patient_name': apt.patient.user.name,
-                'patient_email': apt.patient.user.email,
-                'patient_phone': apt.patient.user.phone,
-                'date_of_birth': apt.patient.date_of_birth.strftime('%Y-%m-%d') if apt.patient.date_of_birth else None,
-                'gender': apt.patient.gender,
-                'blood_group': apt.patient.blood_group,
-                'medical_history': apt.patient.medical_history,
-                'date': apt.date.strftime('%Y-%m-%d'),
-                'time': apt.time.strftime('%H:%M'),
-                'status': apt.status,
-                'reason': apt.reason,
-                'treatment': treatment_info
-            })
-        
-        return jsonify(appointments_list), 200
+        return jsonify(serializers.doctor_appointment.many(appointments)), 200
         
     except Exception as e:
         return jsonify({"message": "Error fetching appointments", "error": str(e)}), 500
 
-@app.route('/api/doctor/appointments/<int:appointment_id>', methods=['PUT'])
+@bp.route('/api/doctor/appointments/<int:appointment_id>', methods=['PUT'])
 @auth_required('token')
 @roles_accepted('doctor')
+@profile_required(Doctor)
 def update_appointment_status(appointment_id):
     try:
-        doctor = Doctor.query.filter_by(user_id=current_user.id).first()
-        if not doctor:
-            return jsonify({"message": "Doctor profile not found"}), 404
+        doctor_id = g.profile_id
         
         appointment = Appointment.query.get_or_404(appointment_id)
         
-        if appointment.doctor_id != doctor.id:
+        if appointment.doctor_id != doctor_id:
             return jsonify({"message": "Unauthorized"}), 403
         
         data = request.get_json()
@@ -158,8 +105,10 @@ def update_appointment_status(appointment_id):
         
         appointment.status = new_status
         appointment.updated_at = datetime.utcnow()
+        etags.bump(etags.patient_appointments(appointment.patient_id), etags.doctor_slots(doctor_id))
         
         db.session.commit()
+        slot_inventory.slot_changed(doctor_id, appointment.date, appointment.time, new_status)
         
         return jsonify({"message": "Appointment status updated successfully"}), 200
         
@@ -167,21 +116,20 @@ def update_appointment_status(appointment_id):
         db.session.rollback()
         return jsonify({"message": "Error updating appointment", "error": str(e)}), 500
 
-@app.route('/api/doctor/treatment', methods=['POST', 'PUT'])
+@bp.route('/api/doctor/treatment', methods=['POST', 'PUT'])
 @auth_required('token')
 @roles_accepted('doctor')
+@profile_required(Doctor)
 def manage_treatment():
     try:
-        doctor = Doctor.query.filter_by(user_id=current_user.id).first()
-        if not doctor:
-            return jsonify({"message": "Doctor profile not found"}), 404
+        doctor_id = g.profile_id
         
         data = request.get_json()
         appointment_id = data.get('appointment_id')
         
         appointment = Appointment.query.get_or_404(appointment_id)
         
-        if appointment.doctor_id != doctor.id:
+        if appointment.doctor_id != doctor_id:
             return jsonify({"message": "Unauthorized"}), 403
         
         if request.method == 'POST':
@@ -197,7 +145,9 @@ def manage_treatment():
             db.session.add(treatment)
             appointment.status = 'Completed'
             appointment.updated_at = datetime.utcnow()
+            etags.bump(etags.patient_appointments(appointment.patient_id), etags.doctor_slots(doctor_id))
             db.session.commit()
+            slot_inventory.slot_changed(doctor_id, appointment.date, appointment.time, 'Completed')
             
             return jsonify({"message": "Treatment record created successfully"}), 201
         
@@ -214,6 +164,7 @@ def manage_treatment():
                 treatment.notes = data['notes']
             
             treatment.updated_at = datetime.utcnow()
+            etags.bump(etags.patient_appointments(appointment.patient_id))
             db.session.commit()
             
             return jsonify({"message": "Treatment record updated successfully"}), 200
@@ -222,111 +173,52 @@ def manage_treatment():
         db.session.rollback()
         return jsonify({"message": "Error managing treatment", "error": str(e)}), 500
 
-@app.route('/api/doctor/patient-history/<int:patient_id>', methods=['GET'])
+@bp.route('/api/doctor/patient-history/<int:patient_id>', methods=['GET'])
 @auth_required('token')
 @roles_accepted('doctor')
+@profile_required(Doctor)
 def patient_history(patient_id):
     try:
-        doctor = Doctor.query.filter_by(user_id=current_user.id).first()
-        if not doctor:
-            return jsonify({"message": "Doctor profile not found"}), 404
+        doctor_id = g.profile_id
         
-        patient = Patient.query.get_or_404(patient_id)
+        patient = serializers.patient_medical.load(Patient.query).filter(Patient.id == patient_id).first_or_404()
         
         # Get all appointments with this doctor
-        appointments = Appointment.query.filter(
+        appointments = serializers.doctor_history_entry.load(Appointment.query).filter(
             Appointment.patient_id == patient_id,
-            Appointment.doctor_id == doctor.id
+            Appointment.doctor_id == doctor_id
         ).order_by(Appointment.date.desc(), Appointment.time.desc()).all()
         
-        history = []
-        for apt in appointments:
-            treatment_info = None
-            if apt.treatment:
-                treatment_info = {
-                    'diagnosis': apt.treatment.diagnosis,
-                    'prescription': apt.treatment.prescription,
-                    'notes': apt.treatment.notes,
-                    'created_at': apt.treatment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'updated_at': apt.treatment.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-                }
-            
-            history.append({
-                'appointment_id': apt.id,
-                'date': apt.date.strftime('%Y-%m-%d'),
-                'time': apt.time.strftime('%H:%M'),
-                'status': apt.status,
-                'reason': apt.reason,
-                'treatment': treatment_info
-            })
-        
-        patient_info = {
-            'id': patient.id,
-            'name': patient.user.name,
-            'email': patient.user.email,
-            'phone': patient.user.phone,
-            'date_of_birth': patient.date_of_birth.strftime('%Y-%m-%d') if patient.date_of_birth else None,
-            'gender': patient.gender,
-            'blood_group': patient.blood_group,
-            'medical_history': patient.medical_history,
-            'emergency_contact': patient.emergency_contact
-        }
-        
         return jsonify({
-            'patient': patient_info,
-            'history': history
+            'patient': serializers.patient_medical(patient),
+            'history': serializers.doctor_history_entry.many(appointments)
         }), 200
         
     except Exception as e:
         return jsonify({"message": "Error fetching patient history", "error": str(e)}), 500
 
-@app.route('/api/doctor/availability', methods=['GET', 'POST'])
+@bp.route('/api/doctor/availability', methods=['GET', 'POST'])
 @auth_required('token')
 @roles_accepted('doctor')
+@profile_required(Doctor)
+@etags.conditional(etags.doctor_slots)
 def manage_availability():
     try:
-        doctor = Doctor.query.filter_by(user_id=current_user.id).first()
-        if not doctor:
-            return jsonify({"message": "Doctor profile not found"}), 404
+        doctor_id = g.profile_id
         
         if request.method == 'GET':
-            days = int(request.args.get('days', 7))
+            # Never past the schedule horizon, which is as far as slots are materialized
+            days = max(1, min(request.args.get('days', 7, type=int), app.config['SCHEDULE_HORIZON_DAYS']))
             start_date = date.today() + timedelta(days=1)
             end_date = start_date + timedelta(days=days-1)
             
-            availabilities = DoctorAvailability.query.filter(
-                DoctorAvailability.doctor_id == doctor.id,
-                DoctorAvailability.date >= start_date,
-                DoctorAvailability.date <= end_date
-            ).order_by(DoctorAvailability.date.asc(), DoctorAvailability.start_time.asc()).all()
-            
             availability_dict = {}
-            for avail in availabilities:
-                date_str = avail.date.strftime('%Y-%m-%d')
-                if date_str not in availability_dict:
-                    availability_dict[date_str] = []
-                
-                # Check if slot is Booked OR Completed
-                # We use in_ to check multiple statuses
-                appointment = Appointment.query.filter(
-                    Appointment.doctor_id == doctor.id,
-                    Appointment.date == avail.date,
-                    Appointment.time == avail.start_time,
-                    Appointment.status.in_(['Booked', 'Completed'])
-                ).first()
-                
-                status = 'Available'
-                if appointment:
-                    status = appointment.status
-
-                availability_dict[date_str].append({
-                    'id': avail.id,
-                    'start_time': avail.start_time.strftime('%H:%M'),
-                    'end_time': avail.end_time.strftime('%H:%M'),
-                    'is_available': avail.is_available and not appointment,
-                    'is_booked': appointment is not None,
-                    'status': status
-                })
+            version = etags.seen_version(etags.doctor_slots(doctor_id))
+            for day, entries in slot_inventory.day_slots(doctor_id, start_date, end_date, version).items():
+                availability_dict[serializers.format_date(day)] = [
+                    dict(entry, start_time=serializers.format_time(entry['start_time']), end_time=serializers.format_time(entry['end_time']))
+                    for entry in entries
+                ]
             
             return jsonify(availability_dict), 200
         
@@ -334,43 +226,170 @@ def manage_availability():
             data = request.get_json()
             availabilities = data.get('availabilities', [])
             
-            # --- FIX: ROBUST DELETION ---
             # To prevent Unique Constraint violations due to timezone mismatches between client/server,
-            # we widen the deletion window to cover Today + 14 days. 
-            # This ensures we clear any existing slots in the target range before re-inserting.
-            delete_start = date.today()
-            delete_end = delete_start + timedelta(days=14)
+            # the window of slots replaced by this post is Today + 14 days.
+            window_start = date.today()
+            window_end = window_start + timedelta(days=14)
             
-            DoctorAvailability.query.filter(
-                DoctorAvailability.doctor_id == doctor.id,
-                DoctorAvailability.date >= delete_start,
-                DoctorAvailability.date <= delete_end
-            ).delete(synchronize_session=False)
-            
-            # Add new availabilities
+            slots = []
             for avail_data in availabilities:
                 try:
-                    avail_date = datetime.strptime(avail_data['date'], '%Y-%m-%d').date()
-                    start_time = datetime.strptime(avail_data['start_time'], '%H:%M').time()
-                    end_time = datetime.strptime(avail_data['end_time'], '%H:%M').time()
-                    
-                    availability = DoctorAvailability(
-                        doctor_id=doctor.id,
-                        date=avail_date,
-                        start_time=start_time,
-                        end_time=end_time,
-                        is_available=True 
-                    )
-                    db.session.add(availability)
+                    slots.append((
+                        datetime.strptime(avail_data['date'], '%Y-%m-%d').date(),
+                        datetime.strptime(avail_data['start_time'], '%H:%M').time(),
+                        datetime.strptime(avail_data['end_time'], '%H:%M').time()
+                    ))
                 except ValueError:
                     continue # Skip malformed dates
             
+            # Only the difference against the stored slots is written
+            try:
+                changes = sync_availability(doctor_id, slots, window_start, window_end)
+            except SlotConflict as e:
+                db.session.rollback()
+                return jsonify({
+                    "message": str(e),
+                    "booked_slots": [{'date': day.strftime('%Y-%m-%d'), 'start_time': start.strftime('%H:%M')} for day, start in e.slots]
+                }), 409
+            
+            changed = changes['inserted'] or changes['updated'] or changes['deleted']
+            if changed:
+                etags.bump(etags.doctor_slots(doctor_id))
             db.session.commit()
+            if changed:
+                slot_inventory.invalidate(doctor_id)
             
-            return jsonify({"message": "Availability updated successfully"}), 200
+            return jsonify(dict(changes, message="Availability updated successfully")), 200
             
     except Exception as e:
         db.session.rollback()
         # Log the specific error to help with debugging if it persists
         print(f"Error in manage_availability: {str(e)}") 
-        return jsonify({"message": "Error managing availability", "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"message": "Error managing availability", "error": str(e)}), 500
+
+def _parse_time(value):
+    return datetime.strptime(value, '%H:%M').time()
+
+def _schedule_changed(doctor_id, previous=(), day=None):
+    """Re-materializes the doctor's upcoming slots after a template or
+    exception change (see rematerialize for `previous` and `day`) and commits,
+    answering 409 if that would drop a booking."""
+    try:
+        changes = rematerialize(doctor_id, previous, day)
+    except SlotConflict as e:
+        db.session.rollback()
+        return jsonify({
+            "message": str(e),
+            "booked_slots": [{'date': day.strftime('%Y-%m-%d'), 'start_time': start.strftime('%H:%M')} for day, start in e.slots]
+        }), 409
+    changed = changes['inserted'] or changes['updated'] or changes['deleted']
+    if changed:
+        etags.bump(etags.doctor_slots(doctor_id))
+    db.session.commit()
+    if changed:
+        slot_inventory.invalidate(doctor_id)
+    return jsonify(dict(changes, message="Schedule updated successfully")), 200
+
+@bp.route('/api/doctor/schedule', methods=['GET', 'PUT'])
+@auth_required('token')
+@roles_accepted('doctor')
+@profile_required(Doctor)
+def manage_schedule():
+    try:
+        doctor_id = g.profile_id
+        
+        if request.method == 'GET':
+            templates = ScheduleTemplate.query.filter_by(doctor_id=doctor_id).order_by(ScheduleTemplate.weekday, ScheduleTemplate.start_time).all()
+            exceptions = ScheduleException.query.filter(
+                ScheduleException.doctor_id == doctor_id,
+                ScheduleException.date >= date.today()
+            ).order_by(ScheduleException.date, ScheduleException.start_time).all()
+            horizon = db.session.get(ScheduleHorizon, doctor_id)
+            
+            return jsonify({
+                'templates': [serializers.schedule_template(t) for t in templates],
+                'exceptions': [serializers.schedule_exception(e) for e in exceptions],
+                'materialized_until': horizon.materialized_until.strftime('%Y-%m-%d') if horizon else None
+            }), 200
+        
+        elif request.method == 'PUT':
+            # Replaces the weekly templates, e.g. [{"weekday": 0, "start_time": "09:00", "end_time": "17:00", "slot_minutes": 60}]
+            data = request.get_json()
+            templates = []
+            for item in data.get('templates', []):
+                try:
+                    template = ScheduleTemplate(
+                        doctor_id=doctor_id,
+                        weekday=int(item['weekday']),
+                        start_time=_parse_time(item['start_time']),
+                        end_time=_parse_time(item['end_time']),
+                        slot_minutes=int(item.get('slot_minutes', 60))
+                    )
+                except (KeyError, TypeError, ValueError):
+                    return jsonify({"message": "Each template needs weekday, start_time and end_time (HH:MM)"}), 400
+                if not 0 <= template.weekday <= 6 or template.start_time >= template.end_time or not 5 <= template.slot_minutes <= 480:
+                    return jsonify({"message": "Invalid template", "template": item}), 400
+                templates.append(template)
+            
+            previous = template_windows(ScheduleTemplate.query.filter_by(doctor_id=doctor_id).all())
+            ScheduleTemplate.query.filter_by(doctor_id=doctor_id).delete(synchronize_session=False)
+            db.session.add_all(templates)
+            db.session.flush()
+            
+            return _schedule_changed(doctor_id, previous)
+            
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": "Error managing schedule", "error": str(e)}), 500
+
+@bp.route('/api/doctor/schedule/exceptions', methods=['POST'])
+@auth_required('token')
+@roles_accepted('doctor')
+@profile_required(Doctor)
+def add_schedule_exception():
+    try:
+        doctor_id = g.profile_id
+        data = request.get_json()
+        
+        try:
+            exception = ScheduleException(
+                doctor_id=doctor_id,
+                date=datetime.strptime(data['date'], '%Y-%m-%d').date(),
+                start_time=_parse_time(data['start_time']) if data.get('start_time') else None,
+                end_time=_parse_time(data['end_time']) if data.get('end_time') else None,
+                reason=data.get('reason')
+            )
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"message": "A date (YYYY-MM-DD) is required; times are HH:MM"}), 400
+        if exception.start_time and exception.end_time and exception.start_time >= exception.end_time:
+            return jsonify({"message": "start_time must be before end_time"}), 400
+        
+        db.session.add(exception)
+        db.session.flush()
+        
+        return _schedule_changed(doctor_id, day=exception.date)
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": "Error adding schedule exception", "error": str(e)}), 500
+
+@bp.route('/api/doctor/schedule/exceptions/<int:exception_id>', methods=['DELETE'])
+@auth_required('token')
+@roles_accepted('doctor')
+@profile_required(Doctor)
+def delete_schedule_exception(exception_id):
+    try:
+        doctor_id = g.profile_id
+        
+        exception = db.session.get(ScheduleException, exception_id)
+        if not exception or exception.doctor_id != doctor_id:
+            return jsonify({"message": "Schedule exception not found"}), 404
+        
+        db.session.delete(exception)
+        db.session.flush()
+        
+        return _schedule_changed(doctor_id, day=exception.date)
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": "Error deleting schedule exception", "error": str(e)}), 500
\ No newline at end of file
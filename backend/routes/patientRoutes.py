@@ -1,76 +1,46 @@
-from flask import current_app as app, jsonify, request
+from flask import Blueprint, current_app as app, jsonify, request, g
 from flask_security import auth_required, roles_accepted, current_user
 from ..extensions import db
+from ..profiles import profile_required, resolve_profile
+from ..pagination import paginate, InvalidCursor
+from .. import etags, serializers
+from ..referenceData import department_summaries, specializations_matching
+from ..slotInventory import slot_inventory
+from ..schedules import materialize, horizon_end
+from ..booking import book_slot, reschedule, SlotTaken, SlotNotOffered, NotBooked
 from ..models import User, Doctor, Patient, Department, Appointment, Treatment, DoctorAvailability
 from datetime import date, datetime, timedelta
 
-@app.route('/api/patient/dashboard', methods=['GET'])
+bp = Blueprint('patient', __name__)
+
+@bp.route('/api/patient/dashboard', methods=['GET'])
 @auth_required('token')
 @roles_accepted('patient')
+@profile_required(Patient)
+@etags.conditional(etags.DEPARTMENTS, etags.DOCTORS, etags.patient_appointments)
 def patient_dashboard():
     try:
-        patient = Patient.query.filter_by(user_id=current_user.id).first()
-        if not patient:
-            return jsonify({"message": "Patient profile not found"}), 404
+        patient_id = g.profile_id
         
         # Get all departments
-        departments = Department.query.all()
-        dept_list = []
-        for dept in departments:
-            dept_list.append({
-                'id': dept.id,
-                'name': dept.name,
-                'description': dept.description,
-                'doctors_registered': dept.doctors_registered
-            })
+        dept_list = department_summaries((etags.seen_version(etags.DEPARTMENTS), etags.seen_version(etags.DOCTORS)))
         
         # Get upcoming appointments
-        upcoming = Appointment.query.filter(
-            Appointment.patient_id == patient.id,
+        upcoming = serializers.patient_upcoming_appointment.load(Appointment.query).filter(
+            Appointment.patient_id == patient_id,
             Appointment.date >= date.today(),
             Appointment.status == 'Booked'
         ).order_by(Appointment.date.asc(), Appointment.time.asc()).all()
         
-        upcoming_list = []
-        for apt in upcoming:
-            upcoming_list.append({
-                'id': apt.id,
-                'doctor_id': apt.doctor_id,
-                'doctor_name': apt.doctor.user.name,
-                'doctor_specialization': apt.doctor.specialization,
-                'date': apt.date.strftime('%Y-%m-%d'),
-                'time': apt.time.strftime('%H:%M'),
-                'status': apt.status,
-                'reason': apt.reason
-            })
+        upcoming_list = serializers.patient_upcoming_appointment.many(upcoming)
         
         # Get past appointments
-        past = Appointment.query.filter(
-            Appointment.patient_id == patient.id,
+        past = serializers.patient_past_appointment.load(Appointment.query).filter(
+            Appointment.patient_id == patient_id,
             Appointment.date < date.today()
         ).order_by(Appointment.date.desc(), Appointment.time.desc()).limit(10).all()
         
-        past_list = []
-        for apt in past:
-            treatment_info = None
-            if apt.treatment:
-                treatment_info = {
-                    'diagnosis': apt.treatment.diagnosis,
-                    'prescription': apt.treatment.prescription,
-                    'notes': apt.treatment.notes
-                }
-            
-            past_list.append({
-                'id': apt.id,
-                'doctor_id': apt.doctor_id,
-                'doctor_name': apt.doctor.user.name,
-                'doctor_specialization': apt.doctor.specialization,
-                'date': apt.date.strftime('%Y-%m-%d'),
-                'time': apt.time.strftime('%H:%M'),
-                'status': apt.status,
-                'reason': apt.reason,
-                'treatment': treatment_info
-            })
+        past_list = serializers.patient_past_appointment.many(past)
         
         return jsonify({
             'departments': dept_list,
@@ -81,7 +51,7 @@ def patient_dashboard():
     except Exception as e:
         return jsonify({"message": "Error fetching dashboard data", "error": str(e)}), 500
 
-@app.route('/api/patient/doctors', methods=['GET'])
+@bp.route('/api/patient/doctors', methods=['GET'])
 @auth_required('token')
 @roles_accepted('patient')
 def search_doctors():
@@ -99,104 +69,54 @@ def search_doctors():
         if department_id:
             query = query.filter(Doctor.department_id == department_id)
         
-        doctors = query.all()
+        doctors = serializers.doctor_listing.load(query).all()
         
         # Get availability for next 7 days
         start_date = date.today() + timedelta(days=1)
         end_date = start_date + timedelta(days=6)
         
-        doctors_list = []
-        for doctor in doctors:
-            availabilities = DoctorAvailability.query.filter(
-                DoctorAvailability.doctor_id == doctor.id,
-                DoctorAvailability.date >= start_date,
-                DoctorAvailability.date <= end_date,
-                DoctorAvailability.is_available == True
-            ).order_by(DoctorAvailability.date.asc(), DoctorAvailability.start_time.asc()).all()
-            
-            # Group by date
-            availability_dict = {}
-            for avail in availabilities:
-                # FIX: Check if slot is booked OR completed to prevent double booking or booking completed slots
-                appointment = Appointment.query.filter(
-                    Appointment.doctor_id == doctor.id,
-                    Appointment.date == avail.date,
-                    Appointment.time == avail.start_time,
-                    Appointment.status.in_(['Booked', 'Completed']) # Updated line
-                ).first()
-                
-                if not appointment:
-                    date_str = avail.date.strftime('%Y-%m-%d')
-                    if date_str not in availability_dict:
-                        availability_dict[date_str] = []
-                    availability_dict[date_str].append({
-                        'start_time': avail.start_time.strftime('%H:%M'),
-                        'end_time': avail.end_time.strftime('%H:%M')
-                    })
-            
-            doctors_list.append({
-                'id': doctor.id,
-                'name': doctor.user.name,
-                'email': doctor.user.email,
-                'specialization': doctor.specialization,
-                'department_id': doctor.department_id,
-                'department_name': doctor.department.name if doctor.department else None,
-                'qualification': doctor.qualification,
-                'experience': doctor.experience,
-                'bio': doctor.bio,
-                'availability': availability_dict
-            })
+        # Free slots come from the in-memory inventory, loaded in bulk on a miss
+        free_slots = slot_inventory.free_slots([doctor.id for doctor in doctors], start_date, end_date)
+        
+        availability_by_doctor = {}
+        for doctor_id, days in free_slots.items():
+            availability_by_doctor[doctor_id] = {
+                serializers.format_date(day): [
+                    {'start_time': serializers.format_time(start), 'end_time': serializers.format_time(end)}
+                    for start, end in slots
+                ]
+                for day, slots in days.items()
+            }
+        
+        doctors_list = [
+            dict(serializers.doctor_listing(doctor), availability=availability_by_doctor.get(doctor.id, {}))
+            for doctor in doctors
+        ]
         
         return jsonify(doctors_list), 200
         
     except Exception as e:
         return jsonify({"message": "Error searching doctors", "error": str(e)}), 500
 
-@app.route('/api/patient/appointments', methods=['GET', 'POST'])
+@bp.route('/api/patient/appointments', methods=['GET', 'POST'])
 @auth_required('token')
 @roles_accepted('patient')
+@profile_required(Patient)
+@etags.conditional(etags.DOCTORS, etags.patient_appointments)
 def manage_appointments():
     try:
-        patient = Patient.query.filter_by(user_id=current_user.id).first()
-        if not patient:
-            return jsonify({"message": "Patient profile not found"}), 404
+        patient_id = g.profile_id
         
         if request.method == 'GET':
             status_filter = request.args.get('status')
-            query = Appointment.query.filter(Appointment.patient_id == patient.id)
+            query = serializers.patient_appointment.load(Appointment.query).filter(Appointment.patient_id == patient_id)
             
             if status_filter:
                 query = query.filter(Appointment.status == status_filter)
-            else:
-                query = query.order_by(Appointment.date.desc(), Appointment.time.desc())
-            
-            appointments = query.all()
             
-            appointments_list = []
-            for apt in appointments:
-                treatment_info = None
-                if apt.treatment:
-                    treatment_info = {
-                        'diagnosis': apt.treatment.diagnosis,
-                        'prescription': apt.treatment.prescription,
-                        'notes': apt.treatment.notes
-                    }
-                
-                appointments_list.append({
-                    'id': apt.id,
-                    'doctor_id': apt.doctor_id,
-                    'doctor_name': apt.doctor.user.name,
-                    'doctor_specialization': apt.doctor.specialization,
-                    'doctor_email': apt.doctor.user.email,
-                    'date': apt.date.strftime('%Y-%m-%d'),
-                    'time': apt.time.strftime('%H:%M'),
-                    'status': apt.status,
-                    'reason': apt.reason,
-                    'treatment': treatment_info,
-                    'created_at': apt.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                })
+            page = paginate(query, [(Appointment.date, 'desc'), (Appointment.time, 'desc'), (Appointment.id, 'desc')])
             
-            return jsonify(appointments_list), 200
+            return jsonify(serializers.patient_appointment.many(page.items)), 200, page.headers()
         
         elif request.method == 'POST':
             data = request.get_json()
@@ -220,76 +140,46 @@ def manage_appointments():
             # Check if appointment date is in the past
             if apt_date < date.today():
                 return jsonify({"message": "Cannot book appointment in the past"}), 400
-            
-            # FIX: Check for ANY existing appointment at this slot (Booked, Cancelled, or Completed)
-            existing_appointment = Appointment.query.filter(
-                Appointment.doctor_id == doctor_id,
-                Appointment.date == apt_date,
-                Appointment.time == apt_time
-            ).first()
-            
-            if existing_appointment:
-                if existing_appointment.status == 'Booked':
-                    return jsonify({"message": "Time slot already booked"}), 409
-                elif existing_appointment.status == 'Completed':
-                    return jsonify({"message": "This slot is already completed"}), 409
-                elif existing_appointment.status == 'Cancelled':
-                    # Reactivate the cancelled appointment
-                    existing_appointment.status = 'Booked'
-                    existing_appointment.patient_id = patient.id
-                    existing_appointment.reason = reason
-                    existing_appointment.updated_at = datetime.utcnow()
-                    
-                    db.session.commit()
-                    return jsonify({
-                        "message": "Appointment booked successfully",
-                        "appointment_id": existing_appointment.id
-                    }), 201
-
-            # Check if doctor has availability (if no existing record was found/reused)
-            availability = DoctorAvailability.query.filter(
-                DoctorAvailability.doctor_id == doctor_id,
-                DoctorAvailability.date == apt_date,
-                DoctorAvailability.start_time == apt_time,
-                DoctorAvailability.is_available == True
-            ).first()
-            
-            if not availability:
-                return jsonify({"message": "Doctor not available at this time"}), 400
-            
-            # Create appointment
-            appointment = Appointment(
-                patient_id=patient.id,
-                doctor_id=doctor_id,
-                date=apt_date,
-                time=apt_time,
-                reason=reason,
-                status='Booked'
-            )
-            db.session.add(appointment)
+            if apt_date > horizon_end():
+                return jsonify({"message": f"Appointments can be booked up to {app.config['SCHEDULE_HORIZON_DAYS']} days ahead"}), 400
+            
+            # Claims the slot in one statement, or reactivates a cancelled appointment holding it
+            materialize([doctor.id], apt_date)
+            try:
+                appointment_id = book_slot(patient_id, doctor.id, apt_date, apt_time, reason)
+            except SlotTaken as e:
+                db.session.rollback()
+                return jsonify({"message": str(e)}), 409
+            except SlotNotOffered as e:
+                db.session.rollback()
+                return jsonify({"message": str(e)}), 400
+            
+            etags.bump(etags.patient_appointments(patient_id), etags.doctor_slots(doctor.id))
             db.session.commit()
+            slot_inventory.slot_changed(doctor.id, apt_date, apt_time, 'Booked')
             
             return jsonify({
                 "message": "Appointment booked successfully",
-                "appointment_id": appointment.id
+                "appointment_id": appointment_id
             }), 201
             
+    except InvalidCursor as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Error managing appointments", "error": str(e)}), 500
 
-@app.route('/api/patient/appointments/<int:appointment_id>', methods=['PUT', 'DELETE'])
+@bp.route('/api/patient/appointments/<int:appointment_id>', methods=['PUT', 'DELETE'])
 @auth_required('token')
 @roles_accepted('patient')
+@profile_required(Patient)
 def update_cancel_appointment(appointment_id):
     try:
-        patient = Patient.query.filter_by(user_id=current_user.id).first()
-        if not patient:
-            return jsonify({"message": "Patient profile not found"}), 404
+        patient_id = g.profile_id
         
         appointment = Appointment.query.get_or_404(appointment_id)
         
-        if appointment.patient_id != patient.id:
+        if appointment.patient_id != patient_id:
             return jsonify({"message": "Unauthorized"}), 403
         
         if request.method == 'PUT':  # Reschedule
@@ -307,25 +197,34 @@ def update_cancel_appointment(appointment_id):
             apt_date = datetime.strptime(new_date, '%Y-%m-%d').date()
             apt_time = datetime.strptime(new_time, '%H:%M').time()
             
-            # Check if new slot is available
-            existing = Appointment.query.filter(
-                Appointment.doctor_id == appointment.doctor_id,
-                Appointment.date == apt_date,
-                Appointment.time == apt_time,
-                Appointment.status == 'Booked',
-                Appointment.id != appointment_id
-            ).first()
-            
-            if existing:
-                return jsonify({"message": "Time slot already booked"}), 409
-            
-            # Update appointment
-            appointment.date = apt_date
-            appointment.time = apt_time
-            appointment.updated_at = datetime.utcnow()
+            if (apt_date, apt_time) == (appointment.date, appointment.time):
+                return jsonify({"message": "Appointment is already at this time"}), 400
+            if apt_date < date.today():
+                return jsonify({"message": "Cannot book appointment in the past"}), 400
+            if apt_date > horizon_end():
+                return jsonify({"message": f"Appointments can be booked up to {app.config['SCHEDULE_HORIZON_DAYS']} days ahead"}), 400
+            
+            # Claims the new slot the same way a booking does, then cancels this appointment
+            doctor_id, old_date, old_time = appointment.doctor_id, appointment.date, appointment.time
+            materialize([doctor_id], apt_date)
+            try:
+                new_appointment_id = reschedule(appointment, apt_date, apt_time)
+            except SlotTaken as e:
+                db.session.rollback()
+                return jsonify({"message": str(e)}), 409
+            except (SlotNotOffered, NotBooked) as e:
+                db.session.rollback()
+                return jsonify({"message": str(e)}), 400
+            
+            etags.bump(etags.patient_appointments(patient_id), etags.doctor_slots(doctor_id))
             db.session.commit()
+            slot_inventory.slot_changed(doctor_id, old_date, old_time, None)
+            slot_inventory.slot_changed(doctor_id, apt_date, apt_time, 'Booked')
             
-            return jsonify({"message": "Appointment rescheduled successfully"}), 200
+            return jsonify({
+                "message": "Appointment rescheduled successfully",
+                "appointment_id": new_appointment_id
+            }), 200
         
         elif request.method == 'DELETE':  # Cancel
             if appointment.status == 'Completed':
@@ -333,7 +232,9 @@ def update_cancel_appointment(appointment_id):
             
             appointment.status = 'Cancelled'
             appointment.updated_at = datetime.utcnow()
+            etags.bump(etags.patient_appointments(patient_id), etags.doctor_slots(appointment.doctor_id))
             db.session.commit()
+            slot_inventory.slot_changed(appointment.doctor_id, appointment.date, appointment.time, None)
             
             return jsonify({"message": "Appointment cancelled successfully"}), 200
             
@@ -341,46 +242,33 @@ def update_cancel_appointment(appointment_id):
         db.session.rollback()
         return jsonify({"message": "Error updating/cancelling appointment", "error": str(e)}), 500
 
-@app.route('/api/patient/treatment-history', methods=['GET'])
+@bp.route('/api/patient/treatment-history', methods=['GET'])
 @auth_required('token')
 @roles_accepted('patient')
+@profile_required(Patient)
 def treatment_history():
     try:
-        patient = Patient.query.filter_by(user_id=current_user.id).first()
-        if not patient:
-            return jsonify({"message": "Patient profile not found"}), 404
+        patient_id = g.profile_id
         
-        appointments = Appointment.query.filter(
-            Appointment.patient_id == patient.id,
+        appointments = serializers.treatment_record.load(Appointment.query).filter(
+            Appointment.patient_id == patient_id,
             Appointment.status == 'Completed'
         ).order_by(Appointment.date.desc(), Appointment.time.desc()).all()
         
-        history = []
-        for apt in appointments:
-            if apt.treatment:
-                history.append({
-                    'appointment_id': apt.id,
-                    'doctor_name': apt.doctor.user.name,
-                    'doctor_specialization': apt.doctor.specialization,
-                    'date': apt.date.strftime('%Y-%m-%d'),
-                    'time': apt.time.strftime('%H:%M'),
-                    'diagnosis': apt.treatment.diagnosis,
-                    'prescription': apt.treatment.prescription,
-                    'notes': apt.treatment.notes,
-                    'created_at': apt.treatment.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                })
+        history = [serializers.treatment_record(apt) for apt in appointments if apt.treatment]
         
         return jsonify(history), 200
         
     except Exception as e:
         return jsonify({"message": "Error fetching treatment history", "error": str(e)}), 500
 
-@app.route('/api/patient/profile', methods=['GET', 'PUT'])
+@bp.route('/api/patient/profile', methods=['GET', 'PUT'])
 @auth_required('token')
 @roles_accepted('patient')
 def patient_profile():
     try:
-        patient = Patient.query.filter_by(user_id=current_user.id).first()
+        patient_id = resolve_profile(Patient)
+        patient = db.session.get(Patient, patient_id, options=serializers.patient_full.options) if patient_id else None
         if not patient:
             # Create patient profile if it doesn't exist
             patient = Patient(user_id=current_user.id)
@@ -388,20 +276,7 @@ def patient_profile():
             db.session.commit()
         
         if request.method == 'GET':
-            return jsonify({
-                'id': patient.id,
-                'user_id': patient.user_id,
-                'name': patient.user.name,
-                'email': patient.user.email,
-                'phone': patient.user.phone,
-                'address': patient.user.address,
-                'pincode': patient.user.pincode,
-                'date_of_birth': patient.date_of_birth.strftime('%Y-%m-%d') if patient.date_of_birth else None,
-                'gender': patient.gender,
-                'blood_group': patient.blood_group,
-                'medical_history': patient.medical_history,
-                'emergency_contact': patient.emergency_contact
-            }), 200
+            return jsonify(serializers.patient_full(patient)), 200
         
         elif request.method == 'PUT':
             data = request.get_json()
@@ -438,7 +313,7 @@ def patient_profile():
         db.session.rollback()
         return jsonify({"message": "Error managing profile", "error": str(e)}), 500
 
-@app.route('/api/patient/search', methods=['GET'])
+@bp.route('/api/patient/search', methods=['GET'])
 @auth_required('token')
 @roles_accepted('patient')
 def patient_search():
@@ -450,29 +325,15 @@ def patient_search():
             return jsonify({"message": "Search term required"}), 400
         
         if search_type == 'specialization':
-            specializations = Doctor.query.filter(
-                Doctor.is_active == True,
-                Doctor.specialization.ilike(f'%{search_term}%')
-            ).distinct(Doctor.specialization).all()
-            
-            results = [{'specialization': doc.specialization} for doc in specializations]
-            return jsonify(results), 200
+            return jsonify(specializations_matching(search_term)), 200
         
         elif search_type == 'doctor':
-            doctors = Doctor.query.join(User).filter(
+            doctors = serializers.doctor_brief.load(Doctor.query.join(User)).filter(
                 Doctor.is_active == True,
                 User.name.ilike(f'%{search_term}%')
             ).all()
             
-            results = []
-            for doctor in doctors:
-                results.append({
-                    'id': doctor.id,
-                    'name': doctor.user.name,
-                    'specialization': doctor.specialization,
-                    'department': doctor.department.name if doctor.department else None
-                })
-            return jsonify(results), 200
+            return jsonify(serializers.doctor_brief.many(doctors)), 200
         
         return jsonify({"message": "Invalid search type"}), 400
         
@@ -0,0 +1,170 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from .extensions import db
+from .models import ScheduleTemplate, ScheduleException, ScheduleHorizon, DoctorAvailability
+from .availability import sync_availability
+from .upsert import dialect_insert
+from datetime import date, datetime, timedelta
+import click
+
+# Weekly templates are turned into DoctorAvailability rows only for dates that
+# are actually looked at: every read of the slot inventory (and every booking)
+# first extends the doctor's horizon up to the last date it needs, and
+# `flask extend-schedules` can push horizons ahead in the background. Days
+# already materialized are left alone, so manual edits to them stick, until the
+# doctor changes their templates or exceptions (see rematerialize); even then
+# only slots inside the template windows are rewritten.
+
+def template_slots(templates, exceptions, start_date, end_date):
+    """(date, start_time, end_time) of every slot the templates produce on
+    start_date..end_date, minus the exceptions."""
+    by_weekday = {}
+    for template in templates:
+        by_weekday.setdefault(template.weekday, []).append(template)
+    blocked = {}
+    for exception in exceptions:
+        blocked.setdefault(exception.date, []).append(exception)
+
+    slots = []
+    day = start_date
+    while day <= end_date:
+        for template in by_weekday.get(day.weekday(), ()):
+            step = timedelta(minutes=template.slot_minutes)
+            start = datetime.combine(day, template.start_time)
+            end = datetime.combine(day, template.end_time)
+            while start + step <= end:
+                slot_start, slot_end = start.time(), (start + step).time()
+                if not any(_covers(exception, slot_start, slot_end) for exception in blocked.get(day, ())):
+                    slots.append((day, slot_start, slot_end))
+                start += step
+        day += timedelta(days=1)
+    return slots
+
+def template_windows(templates):
+    """(weekday, start_time, end_time) of each template, which is all
+    rematerialize needs to know about templates that are being replaced."""
+    return [(template.weekday, template.start_time, template.end_time) for template in templates]
+
+def _in_windows(windows, day, slot_start, slot_end):
+    return any(weekday == day.weekday() and slot_start < end and slot_end > start for weekday, start, end in windows)
+
+def _covers(exception, slot_start, slot_end):
+    if exception.start_time is None:
+        return True
+    return slot_start < (exception.end_time or datetime.max.time()) and slot_end > exception.start_time
+
+def _templates_and_exceptions(doctor_ids, start_date, end_date):
+    templates = ScheduleTemplate.query.filter(ScheduleTemplate.doctor_id.in_(doctor_ids)).all()
+    exceptions = ScheduleException.query.filter(
+        ScheduleException.doctor_id.in_(doctor_ids),
+        ScheduleException.date >= start_date,
+        ScheduleException.date <= end_date
+    ).all()
+    return templates, exceptions
+
+def horizon_end():
+    """Last date that requests may materialize, book or list slots for."""
+    return date.today() + timedelta(days=current_app.config['SCHEDULE_HORIZON_DAYS'])
+
+def materialize(doctor_ids, until):
+    """Makes sure the templates of the given doctors are materialized up to
+    `until`, or horizon_end() if that comes first, so no request can make us
+    write slots for years ahead. Costs one query when every horizon is
+    already far enough; new slots are written in their own transaction with
+    ON CONFLICT DO NOTHING, so concurrent calls and existing rows are
+    harmless."""
+    return _materialize(doctor_ids, min(until, horizon_end()))
+
+def _materialize(doctor_ids, until):
+    today = date.today()
+    horizons = dict(db.session.query(ScheduleHorizon.doctor_id, ScheduleHorizon.materialized_until).filter(
+        ScheduleHorizon.doctor_id.in_(doctor_ids),
+        ScheduleHorizon.materialized_until < until
+    ).all())
+    if not horizons:
+        return 0
+    start_date = min(max(horizon + timedelta(days=1), today) for horizon in horizons.values())
+    templates, exceptions = _templates_and_exceptions(list(horizons), start_date, until)
+
+    rows = []
+    for doctor_id, horizon in horizons.items():
+        first = max(horizon + timedelta(days=1), today)
+        rows.extend(
+            {'doctor_id': doctor_id, 'date': day, 'start_time': start, 'end_time': end, 'is_available': True}
+            for day, start, end in template_slots(
+                [t for t in templates if t.doctor_id == doctor_id],
+                [e for e in exceptions if e.doctor_id == doctor_id],
+                first, until
+            )
+        )
+
+    with db.engine.begin() as conn:
+        if rows:
+            conn.execute(dialect_insert(conn, DoctorAvailability.__table__).on_conflict_do_nothing(
+                index_elements=['doctor_id', 'date', 'start_time']
+            ), rows)
+        _set_horizons(conn, {doctor_id: until for doctor_id in horizons})
+    return len(rows)
+
+def _set_horizons(conn, horizons):
+    stmt = dialect_insert(conn, ScheduleHorizon.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['doctor_id'],
+        set_={'materialized_until': stmt.excluded.materialized_until}
+    )
+    conn.execute(stmt, [{'doctor_id': doctor_id, 'materialized_until': until} for doctor_id, until in horizons.items()])
+
+def rematerialize(doctor_id, previous=(), day=None):
+    """Rewrites the doctor's already materialized days (today up to the
+    horizon) from their current templates and exceptions, through
+    sync_availability, so booked slots are never removed (SlotConflict).
+
+    Only slots overlapping a template window are rewritten: the current
+    templates' or `previous`, the template_windows() in place before a
+    template change. `day` limits the rewrite to the date of a changed
+    exception. Slots the doctor posted outside those windows are kept, and a
+    doctor without templates before or after has nothing to rewrite. A doctor
+    left without templates stops being materialized. Runs on the session's
+    connection; the caller commits."""
+    today = date.today()
+    horizon = db.session.get(ScheduleHorizon, doctor_id)
+    until = max(horizon.materialized_until if horizon else today, horizon_end())
+    start, end = (day, day) if day is not None else (today, until)
+    templates, exceptions = _templates_and_exceptions([doctor_id], start, end)
+    windows = template_windows(templates) + list(previous)
+    if not windows or not today <= start <= end <= until:
+        return {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    changes = sync_availability(doctor_id, template_slots(templates, exceptions, start, end), start, end,
+                                removable=lambda slot_day, slot_start, slot_end: _in_windows(windows, slot_day, slot_start, slot_end))
+
+    if day is not None:
+        # Days past the horizon are filled in by materialize() as usual
+        return changes
+    conn = db.session.connection()
+    if templates:
+        _set_horizons(conn, {doctor_id: until})
+    elif horizon:
+        db.session.delete(horizon)
+    return changes
+
+def extend_horizons(days):
+    """Materializes every templated doctor `days` ahead of today."""
+    doctor_ids = [doctor_id for (doctor_id,) in db.session.execute(select(ScheduleTemplate.doctor_id).distinct())]
+    if not doctor_ids:
+        return 0
+    # Doctors with templates but no horizon yet start from yesterday
+    missing = set(doctor_ids) - {doctor_id for (doctor_id,) in db.session.query(ScheduleHorizon.doctor_id)}
+    if missing:
+        with db.engine.begin() as conn:
+            _set_horizons(conn, {doctor_id: date.today() - timedelta(days=1) for doctor_id in missing})
+    # Not capped: the command may push past SCHEDULE_HORIZON_DAYS on purpose
+    return _materialize(doctor_ids, date.today() + timedelta(days=days))
+
+@click.command('extend-schedules')
+@click.option('--days', type=int, default=None, help='How far ahead to materialize (default SCHEDULE_HORIZON_DAYS).')
+@with_appcontext
+def extend_schedules_command(days):
+    """Materialize weekly schedule templates into availability slots."""
+    created = extend_horizons(days or current_app.config['SCHEDULE_HORIZON_DAYS'])
+    click.echo(f'{created} slot(s) materialized')
@@ -0,0 +1,150 @@
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, event, func, or_, text
+from sqlalchemy.orm import Session
+from .extensions import db
+from .models import User, Patient
+import click
+import re
+
+# Full-text index over the admin patient directory (name, email, phone).
+#
+# SQLite: an FTS5 table keyed by patient id, with prefix indexes so that each
+# search word can be matched as a prefix. It is rewritten for every patient or
+# user touched by a flush, inside the same transaction.
+#
+# PostgreSQL: a pg_trgm GIN index on the concatenated columns, which keeps
+# itself current, so substring ILIKE searches use it and rank by similarity.
+#
+# Anything else (or a term with no indexable words) falls back to ILIKE.
+
+FTS_TABLE = 'patient_search'
+TRGM_INDEX = 'ix_user_search_trgm'
+
+_FILL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, name, email, phone) "
+    "SELECT patient.id, user.name, user.email, user.phone FROM patient JOIN user ON user.id = patient.user_id"
+)
+_fts_engines = set()  # URLs of databases known to have the FTS table
+
+def _trigram_document():
+    return func.coalesce(User.name, '') + ' ' + func.coalesce(User.email, '') + ' ' + func.coalesce(User.phone, '')
+
+def _dialect(bind=None):
+    return (bind or db.engine).dialect.name
+
+def _fts_available(conn):
+    url = str(conn.engine.url)
+    if url not in _fts_engines:
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}).first() is None:
+            return False
+        _fts_engines.add(url)
+    return True
+
+# --- Setup
+
+def ensure_search_index(engine=None):
+    """Creates the search index if the database does not have it yet and fills
+    it from the current rows. Returns True when it had to be created."""
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        if _dialect(engine) == 'sqlite':
+            if _fts_available(conn):
+                return False
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "name, email, phone, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            ))
+            conn.execute(text(_FILL))
+            return True
+        if _dialect(engine) == 'postgresql':
+            exists = conn.execute(text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {'name': TRGM_INDEX}).first()
+            if exists:
+                return False
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON \"user\" USING gin "
+                "((coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(phone, '')) gin_trgm_ops)"
+            ))
+            return True
+    return False
+
+def rebuild_search_index(engine=None):
+    """Refills the SQLite index from scratch, e.g. after bulk inserts that
+    bypass the flush events. A no-op on PostgreSQL, whose index is maintained
+    by the database."""
+    engine = engine or db.engine
+    if _dialect(engine) != 'sqlite':
+        return
+    ensure_search_index(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        conn.execute(text(_FILL))
+
+# --- Incremental sync (SQLite)
+
+@event.listens_for(Session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    patient_ids, user_ids = set(), set()
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Patient):
+            patient_ids.add(obj.id)
+        elif isinstance(obj, User) and obj in session.dirty and session.is_modified(obj):
+            user_ids.add(obj.id)
+    deleted = {obj.id for obj in session.deleted if isinstance(obj, Patient)}
+    if not (patient_ids or user_ids or deleted):
+        return
+    conn = session.connection()
+    if conn.dialect.name != 'sqlite' or not _fts_available(conn):
+        return
+
+    # Rewrite the rows of every patient touched, directly or through their user
+    params = {'patient_ids': list(patient_ids | deleted), 'user_ids': list(user_ids)}
+    match = "patient.id IN :patient_ids OR patient.user_id IN :user_ids"
+    conn.execute(_expanding(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :patient_ids OR rowid IN (SELECT id FROM patient WHERE {match})"), params)
+    conn.execute(_expanding(f"{_FILL} WHERE {match}"), params)
+
+def _expanding(sql):
+    return text(sql).bindparams(bindparam('patient_ids', expanding=True), bindparam('user_ids', expanding=True))
+
+# --- Queries
+
+def _fts_query(term):
+    """Turns free text into an FTS5 query matching every word as a prefix,
+    or None when the term has no indexable words."""
+    words = re.findall(r'\w+', term)
+    if not words:
+        return None
+    return ' AND '.join('"{}"*'.format(word) for word in words)
+
+def search_patients(term, limit):
+    """Ids of active patients matching `term`, best match first."""
+    dialect = _dialect()
+    query = db.session.query(Patient.id).join(User, User.id == Patient.user_id).filter(Patient.is_active == True)
+
+    if dialect == 'sqlite' and _fts_available(db.session.connection()):
+        match = _fts_query(term)
+        if match:
+            rows = db.session.execute(text(
+                f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} JOIN patient ON patient.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH :match AND patient.is_active = 1 ORDER BY rank LIMIT :limit"
+            ), {'match': match, 'limit': limit})
+            return [patient_id for (patient_id,) in rows]
+
+    elif dialect == 'postgresql':
+        document = _trigram_document()
+        return [patient_id for (patient_id,) in query.filter(document.ilike(f'%{term}%')).order_by(
+            func.word_similarity(term, document).desc(), Patient.id
+        ).limit(limit)]
+
+    return [patient_id for (patient_id,) in query.filter(or_(
+        User.name.ilike(f'%{term}%'),
+        User.email.ilike(f'%{term}%'),
+        User.phone.ilike(f'%{term}%')
+    )).order_by(Patient.id).limit(limit)]
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the patient directory search index from the source tables."""
+    rebuild_search_index()
+    click.echo('Search index rebuilt')
@@ -0,0 +1,364 @@
+from sqlalchemy.orm import joinedload, selectinload, undefer
+from functools import lru_cache
+from datetime import date
+from .models import User, Doctor, Patient, Department, Appointment, Treatment
+
+class View:
+    """Output shape of one kind of row, declared next to the loader options
+    that let it be built without lazy loads. Apply `load()` to the query that
+    fetches the rows, then call the view on each of them."""
+
+    def __init__(self, dump, options):
+        self.dump = dump
+        self.options = options
+        self.__name__ = dump.__name__
+        self.__doc__ = dump.__doc__
+
+    def load(self, query):
+        return query.options(*self.options)
+
+    def __call__(self, obj, *args):
+        return self.dump(obj, *args)
+
+    def many(self, objs):
+        return [self.dump(obj) for obj in objs]
+
+def view(*options):
+    def wrapper(fn):
+        return View(fn, options)
+    return wrapper
+
+# Dates and slot times repeat across rows (a few hundred days, a few dozen
+# slot times), so their strings are cached; isoformat is also several times
+# cheaper than strftime. The routes use these for their own date keys too.
+
+@lru_cache(maxsize=4096)
+def format_date(d):
+    # date.isoformat, so a datetime gives its date part as strftime did
+    return date.isoformat(d) if d else None
+
+@lru_cache(maxsize=4096)
+def format_time(t):
+    return t.isoformat('minutes') if t else None
+
+def format_datetime(dt):
+    return dt.isoformat(' ', 'seconds') if dt else None
+
+def _treatment(treatment):
+    if not treatment:
+        return None
+    return {
+        'diagnosis': treatment.diagnosis,
+        'prescription': treatment.prescription,
+        'notes': treatment.notes
+    }
+
+# --- Loader strategies shared by the views below
+#
+# Joined rows are cut down to the columns the views read (load_only), and the
+# large Text columns deferred in the models are undeferred only by the views
+# that show them; anything else a view touched would cost a query per row,
+# which the endpoint benchmark's statement budgets catch.
+
+_doctor_user = joinedload(Appointment.doctor).load_only(Doctor.user_id, Doctor.specialization).joinedload(Doctor.user).load_only(User.name, User.email)
+_patient_user = joinedload(Appointment.patient).load_only(Patient.user_id).joinedload(Patient.user).load_only(User.name, User.email, User.phone)
+_treatment_rows = selectinload(Appointment.treatment).undefer(Treatment.notes)
+_department_name = joinedload(Doctor.department).load_only(Department.name)
+
+# --- Doctors
+
+@view(undefer(Doctor.bio), joinedload(Doctor.user).load_only(User.name, User.email, User.phone, User.address, User.pincode), _department_name)
+def admin_doctor(doctor):
+    return {
+        'id': doctor.id,
+        'user_id': doctor.user_id,
+        'name': doctor.user.name,
+        'email': doctor.user.email,
+        'specialization': doctor.specialization,
+        'department_id': doctor.department_id,
+        'department_name': doctor.department.name if doctor.department else None,
+        'qualification': doctor.qualification,
+        'experience': doctor.experience,
+        'bio': doctor.bio,
+        'phone': doctor.user.phone,
+        'address': doctor.user.address,
+        'pincode': doctor.user.pincode
+    }
+
+@view(joinedload(Doctor.user).load_only(User.name, User.email), _department_name)
+def doctor_search_result(doctor):
+    return {
+        'id': doctor.id,
+        'name': doctor.user.name,
+        'email': doctor.user.email,
+        'specialization': doctor.specialization,
+        'department': doctor.department.name if doctor.department else None,
+        'qualification': doctor.qualification,
+        'experience': doctor.experience
+    }
+
+@view(undefer(Doctor.bio), joinedload(Doctor.user).load_only(User.name, User.email), _department_name)
+def doctor_listing(doctor):
+    """Doctor card shown to patients; availability is added by the route."""
+    return {
+        'id': doctor.id,
+        'name': doctor.user.name,
+        'email': doctor.user.email,
+        'specialization': doctor.specialization,
+        'department_id': doctor.department_id,
+        'department_name': doctor.department.name if doctor.department else None,
+        'qualification': doctor.qualification,
+        'experience': doctor.experience,
+        'bio': doctor.bio
+    }
+
+@view(joinedload(Doctor.user).load_only(User.name), _department_name)
+def doctor_brief(doctor):
+    return {
+        'id': doctor.id,
+        'name': doctor.user.name,
+        'specialization': doctor.specialization,
+        'department': doctor.department.name if doctor.department else None
+    }
+
+# --- Patients
+
+@view(undefer(Patient.medical_history), joinedload(Patient.user).load_only(User.name, User.email, User.phone, User.address, User.pincode))
+def patient_full(patient):
+    return {
+        'id': patient.id,
+        'user_id': patient.user_id,
+        'name': patient.user.name,
+        'email': patient.user.email,
+        'phone': patient.user.phone,
+        'address': patient.user.address,
+        'pincode': patient.user.pincode,
+        'date_of_birth': format_date(patient.date_of_birth),
+        'gender': patient.gender,
+        'blood_group': patient.blood_group,
+        'medical_history': patient.medical_history,
+        'emergency_contact': patient.emergency_contact
+    }
+
+@view(joinedload(Patient.user).load_only(User.name, User.email, User.phone, User.address))
+def patient_search_result(patient):
+    return {
+        'id': patient.id,
+        'user_id': patient.user_id,
+        'name': patient.user.name,
+        'email': patient.user.email,
+        'phone': patient.user.phone,
+        'address': patient.user.address,
+        'date_of_birth': format_date(patient.date_of_birth),
+        'gender': patient.gender,
+        'blood_group': patient.blood_group
+    }
+
+@view(joinedload(Patient.user).load_only(User.name, User.email, User.phone, User.address))
+def patient_contact(patient):
+    return {
+        'id': patient.id,
+        'name': patient.user.name,
+        'email': patient.user.email,
+        'phone': patient.user.phone,
+        'address': patient.user.address,
+    }
+
+@view(undefer(Patient.medical_history), joinedload(Patient.user).load_only(User.name, User.email, User.phone))
+def patient_medical(patient):
+    return {
+        'id': patient.id,
+        'name': patient.user.name,
+        'email': patient.user.email,
+        'phone': patient.user.phone,
+        'date_of_birth': format_date(patient.date_of_birth),
+        'gender': patient.gender,
+        'blood_group': patient.blood_group,
+        'medical_history': patient.medical_history,
+        'emergency_contact': patient.emergency_contact
+    }
+
+@view(joinedload(Patient.user).load_only(User.name, User.email, User.phone))
+def assigned_patient(patient):
+    return {
+        'id': patient.id,
+        'name': patient.user.name,
+        'email': patient.user.email,
+        'phone': patient.user.phone,
+        'date_of_birth': format_date(patient.date_of_birth),
+        'gender': patient.gender,
+        'blood_group': patient.blood_group
+    }
+
+# --- Departments
+
+@view(undefer(Department.description))
+def department_summary(dept):
+    return {
+        'id': dept.id,
+        'name': dept.name,
+        'description': dept.description,
+        'doctors_registered': dept.doctors_registered
+    }
+
+@view(undefer(Department.description))
+def admin_department(dept, doctors_registered):
+    return {
+        'id': dept.id,
+        'name': dept.name,
+        'description': dept.description,
+        'doctors_registered': doctors_registered,
+        'created_at': format_date(dept.created_at)
+    }
+
+# --- Schedules
+
+def schedule_template(template):
+    return {
+        'id': template.id,
+        'weekday': template.weekday,
+        'start_time': format_time(template.start_time),
+        'end_time': format_time(template.end_time),
+        'slot_minutes': template.slot_minutes
+    }
+
+def schedule_exception(exception):
+    return {
+        'id': exception.id,
+        'date': format_date(exception.date),
+        'start_time': format_time(exception.start_time),
+        'end_time': format_time(exception.end_time),
+        'reason': exception.reason
+    }
+
+# --- Appointments
+
+@view(_patient_user, _doctor_user)
+def admin_appointment(apt):
+    return {
+        'id': apt.id,
+        'patient_id': apt.patient_id,
+        'patient_name': apt.patient.user.name,
+        'patient_email': apt.patient.user.email,
+        'doctor_id': apt.doctor_id,
+        'doctor_name': apt.doctor.user.name,
+        'doctor_specialization': apt.doctor.specialization,
+        'date': format_date(apt.date),
+        'time': format_time(apt.time),
+        'status': apt.status,
+        'reason': apt.reason,
+        'created_at': format_datetime(apt.created_at)
+    }
+
+@view(_doctor_user, _treatment_rows)
+def admin_history_entry(apt):
+    entry = {
+        'appointment_id': apt.id,
+        'date': format_date(apt.date),
+        'time': format_time(apt.time),
+        'status': apt.status,
+        'doctor_name': apt.doctor.user.name,
+        'doctor_specialization': apt.doctor.specialization,
+        'reason': apt.reason
+    }
+    if apt.treatment:
+        entry.update(_treatment(apt.treatment))
+    return entry
+
+@view(_patient_user)
+def doctor_upcoming_appointment(apt):
+    return {
+        'id': apt.id,
+        'patient_id': apt.patient_id,
+        'patient_name': apt.patient.user.name,
+        'patient_email': apt.patient.user.email,
+        'patient_phone': apt.patient.user.phone,
+        'date': format_date(apt.date),
+        'time': format_time(apt.time),
+        'status': apt.status,
+        'reason': apt.reason
+    }
+
+@view(joinedload(Appointment.patient).load_only(Patient.user_id, Patient.date_of_birth, Patient.gender, Patient.blood_group, Patient.medical_history)
+      .joinedload(Patient.user).load_only(User.name, User.email, User.phone), _treatment_rows)
+def doctor_appointment(apt):
+    return {
+        'id': apt.id,
+        'patient_id': apt.patient_id,
+        'patient_name': apt.patient.user.name,
+        'patient_email': apt.patient.user.email,
+        'patient_phone': apt.patient.user.phone,
+        'date_of_birth': format_date(apt.patient.date_of_birth),
+        'gender': apt.patient.gender,
+        'blood_group': apt.patient.blood_group,
+        'medical_history': apt.patient.medical_history,
+        'date': format_date(apt.date),
+        'time': format_time(apt.time),
+        'status': apt.status,
+        'reason': apt.reason,
+        'treatment': _treatment(apt.treatment)
+    }
+
+@view(_treatment_rows)
+def doctor_history_entry(apt):
+    treatment_info = _treatment(apt.treatment)
+    if treatment_info:
+        treatment_info.update({
+            'created_at': format_datetime(apt.treatment.created_at),
+            'updated_at': format_datetime(apt.treatment.updated_at)
+        })
+    return {
+        'appointment_id': apt.id,
+        'date': format_date(apt.date),
+        'time': format_time(apt.time),
+        'status': apt.status,
+        'reason': apt.reason,
+        'treatment': treatment_info
+    }
+
+@view(_doctor_user)
+def patient_upcoming_appointment(apt):
+    return {
+        'id': apt.id,
+        'doctor_id': apt.doctor_id,
+        'doctor_name': apt.doctor.user.name,
+        'doctor_specialization': apt.doctor.specialization,
+        'date': format_date(apt.date),
+        'time': format_time(apt.time),
+        'status': apt.status,
+        'reason': apt.reason
+    }
+
+@view(_doctor_user, _treatment_rows)
+def patient_past_appointment(apt):
+    return dict(patient_upcoming_appointment(apt), treatment=_treatment(apt.treatment))
+
+@view(_doctor_user, _treatment_rows)
+def patient_appointment(apt):
+    return {
+        'id': apt.id,
+        'doctor_id': apt.doctor_id,
+        'doctor_name': apt.doctor.user.name,
+        'doctor_specialization': apt.doctor.specialization,
+        'doctor_email': apt.doctor.user.email,
+        'date': format_date(apt.date),
+        'time': format_time(apt.time),
+        'status': apt.status,
+        'reason': apt.reason,
+        'treatment': _treatment(apt.treatment),
+        'created_at': format_datetime(apt.created_at)
+    }
+
+@view(_doctor_user, _treatment_rows)
+def treatment_record(apt):
+    return {
+        'appointment_id': apt.id,
+        'doctor_name': apt.doctor.user.name,
+        'doctor_specialization': apt.doctor.specialization,
+        'date': format_date(apt.date),
+        'time': format_time(apt.time),
+        'diagnosis': apt.treatment.diagnosis,
+        'prescription': apt.treatment.prescription,
+        'notes': apt.treatment.notes,
+        'created_at': format_datetime(apt.treatment.created_at)
+    }
@@ -0,0 +1,204 @@
+from .extensions import db
+from .models import Appointment, DoctorAvailability
+from .schedules import materialize
+from datetime import date, datetime, timedelta
+import threading
+import time as clock
+
+TOPIC = 'slot_inventory'
+
+def _slot_index(t):
+    # Slots are keyed by minute of day, so a day fits in a 1440-bit integer
+    return t.hour * 60 + t.minute
+
+class DaySlots:
+    """Slot state of one doctor on one day. Each bitmap holds one bit per
+    minute-of-day index; `slots` keeps the availability row behind each index."""
+    __slots__ = ('slots', 'available', 'booked', 'completed', 'loaded_at')
+
+    def __init__(self, loaded_at):
+        self.slots = {}  # index -> (availability id, start_time, end_time)
+        self.available = 0
+        self.booked = 0
+        self.completed = 0
+        self.loaded_at = loaded_at
+
+    def add_slot(self, avail):
+        index = _slot_index(avail.start_time)
+        self.slots[index] = (avail.id, avail.start_time, avail.end_time)
+        if avail.is_available:
+            self.available |= 1 << index
+
+    def set_status(self, index, status):
+        bit = 1 << index
+        self.booked &= ~bit
+        self.completed &= ~bit
+        if status == 'Booked':
+            self.booked |= bit
+        elif status == 'Completed':
+            self.completed |= bit
+
+    def free(self):
+        free = self.available & ~(self.booked | self.completed)
+        return [(start, end) for index, (_, start, end) in sorted(self.slots.items()) if free >> index & 1]
+
+    def entries(self):
+        entries = []
+        for index, (avail_id, start, end) in sorted(self.slots.items()):
+            if self.booked >> index & 1:
+                status = 'Booked'
+            elif self.completed >> index & 1:
+                status = 'Completed'
+            else:
+                status = 'Available'
+            entries.append({
+                'id': avail_id,
+                'start_time': start,
+                'end_time': end,
+                'is_available': bool(self.available >> index & 1) and status == 'Available',
+                'is_booked': status != 'Available',
+                'status': status
+            })
+        return entries
+
+class SlotInventory:
+    """Per-worker, lazily loaded view of doctor slot state.
+
+    Days are loaded in bulk on first read and then kept current by messages
+    published on the bus by the booking and availability write paths. A day is
+    reloaded once it is older than SLOT_INVENTORY_TTL seconds, which bounds
+    staleness when a worker misses messages from another process; readers
+    that know the doctor's database version (backend.etags) pass it and get a
+    reload as soon as it moves.
+    """
+
+    def __init__(self):
+        self.bus = None
+        self.ttl = 60
+        self._days = {}  # (doctor_id, date) -> DaySlots
+        self._versions = {}  # doctor_id -> resource version the loaded days reflect
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, bus):
+        self.bus = bus
+        self.ttl = app.config.get('SLOT_INVENTORY_TTL', 60)
+        bus.subscribe(TOPIC, self._on_message, reset=self._reset)
+        app.extensions['slot_inventory'] = self
+
+    # --- Reads
+
+    def free_slots(self, doctor_ids, start_date, end_date):
+        """Returns {doctor_id: {date: [(start_time, end_time), ...]}} holding
+        only days that have at least one free slot."""
+        days = self._ensure(doctor_ids, start_date, end_date)
+        result = {}
+        for (doctor_id, day), day_slots in sorted(days.items()):
+            free = day_slots.free()
+            if free:
+                result.setdefault(doctor_id, {})[day] = free
+        return result
+
+    def day_slots(self, doctor_id, start_date, end_date, version=None):
+        """Returns {date: [slot entry, ...]} with the booking status of every
+        availability slot of one doctor. A `version` other than the one the
+        loaded days were read under drops them first."""
+        if version is not None:
+            with self._lock:
+                if self._versions.get(doctor_id) != version:
+                    self._generation += 1
+                    for key in [key for key in self._days if key[0] == doctor_id]:
+                        del self._days[key]
+                    self._versions[doctor_id] = version
+        days = self._ensure([doctor_id], start_date, end_date)
+        return {day: day_slots.entries() for (_, day), day_slots in sorted(days.items()) if day_slots.slots}
+
+    def _ensure(self, doctor_ids, start_date, end_date):
+        dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        now = clock.monotonic()
+        found, missing = {}, set()
+        with self._lock:
+            for doctor_id in doctor_ids:
+                for day in dates:
+                    day_slots = self._days.get((doctor_id, day))
+                    if day_slots is None or now - day_slots.loaded_at > self.ttl:
+                        missing.add(doctor_id)
+                    else:
+                        found[(doctor_id, day)] = day_slots
+            generation = self._generation
+        if missing:
+            loaded = self._load(sorted(missing), dates, now)
+            with self._lock:
+                # Anything published while we were reading may not be reflected
+                # in the rows, so only keep the load if nothing changed meanwhile
+                if generation == self._generation:
+                    self._prune()
+                    self._days.update(loaded)
+            found.update(loaded)
+        return found
+
+    def _load(self, doctor_ids, dates, now):
+        # Turn weekly templates into slots for any date not materialized yet
+        materialize(doctor_ids, dates[-1])
+        loaded = {(doctor_id, day): DaySlots(now) for doctor_id in doctor_ids for day in dates}
+        availabilities = DoctorAvailability.query.filter(
+            DoctorAvailability.doctor_id.in_(doctor_ids),
+            DoctorAvailability.date >= dates[0],
+            DoctorAvailability.date <= dates[-1]
+        ).all()
+        for avail in availabilities:
+            loaded[(avail.doctor_id, avail.date)].add_slot(avail)
+
+        taken = db.session.query(Appointment.doctor_id, Appointment.date, Appointment.time, Appointment.status).filter(
+            Appointment.doctor_id.in_(doctor_ids),
+            Appointment.date >= dates[0],
+            Appointment.date <= dates[-1],
+            Appointment.status.in_(['Booked', 'Completed'])
+        ).all()
+        for doctor_id, day, slot_time, status in taken:
+            loaded[(doctor_id, day)].set_status(_slot_index(slot_time), status)
+        return loaded
+
+    def _prune(self):
+        today = date.today()
+        for key in [key for key in self._days if key[1] < today]:
+            del self._days[key]
+
+    # --- Writes, published so every worker applies them
+
+    def slot_changed(self, doctor_id, day, slot_time, status):
+        """Records the appointment status now holding a slot. Cancelled (or
+        None) frees the slot again."""
+        self.bus.publish(TOPIC, {
+            'doctor_id': doctor_id,
+            'date': day.isoformat(),
+            'time': slot_time.strftime('%H:%M'),
+            'status': status
+        })
+
+    def invalidate(self, doctor_id=None):
+        """Drops loaded days for one doctor, or for everyone when doctor_id is
+        None, so they are rebuilt from the database on the next read."""
+        self.bus.publish(TOPIC, {'doctor_id': doctor_id, 'invalidate': True})
+
+    def _reset(self):
+        self._on_message({'doctor_id': None, 'invalidate': True})
+
+    def _on_message(self, message):
+        doctor_id = message.get('doctor_id')
+        with self._lock:
+            self._generation += 1
+            if message.get('invalidate'):
+                if doctor_id is None:
+                    self._days.clear()
+                else:
+                    for key in [key for key in self._days if key[0] == doctor_id]:
+                        del self._days[key]
+                return
+            day = datetime.strptime(message['date'], '%Y-%m-%d').date()
+            day_slots = self._days.get((doctor_id, day))
+            if day_slots is not None:
+                slot_time = datetime.strptime(message['time'], '%H:%M').time()
+                day_slots.set_status(_slot_index(slot_time), message['status'])
+
+slot_inventory = SlotInventory()
@@ -0,0 +1,158 @@
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import deque
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from .extensions import db
+import itertools
+import re
+import threading
+import time as clock
+
+# Keeps the most recent statements slower than SLOW_QUERY_MS in a bounded ring
+# buffer with their route, redacted parameters and query plan, for
+# /api/admin/slow-queries. The plan comes from EXPLAIN QUERY PLAN (SQLite) or
+# EXPLAIN (PostgreSQL, without ANALYZE, so nothing runs twice) on the same
+# connection right after the statement. Like the metrics, the buffer belongs
+# to the worker process that ran the statement.
+#
+# Parameters bound to a SLOW_QUERY_REDACT column are replaced, and so is any
+# string not bound to a known column (search terms, LIKE patterns), since
+# there is no telling what it holds.
+
+REDACTED = '<redacted>'
+_SUFFIX = re.compile(r'_\d+$')
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+class SlowQueryLog:
+    def __init__(self):
+        self.threshold = 0.0  # seconds; 0 records nothing
+        self.explain = True
+        self.redact = frozenset()
+        self.captured = 0
+        self._columns = frozenset()
+        self._ids = itertools.count(1)
+        self._entries = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.threshold = app.config.get('SLOW_QUERY_MS', 200) / 1000
+        self.explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        self.redact = frozenset(app.config.get('SLOW_QUERY_REDACT', ()))
+        self._columns = frozenset(column.name for table in db.metadata.tables.values() for column in table.columns)
+        self._entries = deque(maxlen=app.config.get('SLOW_QUERY_LOG_SIZE', 100))
+        app.extensions['slow_query_log'] = self
+
+    @property
+    def capacity(self):
+        return self._entries.maxlen
+
+    def after_fork(self):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=self._entries.maxlen)
+
+    def entries(self, limit=None, route=None):
+        """Newest first, optionally only those whose route contains `route`."""
+        with self._lock:
+            found = [entry for entry in reversed(self._entries) if not route or route in (entry['route'] or '')]
+        return found[:limit] if limit else found
+
+    def record(self, conn, cursor, statement, parameters, context, executemany, elapsed):
+        entry = {
+            'id': next(self._ids),
+            'at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'duration_ms': round(elapsed * 1000, 1),
+            'route': _route(),
+            'statement': statement,
+            'parameters': self._parameters(context, parameters, executemany),
+            'plan': None,
+        }
+        if self.explain and not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+            try:
+                entry['plan'] = _explain(conn, statement, parameters)
+            except Exception as e:
+                entry['plan_error'] = str(e)
+        with self._lock:
+            self._entries.append(entry)
+            self.captured += 1
+
+    def _parameters(self, context, parameters, executemany):
+        compiled = getattr(context, 'compiled_parameters', None)
+        if not compiled or getattr(context, 'compiled', None) is None:
+            # Driver-level SQL: nothing tells which column a value belongs to
+            return REDACTED if parameters else None
+        rows = [{name: self._value(name, value) for name, value in row.items()} for row in compiled[:5]]
+        return {'rows': len(compiled), 'first': rows} if executemany else rows[0]
+
+    def _value(self, name, value):
+        column = _SUFFIX.sub('', name)
+        if column in self.redact:
+            return REDACTED
+        if isinstance(value, (list, tuple)):
+            return [self._value(name, item) for item in value]
+        if isinstance(value, str):
+            # LIKE patterns are search input whatever column they are matched against
+            return value if column in self._columns and '%' not in value else REDACTED
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, (date, datetime, time)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return f'<{type(value).__name__}>'
+
+def _route():
+    if has_request_context():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        return f'{request.method} {rule}'
+    from celery import current_task
+    if current_task and current_task.request.id:
+        return f'task {current_task.name}'
+    return None
+
+def _explain(conn, statement, parameters):
+    """Plan lines for a statement, run on the DBAPI connection so no engine
+    events (and no recursion into this log) fire."""
+    dialect = conn.dialect.name
+    cursor = conn.connection.cursor()
+    try:
+        if dialect == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            # (id, parent, notused, detail); indent each step under its parent
+            depth = {0: -1}
+            lines = []
+            for step, parent, _, detail in cursor.fetchall():
+                depth[step] = depth.get(parent, -1) + 1
+                lines.append('  ' * depth[step] + detail)
+            return lines
+        # A failed EXPLAIN would abort the request's transaction on PostgreSQL
+        cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute('EXPLAIN ' + statement, parameters)
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    finally:
+        cursor.close()
+
+slow_query_log = SlowQueryLog()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if slow_query_log.threshold:
+        conn.info['slow_query_started'] = clock.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('slow_query_started', None)
+    if started is None:
+        return
+    elapsed = clock.perf_counter() - started
+    if elapsed >= slow_query_log.threshold:
+        try:
+            slow_query_log.record(conn, cursor, statement, parameters, context, executemany, elapsed)
+        except Exception:
+            # Diagnostics must never fail the statement they describe
+            pass
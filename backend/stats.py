@@ -0,0 +1,162 @@
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, inspect, select, delete, insert, literal
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import datetime
+from .extensions import db
+from .models import Doctor, Patient, Appointment, StatCounter, AppointmentDayStat, DoctorPatientStat
+from .upsert import increment
+import click
+
+ALL_DOCTORS = 0  # AppointmentDayStat.doctor_id holding hospital-wide totals
+
+# --- Incremental maintenance
+#
+# Every flush is inspected for new, changed and deleted doctors, patients and
+# appointments, and the matching counters are adjusted inside the same
+# transaction, so they commit or roll back together with the change itself.
+# Bulk statements bypass these events; reconcile_stats() corrects any drift.
+
+def _old(obj, attr):
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(obj, attr)
+
+def _changed(obj, *attrs):
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+class Deltas:
+    def __init__(self):
+        self.counters = Counter()
+        self.days = Counter()
+        self.pairs = Counter()
+
+    def appointment(self, doctor_id, day, status, patient_id, sign):
+        self.counters['appointments.total'] += sign
+        self.days[(doctor_id, day, status)] += sign
+        self.days[(ALL_DOCTORS, day, status)] += sign
+        self.pairs[(doctor_id, patient_id)] += sign
+
+def _collect(session):
+    deltas = Deltas()
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            deltas.appointment(obj.doctor_id, obj.date, obj.status or 'Booked', obj.patient_id, +1)
+        elif isinstance(obj, Doctor):
+            deltas.counters['doctors.active'] += 1 if obj.is_active in (None, True) else 0
+        elif isinstance(obj, Patient):
+            deltas.counters['patients.active'] += 1 if obj.is_active in (None, True) else 0
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and _changed(obj, 'doctor_id', 'date', 'status', 'patient_id'):
+            deltas.appointment(_old(obj, 'doctor_id'), _old(obj, 'date'), _old(obj, 'status'), _old(obj, 'patient_id'), -1)
+            deltas.appointment(obj.doctor_id, obj.date, obj.status, obj.patient_id, +1)
+        elif isinstance(obj, (Doctor, Patient)) and _changed(obj, 'is_active'):
+            key = 'doctors.active' if isinstance(obj, Doctor) else 'patients.active'
+            deltas.counters[key] += (1 if obj.is_active else 0) - (1 if _old(obj, 'is_active') else 0)
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            deltas.appointment(_old(obj, 'doctor_id'), _old(obj, 'date'), _old(obj, 'status'), _old(obj, 'patient_id'), -1)
+        elif isinstance(obj, Doctor) and _old(obj, 'is_active'):
+            deltas.counters['doctors.active'] -= 1
+        elif isinstance(obj, Patient) and _old(obj, 'is_active'):
+            deltas.counters['patients.active'] -= 1
+    return deltas
+
+def apply_deltas(conn, deltas):
+    for key, delta in deltas.counters.items():
+        if delta:
+            increment(conn, StatCounter.__table__, {'key': key}, 'value', delta)
+    for (doctor_id, day, status), delta in deltas.days.items():
+        if delta:
+            increment(conn, AppointmentDayStat.__table__, {'doctor_id': doctor_id, 'date': day, 'status': status}, 'count', delta)
+    for (doctor_id, patient_id), delta in deltas.pairs.items():
+        if delta:
+            increment(conn, DoctorPatientStat.__table__, {'doctor_id': doctor_id, 'patient_id': patient_id}, 'appointments', delta)
+
+def appointment_booked(conn, doctor_id, day, patient_id, previous=None, deltas=None):
+    """Applies the counter changes for an appointment written with a Core
+    statement, which the flush events cannot see. `previous` is the
+    (status, patient_id) the row held before, or None for a new row. Given
+    `deltas`, the changes are added to it for the caller to apply instead, so
+    several writes share one set of upserts."""
+    pending = Deltas() if deltas is None else deltas
+    if previous:
+        pending.appointment(doctor_id, day, previous[0], previous[1], -1)
+    pending.appointment(doctor_id, day, 'Booked', patient_id, +1)
+    if deltas is None:
+        apply_deltas(conn, pending)
+
+def appointment_cancelled(conn, doctor_id, day, patient_id, deltas=None):
+    """Counter changes for a Booked appointment cancelled with a Core
+    statement; `deltas` as for appointment_booked."""
+    pending = Deltas() if deltas is None else deltas
+    pending.appointment(doctor_id, day, 'Booked', patient_id, -1)
+    pending.appointment(doctor_id, day, 'Cancelled', patient_id, +1)
+    if deltas is None:
+        apply_deltas(conn, pending)
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_stats(session, flush_context):
+    deltas = _collect(session)
+    if deltas.counters or deltas.days or deltas.pairs:
+        apply_deltas(session.connection(), deltas)
+
+# --- Reads
+
+def counter(key):
+    return db.session.query(StatCounter.value).filter(StatCounter.key == key).scalar() or 0
+
+def booked_count(start, end, doctor_id=ALL_DOCTORS):
+    """Booked appointments dated start..end (inclusive; end None = no bound)."""
+    query = db.session.query(func.coalesce(func.sum(AppointmentDayStat.count), 0)).filter(
+        AppointmentDayStat.doctor_id == doctor_id,
+        AppointmentDayStat.status == 'Booked',
+        AppointmentDayStat.date >= start
+    )
+    if end is not None:
+        query = query.filter(AppointmentDayStat.date <= end)
+    return query.scalar()
+
+# --- Reconciliation
+
+def reconcile_stats():
+    """Recomputes every counter from the source tables in one transaction,
+    correcting drift left by bulk writes or failed deployments."""
+    conn = db.session.connection()
+    conn.execute(delete(StatCounter.__table__))
+    conn.execute(delete(AppointmentDayStat.__table__))
+    conn.execute(delete(DoctorPatientStat.__table__))
+
+    counters = {
+        'doctors.active': select(func.count()).select_from(Doctor).where(Doctor.is_active == True),
+        'patients.active': select(func.count()).select_from(Patient).where(Patient.is_active == True),
+        'appointments.total': select(func.count()).select_from(Appointment),
+    }
+    conn.execute(insert(StatCounter.__table__), [{'key': key, 'value': conn.scalar(stmt)} for key, stmt in counters.items()])
+    conn.execute(insert(StatCounter.__table__).values(key='reconciled_at', value=int(datetime.now().timestamp())))
+
+    day_columns = ['doctor_id', 'date', 'status', 'count']
+    conn.execute(insert(AppointmentDayStat.__table__).from_select(day_columns, select(
+        Appointment.doctor_id, Appointment.date, Appointment.status, func.count()
+    ).group_by(Appointment.doctor_id, Appointment.date, Appointment.status)))
+    conn.execute(insert(AppointmentDayStat.__table__).from_select(day_columns, select(
+        literal(ALL_DOCTORS), Appointment.date, Appointment.status, func.count()
+    ).group_by(Appointment.date, Appointment.status)))
+    conn.execute(insert(DoctorPatientStat.__table__).from_select(['doctor_id', 'patient_id', 'appointments'], select(
+        Appointment.doctor_id, Appointment.patient_id, func.count()
+    ).group_by(Appointment.doctor_id, Appointment.patient_id)))
+    db.session.commit()
+
+def ensure_stats():
+    """Builds the counters once for a database that predates them."""
+    if not db.session.query(StatCounter.key).filter(StatCounter.key == 'reconciled_at').first():
+        reconcile_stats()
+
+@click.command('reconcile-stats')
+@with_appcontext
+def reconcile_stats_command():
+    """Recompute dashboard statistics from the source tables."""
+    reconcile_stats()
+    click.echo('Statistics reconciled')
@@ -0,0 +1,39 @@
+from flask import Response, current_app, request, stream_with_context
+from .pagination import order_clauses
+
+# Opt-in NDJSON mode for the large admin listings (?format=ndjson): every
+# matching row, one JSON object per line, in the listing's order. The query
+# runs with yield_per, which fetches STREAM_BATCH_SIZE rows at a time (through
+# a server-side cursor on PostgreSQL), and each batch is written out before the
+# next one is loaded, so worker memory stays flat however many rows match.
+# Paging arguments (cursor, limit, include_total) do not apply.
+#
+# The status line is sent before the first row is read, so an error while
+# streaming ends the body with a {"message", "error"} line instead of a 500.
+
+NDJSON = 'application/x-ndjson'
+
+def wants_stream():
+    return request.args.get('format') == 'ndjson'
+
+def stream(query, view, order):
+    """NDJSON response of `view` applied to every row of `query`, ordered by
+    `order` as given to paginate()."""
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    rows = view.load(query).order_by(*order_clauses(order)).yield_per(batch_size)
+    dumps = current_app.json.dumps
+
+    def generate():
+        lines = []
+        try:
+            for row in rows:
+                lines.append(dumps(view(row)))
+                if len(lines) == batch_size:
+                    yield '\n'.join(lines) + '\n'
+                    lines = []
+        except Exception as e:
+            lines.append(dumps({"message": "Error streaming rows", "error": str(e)}))
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
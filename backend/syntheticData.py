@@ -0,0 +1,327 @@
+from flask.cli import with_appcontext
+from flask_security import hash_password
+from sqlalchemy import Column, Date, Integer, MetaData, Table, Time, func, insert, literal, select, text, true, update
+from .extensions import db
+from .models import User, Role, Department, Doctor, Patient, Appointment, DoctorAvailability
+from .indexes import ensure_indexes
+from .stats import reconcile_stats
+from .searchIndex import rebuild_search_index
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+import click
+import math
+import random
+import time as clock
+
+# Bulk generator for realistic volumes. Rows go in through Core executemany
+# inserts with explicit ids (no ORM objects, no flush events), in batches and
+# transactions of a few doctors' worth of rows. Availability, the bulk of the
+# data, is a cross product of each doctor's slot times and the calendar, so the
+# database builds it itself with INSERT ... SELECT from two small temporary
+# tables. The stats tables and the search index are rebuilt once at the end. The same
+# --seed always produces the same rows, and the ids/emails of a run are derived
+# from it, so a second run with the same seed is refused.
+#
+# Skew: doctors are ranked by a Zipf weight (a few popular doctors run nearly
+# full, most are lightly booked) and patients get a gamma-distributed visit
+# rate (most come a few times, chronic patients ten times as often). Daily load follows a seasonal curve peaking in mid-winter
+# and a weekly one peaking on Mondays.
+
+FIRST = ['Aarav', 'Vivaan', 'Aditya', 'Ishaan', 'Ananya', 'Diya', 'Saanvi', 'Meera', 'Rohan', 'Kavya', 'Arjun',
+         'Priya', 'Kabir', 'Neha', 'Vikram', 'Pooja', 'Rahul', 'Sneha', 'Aman', 'Riya', 'Karan', 'Anjali', 'Dev', 'Isha']
+LAST = ['Sharma', 'Verma', 'Gupta', 'Iyer', 'Reddy', 'Nair', 'Patel', 'Singh', 'Das', 'Menon', 'Kapoor', 'Joshi',
+        'Khan', 'Bose', 'Chopra', 'Mehta', 'Rao', 'Pillai', 'Mishra', 'Yadav']
+CITIES = ['Patna', 'Delhi', 'Mumbai', 'Chennai', 'Kolkata', 'Bengaluru', 'Pune', 'Hyderabad', 'Jaipur', 'Lucknow']
+BLOOD_GROUPS = ['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-']
+BLOOD_WEIGHTS = [37, 27, 23, 6, 3, 2, 1.5, 0.5]
+REASONS = ['Routine checkup', 'Follow-up', 'Chest pain', 'Headache', 'Fever', 'Back pain', 'Joint pain',
+           'Breathing difficulty', 'Skin rash', 'Vaccination', 'Blood pressure review', 'Dizziness', None]
+DIAGNOSES = ['Hypertension', 'Viral fever', 'Migraine', 'Type 2 diabetes', 'Seasonal influenza', 'Lower back strain',
+             'Osteoarthritis', 'Asthma', 'Gastritis', 'Anxiety', 'Healthy, no findings']
+PRESCRIPTIONS = ['Paracetamol 500 mg as needed', 'Amlodipine 5 mg daily', 'Metformin 500 mg twice daily',
+                 'Ibuprofen 400 mg after meals', 'Rest and fluids', 'Salbutamol inhaler as needed', None]
+SLOT_MINUTES = [15, 20, 30, 30, 60]
+WEEKDAY_LOAD = [1.25, 1.05, 1.0, 0.95, 0.75]  # Monday .. Friday
+DOCTOR_SKEW = 1.0    # Zipf exponent over doctors
+PATIENT_SHAPE = 0.7  # gamma shape of patient visit rates
+MAX_FILL = 0.95      # even the most popular doctor has some free slots
+
+_scratch = MetaData()
+_calendar = Table('synthetic_calendar', _scratch, Column('date', Date, primary_key=True), prefixes=['TEMPORARY'])
+_doctor_slots = Table('synthetic_doctor_slot', _scratch, Column('doctor_id', Integer), Column('start_time', Time),
+                      Column('end_time', Time), prefixes=['TEMPORARY'])
+
+class Batches:
+    """Buffers rows per table and writes them with executemany once a batch
+    is full. Tables are always written in the order they were first added to,
+    so parents reach the database before the rows referencing them."""
+
+    def __init__(self, conn, size):
+        self.conn = conn
+        self.size = size
+        self.rows = {}
+        self.counts = {}
+
+    def add(self, table, row):
+        rows = self.rows.setdefault(table, [])
+        rows.append(row)
+        if len(rows) >= self.size:
+            self.flush()
+
+    def flush(self):
+        for name, rows in self.rows.items():
+            if rows:
+                self.conn.execute(insert(db.metadata.tables[name]), rows)
+                self.counts[name] = self.counts.get(name, 0) + len(rows)
+                self.rows[name] = []
+
+def _rng(seed, phase):
+    return random.Random(f'{seed}:{phase}')
+
+def _zipf_weights(n, skew, rng):
+    """Zipf weights over n items in a random rank order."""
+    weights = [1 / rank ** skew for rank in range(1, n + 1)]
+    rng.shuffle(weights)
+    return weights
+
+def _day_load(day):
+    # Mid-winter peak, about +-25% over the year
+    season = 1 + 0.25 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 15) / 365.25)
+    return season * WEEKDAY_LOAD[day.weekday()]
+
+def _fill_rates(weights, capacities, target):
+    """Per-doctor share of slots to book so that the expected total is
+    `target`, proportional to the weights and capped at MAX_FILL."""
+    rates = [0.0] * len(weights)
+    capped = set()
+    while True:
+        left = target - sum(MAX_FILL * capacities[i] for i in capped)
+        free = sum(weights[i] * capacities[i] for i in range(len(weights)) if i not in capped)
+        scale = left / free if free else 0
+        newly = {i for i in range(len(weights)) if i not in capped and scale * weights[i] > MAX_FILL}
+        if not newly:
+            break
+        capped |= newly
+    for i in range(len(weights)):
+        rates[i] = MAX_FILL if i in capped else max(scale * weights[i], 0)
+    return rates
+
+def _next_id(conn, model):
+    return (conn.scalar(select(func.max(model.id))) or 0) + 1
+
+def _advance_sequences(conn, models):
+    """generate() inserts ids itself, which PostgreSQL's serial sequences do
+    not see; move them past the highest id so later inserts don't collide. SQLite takes the next id from the table itself."""
+    if conn.dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__table__
+        conn.execute(select(func.setval(
+            func.pg_get_serial_sequence(conn.dialect.identifier_preparer.format_table(table), 'id'),
+            select(func.max(table.c.id)).scalar_subquery()
+        )))
+
+def _fast_writes(conn):
+    # Durability is pointless for a throwaway dataset, so skip the fsyncs
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('PRAGMA synchronous = OFF')
+    elif conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql('SET LOCAL synchronous_commit = off')
+
+def generate(doctors, patients, appointments, history_days, ahead_days, seed, batch_size=20000, echo=print):
+    """Adds `doctors` doctors with weekday schedules, `patients` patients and
+    about `appointments` appointments spread over the last `history_days` days
+    and the next `ahead_days` (past ones Completed or Cancelled, with
+    treatments; future ones mostly Booked), plus every availability slot of
+    that period. Returns the number of rows written per table."""
+    engine = db.engine
+    today = date.today()
+    first_day, last_day = today - timedelta(days=history_days), today + timedelta(days=ahead_days)
+    days = [first_day + timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+    workdays = [day for day in days if day.weekday() < 5]
+    tag = f's{seed}'
+    counts = {}
+    started = clock.perf_counter()
+
+    def phase(name, began):
+        echo(f'{name}: {clock.perf_counter() - began:.1f}s')
+
+    with engine.connect() as conn:
+        if conn.scalar(select(User.id).where(User.email.in_([f'doctor1.{tag}@example.com', f'patient1.{tag}@example.com']))):
+            raise click.ClickException(f'Data for seed {seed} already exists; pass another --seed')
+        roles = dict(conn.execute(select(Role.name, Role.id)).all())
+        departments = list(conn.execute(select(Department.id, Department.name).order_by(Department.id)))
+    if not departments or 'doctor' not in roles:
+        raise click.ClickException('Run `flask seed` first')
+
+    # Secondary indexes are rebuilt once at the end instead of row by row
+    big_tables = {'appointment', 'doctor_availability', 'treatment'}
+    dropped = [ix for table in db.metadata.sorted_tables if table.name in big_tables for ix in table.indexes]
+    with engine.begin() as conn:
+        for ix in dropped:
+            conn.execute(text(f'DROP INDEX IF EXISTS {ix.name}'))
+
+    try:
+        # All sample accounts share one password
+        password = hash_password('synthetic')
+
+        # --- Users, doctors, patients
+        began = clock.perf_counter()
+        rng = _rng(seed, 'people')
+        with engine.begin() as conn:
+            _fast_writes(conn)
+            rows = Batches(conn, batch_size)
+            user_id = _next_id(conn, User)
+            doctor_id = first_doctor = _next_id(conn, Doctor)
+            patient_id = first_patient = _next_id(conn, Patient)
+
+            def add_user(kind, n):
+                nonlocal user_id
+                name = f'{rng.choice(FIRST)} {rng.choice(LAST)}'
+                rows.add('user', {
+                    'id': user_id, 'email': f'{kind}{n}.{tag}@example.com', 'name': f'Dr. {name}' if kind == 'doctor' else name,
+                    'password': password, 'address': rng.choice(CITIES), 'pincode': f'{rng.randrange(110000, 860000)}',
+                    'phone': f'{rng.choice("6789")}{rng.randrange(10 ** 9):09d}', 'fs_uniquifier': f'{rng.getrandbits(128):032x}',
+                    'active': True
+                })
+                rows.add('user_roles', {'user_id': user_id, 'role_id': roles[kind]})
+                user_id += 1
+                return user_id - 1
+
+            schedules = []  # (doctor id, slot starts)
+            for n in range(1, doctors + 1):
+                department_id, department = rng.choice(departments)
+                rows.add('doctor', {
+                    'id': doctor_id, 'user_id': add_user('doctor', n), 'specialization': department, 'department_id': department_id,
+                    'qualification': rng.choice(['MBBS', 'MBBS, MD', 'MBBS, MS', 'MBBS, DNB']), 'experience': str(rng.randint(1, 35)),
+                    'bio': f'{department} specialist', 'is_active': rng.random() < 0.97, 'created_at': datetime.combine(first_day, time(9))
+                })
+                minutes = rng.choice(SLOT_MINUTES)
+                start, end = rng.choice([(9, 17), (9, 17), (8, 14), (12, 20)])
+                for weekday in range(5):
+                    rows.add('schedule_template', {'doctor_id': doctor_id, 'weekday': weekday, 'start_time': time(start), 'end_time': time(end),
+                                                   'slot_minutes': minutes, 'created_at': datetime.combine(first_day, time(9))})
+                rows.add('schedule_horizon', {'doctor_id': doctor_id, 'materialized_until': last_day})
+                starts = [datetime.combine(today, time(start)) + timedelta(minutes=m) for m in range(0, (end - start) * 60, minutes)]
+                schedules.append((doctor_id, [(s.time(), (s + timedelta(minutes=minutes)).time()) for s in starts]))
+                doctor_id += 1
+
+            for n in range(1, patients + 1):
+                rows.add('patient', {
+                    'id': patient_id, 'user_id': add_user('patient', n),
+                    'date_of_birth': date(1940, 1, 1) + timedelta(days=rng.randrange(80 * 365)),
+                    'gender': rng.choice(['Male', 'Female']), 'blood_group': rng.choices(BLOOD_GROUPS, BLOOD_WEIGHTS)[0],
+                    'emergency_contact': f'9{rng.randrange(10 ** 9):09d}', 'is_active': rng.random() < 0.98,
+                    'created_at': datetime.combine(first_day, time(9))
+                })
+                patient_id += 1
+            rows.flush()
+            counts.update(rows.counts)
+            conn.execute(update(Department).values(doctors_registered=select(func.count(Doctor.id)).where(
+                Doctor.department_id == Department.id, Doctor.is_active == True
+            ).scalar_subquery()))
+        phase(f'{doctors} doctors, {patients} patients', began)
+
+        # --- Availability, appointments, treatments
+        began = clock.perf_counter()
+        rng = _rng(seed, 'appointments')
+        patient_ids = range(first_patient, first_patient + patients)
+        patient_weights = list(accumulate(rng.gammavariate(PATIENT_SHAPE, 1) for _ in range(patients)))
+        doctor_weights = _zipf_weights(doctors, DOCTOR_SKEW, rng)
+        load = {day: _day_load(day) for day in workdays}
+        mean_load = sum(load.values()) / len(load)
+        capacities = [len(slots) * len(workdays) for _, slots in schedules]
+        if appointments > MAX_FILL * sum(capacities):
+            echo(f'note: {appointments} appointments do not fit in {sum(capacities)} slots; generating about {int(MAX_FILL * sum(capacities))}')
+        rates = _fill_rates(doctor_weights, capacities, appointments)
+
+        per_transaction = max(1, 500000 // max(1, len(workdays) * 16))  # doctors per commit
+        with engine.connect() as conn:
+            # Temporary tables live on this connection only
+            _scratch.create_all(conn)
+            conn.execute(insert(_calendar), [{'date': day} for day in workdays])
+            conn.execute(insert(_doctor_slots), [{'doctor_id': doctor, 'start_time': start, 'end_time': end}
+                                                 for doctor, slots in schedules for start, end in slots])
+            conn.commit()
+            appointment_id = _next_id(conn, Appointment)
+            conn.rollback()
+
+            for chunk in range(0, doctors, per_transaction):
+                with conn.begin():
+                    _fast_writes(conn)
+                    chunk_doctors = schedules[chunk:chunk + per_transaction]
+                    slots_written = conn.execute(insert(DoctorAvailability.__table__).from_select(
+                        ['doctor_id', 'date', 'start_time', 'end_time', 'is_available'],
+                        select(_doctor_slots.c.doctor_id, _calendar.c.date, _doctor_slots.c.start_time, _doctor_slots.c.end_time, literal(True))
+                        .select_from(_doctor_slots.join(_calendar, true()))
+                        .where(_doctor_slots.c.doctor_id.between(chunk_doctors[0][0], chunk_doctors[-1][0]))
+                    )).rowcount
+                    counts['doctor_availability'] = counts.get('doctor_availability', 0) + slots_written
+
+                    rows = Batches(conn, batch_size)
+                    for (doctor, slots), rate in zip(chunk_doctors, rates[chunk:chunk + per_transaction]):
+                        for day in workdays:
+                            expected = min(len(slots), rate * len(slots) * load[day] / mean_load)
+                            booked = int(expected) + (rng.random() < expected - int(expected))
+                            if not booked:
+                                continue
+                            past = day < today
+                            for (start, _), patient in zip(rng.sample(slots, booked), rng.choices(patient_ids, cum_weights=patient_weights, k=booked)):
+                                roll = rng.random()
+                                status = ('Completed' if roll < 0.86 else 'Cancelled') if past else ('Booked' if roll < 0.93 else 'Cancelled')
+                                created = datetime.combine(day - timedelta(days=rng.randint(1, 30)), time(rng.randint(7, 21), rng.randrange(60)))
+                                rows.add('appointment', {
+                                    'id': appointment_id, 'patient_id': patient, 'doctor_id': doctor, 'date': day, 'time': start,
+                                    'status': status, 'reason': rng.choice(REASONS), 'created_at': created,
+                                    'updated_at': datetime.combine(day, start) if status == 'Completed' else created
+                                })
+                                if status == 'Completed' and rng.random() < 0.95:
+                                    seen = datetime.combine(day, start) + timedelta(minutes=10)
+                                    rows.add('treatment', {
+                                        'appointment_id': appointment_id, 'diagnosis': rng.choice(DIAGNOSES),
+                                        'prescription': rng.choice(PRESCRIPTIONS), 'notes': None, 'created_at': seen, 'updated_at': seen
+                                    })
+                                appointment_id += 1
+                    rows.flush()
+                    for table, n in rows.counts.items():
+                        counts[table] = counts.get(table, 0) + n
+                echo(f'  {min(chunk + per_transaction, doctors)}/{doctors} doctors, {counts.get("appointment", 0)} appointments, '
+                     f'{clock.perf_counter() - began:.0f}s')
+            _scratch.drop_all(conn)
+            conn.commit()
+        phase(f'{counts.get("doctor_availability", 0)} slots, {counts.get("appointment", 0)} appointments, '
+              f'{counts.get("treatment", 0)} treatments', began)
+    finally:
+        # Pooled connections still have the fast-write settings
+        engine.dispose()
+        began = clock.perf_counter()
+        with engine.begin() as conn:
+            _advance_sequences(conn, [User, Doctor, Patient, Appointment])
+        # Also after a failed run, so the tables are never left unindexed
+        ensure_indexes()
+    with engine.begin() as conn:
+        conn.exec_driver_sql('ANALYZE')
+    phase('indexes', began)
+    began = clock.perf_counter()
+    reconcile_stats()
+    phase('statistics', began)
+    began = clock.perf_counter()
+    rebuild_search_index()
+    phase('search index', began)
+    echo(f'done in {clock.perf_counter() - started:.0f}s')
+    return counts
+
+@click.command('generate-data')
+@click.option('--doctors', type=int, default=200, show_default=True)
+@click.option('--patients', type=int, default=20000, show_default=True)
+@click.option('--appointments', type=int, default=200000, show_default=True, help='Approximate; capped by the available slots.')
+@click.option('--history-days', type=int, default=365, show_default=True, help='Days of past schedule and appointments.')
+@click.option('--ahead-days', type=int, default=28, show_default=True, help='Days of future schedule and bookings.')
+@click.option('--seed', type=int, default=1, show_default=True, help='Same seed, same data; each seed can be loaded once.')
+@click.option('--batch-size', type=int, default=20000, show_default=True)
+@with_appcontext
+def generate_data_command(doctors, patients, appointments, history_days, ahead_days, seed, batch_size):
+    """Bulk-load a large synthetic dataset for performance work."""
+    counts = generate(doctors, patients, appointments, history_days, ahead_days, seed, batch_size, echo=click.echo)
+    for table, n in sorted(counts.items()):
+        click.echo(f'{table:20} {n:>10}')
@@ -0,0 +1,20 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+def dialect_insert(bind, table):
+    """INSERT construct of the bind's dialect, which is what exposes
+    on_conflict_do_update / on_conflict_do_nothing."""
+    if bind.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    if bind.dialect.name == 'sqlite':
+        return sqlite.insert(table)
+    raise NotImplementedError(f'Upserts are not supported on {bind.dialect.name}')
+
+def increment(conn, table, keys, column, delta):
+    """Adds `delta` to `column` of the row identified by `keys`, creating the
+    row when it does not exist yet. Atomic on both SQLite and PostgreSQL."""
+    stmt = dialect_insert(conn, table).values(**keys, **{column: delta})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + stmt.excluded[column]}
+    )
+    conn.execute(stmt)
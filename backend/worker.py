@@ -0,0 +1,4 @@
+# Celery entry point: celery -A backend.worker worker / beat
+from backend.app import app
+
+celery_app = app.extensions['celery']
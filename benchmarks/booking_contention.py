@@ -0,0 +1,133 @@
+"""Load test of the booking endpoint: N patient clients race for M slots.
+
+    python -m benchmarks.booking_contention --db sqlite:////tmp/curanet-booking.db --clients 16 --slots 40
+
+Every client keeps picking random slots of one doctor's day until no free slot
+is left. Afterwards every slot must hold exactly one Booked appointment, the
+number of 201 responses must equal the number of slots, and nothing may have
+answered with anything but 201 or 409. Prints bookings per second.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time as clock
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='sqlite:////tmp/curanet-booking.db')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--slots', type=int, default=40)
+    return parser.parse_args()
+
+args = parse_args()
+os.environ['DATABASE_URL'] = args.db
+
+from flask_security import hash_password
+from sqlalchemy import delete, func, insert, select
+from backend.app import app
+from backend.createData import seed
+from backend.extensions import db
+from backend.models import User, UserRoles, Role, Doctor, Patient, Appointment, DoctorAvailability
+
+PASSWORD = 'bench123'
+
+def prepare():
+    """One doctor with `slots` fifteen-minute slots on a fresh day, plus one
+    patient account per client. Returns (doctor id, day, slot times, emails)."""
+    with app.app_context():
+        seed()
+    with app.app_context(), db.engine.begin() as conn:
+        emails = [f'booking-bench-{i}@example.com' for i in range(args.clients)]
+        existing = set(conn.scalars(select(User.email).where(User.email.in_(emails))))
+        missing = [email for email in emails if email not in existing]
+        if missing:
+            password = hash_password(PASSWORD)
+            role = conn.scalar(select(Role.id).where(Role.name == 'patient'))
+            first = (conn.scalar(select(func.max(User.id))) or 0) + 1
+            conn.execute(insert(User), [{'id': first + i, 'email': email, 'name': 'Bench Patient', 'password': password,
+                                         'fs_uniquifier': f'booking-bench-{first + i}', 'active': True} for i, email in enumerate(missing)])
+            conn.execute(insert(UserRoles), [{'user_id': first + i, 'role_id': role} for i in range(len(missing))])
+            conn.execute(insert(Patient), [{'user_id': first + i, 'date_of_birth': date(1990, 1, 1), 'gender': 'Female',
+                                            'blood_group': 'A+', 'is_active': True} for i in range(len(missing))])
+
+        doctor_id = conn.scalar(select(Doctor.id).where(Doctor.is_active == True).order_by(Doctor.id))
+        day = date.today() + timedelta(days=400 + random.randrange(1000))
+        starts = [(time(hour=8 + i // 4, minute=15 * (i % 4))) for i in range(args.slots)]
+        conn.execute(delete(Appointment).where(Appointment.doctor_id == doctor_id, Appointment.date == day))
+        conn.execute(delete(DoctorAvailability).where(DoctorAvailability.doctor_id == doctor_id, DoctorAvailability.date == day))
+        conn.execute(insert(DoctorAvailability), [{'doctor_id': doctor_id, 'date': day, 'start_time': start,
+                                                   'end_time': (datetime.combine(day, start) + timedelta(minutes=15)).time(),
+                                                   'is_available': True} for start in starts])
+    return doctor_id, day, starts, emails
+
+def main():
+    doctor_id, day, starts, emails = prepare()
+    headers = []
+    for email in emails:
+        response = app.test_client().post('/api/login', json={'email': email, 'password': PASSWORD})
+        headers.append({'Auth-Token': response.json['auth_token']})
+
+    statuses = Counter()
+    winners = Counter()
+    lock = threading.Lock()
+    remaining = set(starts)
+
+    def client(i):
+        rng = random.Random(i)
+        http = app.test_client(use_cookies=False)
+        while True:
+            with lock:
+                if not remaining:
+                    return
+                start = rng.choice(sorted(remaining))
+            response = http.post('/api/patient/appointments', headers=headers[i], json={
+                'doctor_id': doctor_id, 'date': day.strftime('%Y-%m-%d'), 'time': start.strftime('%H:%M'), 'reason': 'load test'
+            })
+            with lock:
+                statuses[response.status_code] += 1
+                if response.status_code == 201:
+                    winners[start] += 1
+                if response.status_code in (201, 409):
+                    remaining.discard(start)
+                else:
+                    print(f'unexpected {response.status_code}: {response.get_json()}')
+                    remaining.discard(start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    began = clock.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = clock.perf_counter() - began
+
+    with app.app_context():
+        booked = Counter(row.time for row in db.session.execute(select(Appointment.time).where(
+            Appointment.doctor_id == doctor_id, Appointment.date == day, Appointment.status == 'Booked'
+        )))
+
+    requests = sum(statuses.values())
+    print(f'{args.clients} clients, {args.slots} slots: {requests} requests in {elapsed:.2f}s '
+          f'({statuses[201] / elapsed:.1f} bookings/s, {requests / elapsed:.1f} requests/s)')
+    print('responses:', dict(sorted(statuses.items())))
+    problems = []
+    if statuses[201] != args.slots:
+        problems.append(f'{statuses[201]} successful bookings for {args.slots} slots')
+    if any(count != 1 for count in winners.values()) or any(count != 1 for count in booked.values()):
+        problems.append('a slot was booked more than once')
+    if len(booked) != args.slots:
+        problems.append(f'{len(booked)} slots hold a Booked appointment')
+    if set(statuses) - {201, 409}:
+        problems.append('unexpected status codes')
+    for problem in problems:
+        print('FAIL:', problem)
+    if not problems:
+        print('OK: every slot booked exactly once, every loser got 409')
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
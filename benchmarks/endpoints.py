@@ -0,0 +1,514 @@
+"""Latency, SQL statements and memory of every API route, checked against
+per-route budgets.
+
+    python -m benchmarks.endpoints --db sqlite:////tmp/curanet-endpoints.db
+    python -m benchmarks.endpoints --doctors 2000 --patients 500000 --appointments 2000000 --db ...
+    python -m benchmarks.endpoints --only /api/patient --repeat 50
+    python -m benchmarks.endpoints --write-budgets
+
+The database is seeded and filled by the synthetic generator on first use
+(same sizes as `flask generate-data`). Every request goes through the Flask
+test client as the busiest synthetic doctor and patient, so list endpoints see
+their worst case. Writes are paired with an unmeasured undo (book then cancel,
+soft delete then restore, ...) so the run can repeat and leaves the data as it
+found it. Background jobs run eagerly inside the request.
+
+Each route is requested --warmup + --repeat times; the table shows p50/p95
+latency and the most SQL statements any measured request ran, and one more
+request under tracemalloc gives its peak allocation. The run fails (exit 1)
+when a route answers with an unexpected status, has no scenario below, runs
+more statements than its budget in budgets.json (an N+1 shows up here first)
+or its p95 exceeds the budget by more than --latency-threshold.
+--write-budgets stores this run's numbers as the new budgets instead.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import statistics
+import sys
+import time as clock
+import tracemalloc
+from datetime import date, timedelta
+
+BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'budgets.json')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='sqlite:////tmp/curanet-endpoints.db')
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--appointments', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', help='run the routes whose name contains this text')
+    parser.add_argument('--budgets', default=BUDGETS)
+    parser.add_argument('--latency-threshold', type=float, default=1.0,
+                        help='allowed p95 regression over the budget, as a fraction (default 1.0 = +100%%)')
+    parser.add_argument('--write-budgets', action='store_true')
+    return parser.parse_args()
+
+args = parse_args()
+os.environ['DATABASE_URL'] = args.db
+# Without a broker the jobs run inside the request, where they are measured
+os.environ.pop('CELERY_BROKER_URL', None)
+os.environ.pop('CELERY_RESULT_BACKEND', None)
+
+from sqlalchemy import event, func, select
+from backend.app import app
+from backend.caching import invalidate
+from backend.createData import seed
+from backend.extensions import db
+from backend.models import (User, Doctor, Patient, Department, Appointment, Treatment, DoctorAvailability,
+                            ScheduleException, ScheduleHorizon, ScheduleTemplate)
+from backend.syntheticData import generate
+
+PASSWORD = 'synthetic'
+RUN = os.getpid()
+
+class Bench:
+    """Test client plus one auth token per role and the ids the scenarios use."""
+
+    def __init__(self):
+        # Tokens only: a session cookie from the last login would win over them
+        self.client = app.test_client(use_cookies=False)
+        self.tokens = {}
+        self.ids = {}
+
+    def login(self, role, email, password=PASSWORD):
+        response = self.client.post('/api/login', json={'email': email, 'password': password})
+        if response.status_code != 200:
+            raise RuntimeError(f'login as {email}: {response.status_code} {response.get_data(as_text=True)[:200]}')
+        self.tokens[role] = response.json['auth_token']
+
+    def open(self, role, method, path, body=None, headers=None):
+        headers = dict(headers or {}, **({'Auth-Token': self.tokens[role]} if role else {}))
+        # Buffered, so a streamed body is produced (and measured) here; its
+        # peak memory then includes the copy of the body the client keeps
+        return self.client.open(path, method=method, json=body, headers=headers, buffered=True)
+
+    def call(self, role, method, path, body=None):
+        """An unmeasured request that has to succeed."""
+        response = self.open(role, method, path, body)
+        if response.status_code >= 300:
+            raise RuntimeError(f'{method} {path}: {response.status_code} {response.get_data(as_text=True)[:200]}')
+        return response
+
+# --- Data
+
+def prepare():
+    with app.app_context():
+        seed()
+        tag = f's{args.seed}'
+        if not db.session.scalar(select(User.id).where(User.email == f'doctor1.{tag}@example.com')):
+            generate(args.doctors, args.patients, args.appointments, 365, 28, args.seed)
+
+def busiest(column, kind):
+    """Id and email of the synthetic doctor or patient with most appointments."""
+    model = Doctor if kind == 'doctor' else Patient
+    return db.session.execute(
+        select(model.id, User.email).join(User, User.id == model.user_id).join(Appointment, column == model.id)
+        .where(User.email.like(f'{kind}%.s{args.seed}@example.com'), model.is_active == True)
+        .group_by(model.id, User.email).order_by(func.count().desc()).limit(1)
+    ).one()
+
+def free_slots(doctor_id, n, reuse=True):
+    """Future open slots that no appointment row holds. With reuse, slots held
+    by cancelled rows of earlier runs count as free: booking reactivates them."""
+    held = (Appointment.doctor_id == DoctorAvailability.doctor_id) & (Appointment.date == DoctorAvailability.date) \
+        & (Appointment.time == DoctorAvailability.start_time)
+    if reuse:
+        held &= (Appointment.reason != 'Benchmark') | (Appointment.reason == None) | (Appointment.status != 'Cancelled')
+    rows = db.session.execute(
+        select(DoctorAvailability.date, DoctorAvailability.start_time).outerjoin(Appointment, held)
+        .where(DoctorAvailability.doctor_id == doctor_id, DoctorAvailability.date > date.today(),
+               DoctorAvailability.is_available == True, Appointment.id == None)
+        .order_by(DoctorAvailability.date, DoctorAvailability.start_time).limit(n)
+    ).all()
+    if len(rows) < n:
+        raise RuntimeError(f'doctor {doctor_id} has fewer than {n} free slots')
+    return [{'date': day.strftime('%Y-%m-%d'), 'time': start.strftime('%H:%M')} for day, start in rows]
+
+def fixtures(b):
+    """Finds the rows the scenarios work on and logs every role in."""
+    with app.app_context():
+        ids = b.ids
+        ids['doctor'], doctor_email = busiest(Appointment.doctor_id, 'doctor')
+        ids['patient'], patient_email = busiest(Appointment.patient_id, 'patient')
+        synthetic_doctors = select(Doctor.id).join(User).where(
+            User.email.like(f'doctor%.s{args.seed}@example.com'), Doctor.is_active == True, Doctor.id != ids['doctor'])
+        booked = func.count(Appointment.id)
+        # Bookings go to a quiet doctor; the sample doctor (no bookings) takes the schedule writes
+        ids['quiet_doctor'] = db.session.scalar(
+            synthetic_doctors.outerjoin(Appointment, (Appointment.doctor_id == Doctor.id) & (Appointment.date > date.today())
+                                        & (Appointment.status == 'Booked'))
+            .group_by(Doctor.id).order_by(booked, Doctor.id).limit(1))
+        ids['victim_doctor'] = db.session.scalar(synthetic_doctors.where(Doctor.id != ids['quiet_doctor']).order_by(Doctor.id.desc()).limit(1))
+        ids['victim_patient'] = db.session.scalar(
+            select(Patient.id).join(User).where(User.email.like(f'patient%.s{args.seed}@example.com'), Patient.is_active == True,
+                                                Patient.id != ids['patient']).order_by(Patient.id.desc()).limit(1))
+        ids['sample_doctor'] = db.session.scalar(select(Doctor.id).join(User).where(User.email == 'doctor@gmail.com'))
+        ids['department'] = db.session.scalar(select(Department.id).where(Department.name == 'Cardiology'))
+        ids['busiest_date'] = db.session.scalar(
+            select(Appointment.date).group_by(Appointment.date).order_by(func.count(Appointment.id).desc()).limit(1)).isoformat()
+        # Booking, cancelling and rescheduling from slot 1 to slot 3; a
+        # reschedule target must not even hold a cancelled row
+        ids['slots'] = free_slots(ids['quiet_doctor'], 3)
+        ids['slots'].append(next(slot for slot in free_slots(ids['quiet_doctor'], 4, reuse=False) if slot not in ids['slots']))
+
+        mine = select(Appointment).where(Appointment.doctor_id == ids['doctor'])
+        ids['history_patient'] = db.session.scalar(select(Appointment.patient_id).where(Appointment.doctor_id == ids['doctor']).order_by(Appointment.date.desc()).limit(1))
+        ids['booked'] = db.session.scalar(mine.where(Appointment.status == 'Booked', Appointment.date > date.today()).limit(1)).id
+        untreated = db.session.scalar(mine.outerjoin(Treatment).where(Appointment.status == 'Completed', Treatment.id == None).limit(1))
+        treated = db.session.scalar(select(Treatment).join(Appointment).where(Appointment.doctor_id == ids['doctor']).limit(1))
+        if untreated is None or treated is None:
+            raise RuntimeError('the busiest doctor needs completed appointments with and without a treatment')
+        ids['untreated'] = untreated.id
+        ids['treatment'] = {'appointment_id': treated.appointment_id, 'diagnosis': treated.diagnosis}
+        ids['victim_doctor_name'] = db.session.get(Doctor, ids['victim_doctor']).user.name
+        ids['victim_patient_name'] = db.session.get(Patient, ids['victim_patient']).user.name
+        ids['patient_name'] = db.session.get(Patient, ids['patient']).user.name
+        db.session.commit()
+
+    b.login('admin', 'admin@gmail.com', 'helloadmin')
+    b.login('doctor', doctor_email)
+    b.login('patient', patient_email)
+    b.login('sample_doctor', 'doctor@gmail.com', 'doctor123')
+
+# --- Undo helpers (unmeasured, outside any request)
+
+def delete_user(user_id):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        if user.doctor_profile:
+            department_id = user.doctor_profile.department_id
+            for model in (ScheduleTemplate, ScheduleHorizon, ScheduleException):
+                model.query.filter_by(doctor_id=user.doctor_profile.id).delete()
+        db.session.delete(user)
+        db.session.flush()
+        if user.doctor_profile and department_id:
+            department = db.session.get(Department, department_id)
+            department.doctors_registered = Doctor.query.filter_by(department_id=department_id, is_active=True).count()
+        db.session.commit()
+        invalidate('doctors', 'departments')
+
+def doctor_user(doctor_id):
+    with app.app_context():
+        return db.session.get(Doctor, doctor_id).user_id
+
+def delete_department(department_id):
+    with app.app_context():
+        db.session.delete(db.session.get(Department, department_id))
+        db.session.commit()
+        invalidate('departments')
+
+def reactivate(model, profile_id):
+    with app.app_context():
+        profile = db.session.get(model, profile_id)
+        profile.is_active = True
+        profile.user.active = True
+        if model is Doctor and profile.department_id:
+            db.session.flush()
+            department = db.session.get(Department, profile.department_id)
+            department.doctors_registered = Doctor.query.filter_by(department_id=profile.department_id, is_active=True).count()
+        db.session.commit()
+        invalidate('doctors', 'departments')
+
+def delete_treatment(appointment_id):
+    with app.app_context():
+        Treatment.query.filter_by(appointment_id=appointment_id).delete()
+        db.session.commit()
+
+def window_availability(doctor_id):
+    """The doctor's slots in the window POST /api/doctor/availability replaces,
+    so posting them back changes nothing."""
+    with app.app_context():
+        rows = DoctorAvailability.query.filter(DoctorAvailability.doctor_id == doctor_id,
+                                               DoctorAvailability.date.between(date.today(), date.today() + timedelta(days=14)))
+        return {'availabilities': [{'date': row.date.strftime('%Y-%m-%d'), 'start_time': row.start_time.strftime('%H:%M'),
+                                    'end_time': row.end_time.strftime('%H:%M')} for row in rows]}
+
+def latest_exception(doctor_id):
+    with app.app_context():
+        return db.session.scalar(select(func.max(ScheduleException.id)).where(ScheduleException.doctor_id == doctor_id))
+
+def exception_day():
+    """A weekday inside the materialized horizon, where the sample doctor has slots."""
+    day = date.today() + timedelta(days=7)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return {'date': day.strftime('%Y-%m-%d'), 'reason': 'Benchmark'}
+
+def add_exception(b, s):
+    b.call('sample_doctor', 'POST', '/api/doctor/schedule/exceptions', exception_day())
+    s['exception'] = latest_exception(b.ids['sample_doctor'])
+
+def book(b, slot):
+    body = dict(slot, doctor_id=b.ids['quiet_doctor'], reason='Benchmark')
+    return b.call('patient', 'POST', '/api/patient/appointments', body).json['appointment_id']
+
+def revalidate(role, path):
+    """A 304 scenario: If-None-Match with the ETag fetched at setup."""
+    return dict(variant='not modified', status=304,
+                setup=lambda b, s: s.update(etag=b.call(role, 'GET', path).headers['ETag']),
+                headers=lambda b, s: {'If-None-Match': s['etag']})
+
+def cancel_rescheduled(b, s):
+    # Both slots now hold cancelled rows for the next run to take over
+    b.call('patient', 'DELETE', f'/api/patient/appointments/{s["appointment"]}')
+
+# --- Scenarios
+
+def scenario(method, rule, role, path=None, body=None, headers=None, status=200, variant=None, setup=None, before=None, after=None, teardown=None,
+             warmup=None, repeat=None):
+    """One measured request per iteration. path, body and headers may be functions of
+    (bench, state); setup/teardown run once, before/after around every
+    request. state['i'] counts the iterations. warmup/repeat lower the
+    command-line counts for routes that take seconds."""
+    name = f'{method} {rule}' + (f' [{variant}]' if variant else '')
+    return dict(name=name, method=method, rule=rule, role=role, path=path or rule, body=body, headers=headers, status=status,
+                setup=setup, before=before, after=after, teardown=teardown, warmup=warmup, repeat=repeat)
+
+def new_user(kind, s):
+    return f'bench-{kind}-{RUN}-{s["i"]}@example.com'
+
+SCENARIOS = [
+    # admin
+    scenario('GET', '/api/admin/dashboard', 'admin'),
+    scenario('GET', '/api/admin/cache-stats', 'admin'),
+    scenario('GET', '/api/admin/metrics', 'admin'),
+    scenario('GET', '/api/admin/slow-queries', 'admin'),
+    scenario('GET', '/api/admin/appointments', 'admin'),
+    scenario('GET', '/api/admin/appointments', 'admin', variant='ndjson day',
+             path=lambda b, s: f'/api/admin/appointments?format=ndjson&date={b.ids["busiest_date"]}'),
+    scenario('GET', '/api/admin/departments', 'admin'),
+    scenario('POST', '/api/admin/departments', 'admin', status=201,
+             body=lambda b, s: {'name': f'Bench {RUN} {s["i"]}', 'description': 'Benchmark'},
+             after=lambda b, s, r: delete_department(r.json['department_id'])),
+    scenario('GET', '/api/admin/doctors', 'admin'),
+    scenario('POST', '/api/admin/doctors', 'admin', status=201,
+             body=lambda b, s: {'email': new_user('doctor', s), 'password': 'bench123', 'name': 'Dr. Bench',
+                                'specialization': 'Cardiology', 'department_id': b.ids['department']},
+             after=lambda b, s, r: delete_user(doctor_user(r.json['doctor_id']))),
+    scenario('PUT', '/api/admin/doctors/<int:doctor_id>', 'admin',
+             path=lambda b, s: f'/api/admin/doctors/{b.ids["victim_doctor"]}', body=lambda b, s: {'name': b.ids['victim_doctor_name']}),
+    scenario('DELETE', '/api/admin/doctors/<int:doctor_id>', 'admin',
+             path=lambda b, s: f'/api/admin/doctors/{b.ids["victim_doctor"]}',
+             after=lambda b, s, r: reactivate(Doctor, b.ids['victim_doctor'])),
+    scenario('GET', '/api/admin/jobs/<job_id>', 'admin',
+             setup=lambda b, s: s.update(job=b.call('admin', 'POST', '/api/admin/reports/department-summary', {}).json['job_id']),
+             path=lambda b, s: f'/api/admin/jobs/{s["job"]}'),
+    scenario('GET', '/api/admin/jobs/<job_id>/result', 'admin',
+             setup=lambda b, s: s.update(job=b.call('admin', 'POST', '/api/admin/reports/department-summary', {}).json['job_id']),
+             path=lambda b, s: f'/api/admin/jobs/{s["job"]}/result'),
+    scenario('GET', '/api/admin/jobs/<job_id>/result', 'admin', variant='csv',
+             setup=lambda b, s: s.update(job=b.call('admin', 'POST', '/api/admin/reports/department-summary', {}).json['job_id']),
+             path=lambda b, s: f'/api/admin/jobs/{s["job"]}/result?format=csv'),
+    scenario('GET', '/api/admin/patient-history/<int:patient_id>', 'admin',
+             path=lambda b, s: f'/api/admin/patient-history/{b.ids["patient"]}'),
+    scenario('GET', '/api/admin/patients', 'admin'),
+    # Every patient, so a few seconds per request
+    scenario('GET', '/api/admin/patients', 'admin', variant='ndjson', path='/api/admin/patients?format=ndjson', warmup=0, repeat=2),
+    scenario('GET', '/api/admin/patients/<int:patient_id>', 'admin',
+             path=lambda b, s: f'/api/admin/patients/{b.ids["patient"]}'),
+    scenario('PUT', '/api/admin/patients/<int:patient_id>', 'admin',
+             path=lambda b, s: f'/api/admin/patients/{b.ids["victim_patient"]}', body=lambda b, s: {'name': b.ids['victim_patient_name']}),
+    scenario('DELETE', '/api/admin/patients/<int:patient_id>', 'admin',
+             path=lambda b, s: f'/api/admin/patients/{b.ids["victim_patient"]}',
+             after=lambda b, s, r: reactivate(Patient, b.ids['victim_patient'])),
+    scenario('POST', '/api/admin/recompute/<kind>', 'admin', path='/api/admin/recompute/schedules', status=200, variant='schedules'),
+    scenario('POST', '/api/admin/reports/department-summary', 'admin', body={}, status=200),
+    scenario('POST', '/api/admin/reports/doctor-activity', 'admin', status=200,
+             body=lambda b, s: {'doctor_id': b.ids['doctor']}),
+    scenario('GET', '/api/admin/search', 'admin', variant='patient',
+             path=lambda b, s: f'/api/admin/search?type=patient&q={b.ids["patient_name"].split()[-1]}'),
+    scenario('GET', '/api/admin/search', 'admin', variant='doctor', path='/api/admin/search?type=doctor&q=Sharma'),
+    scenario('GET', '/api/admin/search', 'admin', variant='specialization', path='/api/admin/search?type=specialization&q=Cardio'),
+
+    # doctor
+    scenario('GET', '/api/doctor/dashboard', 'doctor'),
+    scenario('GET', '/api/doctor/appointments', 'doctor'),
+    scenario('PUT', '/api/doctor/appointments/<int:appointment_id>', 'doctor',
+             path=lambda b, s: f'/api/doctor/appointments/{b.ids["booked"]}',
+             body=lambda b, s: {'status': 'Completed' if s['i'] % 2 == 0 else 'Booked'},
+             teardown=lambda b, s: b.call('doctor', 'PUT', f'/api/doctor/appointments/{b.ids["booked"]}', {'status': 'Booked'})),
+    scenario('GET', '/api/doctor/availability', 'doctor'),
+    scenario('GET', '/api/doctor/availability', 'doctor', **revalidate('doctor', '/api/doctor/availability')),
+    scenario('POST', '/api/doctor/availability', 'sample_doctor',
+             setup=lambda b, s: s.update(body=window_availability(b.ids['sample_doctor'])), body=lambda b, s: s['body']),
+    scenario('GET', '/api/doctor/patient-history/<int:patient_id>', 'doctor',
+             path=lambda b, s: f'/api/doctor/patient-history/{b.ids["history_patient"]}'),
+    scenario('GET', '/api/doctor/schedule', 'doctor'),
+    scenario('PUT', '/api/doctor/schedule', 'sample_doctor',
+             setup=lambda b, s: s.update(body={'templates': b.call('sample_doctor', 'GET', '/api/doctor/schedule').json['templates']}),
+             body=lambda b, s: s['body']),
+    scenario('POST', '/api/doctor/schedule/exceptions', 'sample_doctor', body=lambda b, s: exception_day(),
+             after=lambda b, s, r: b.call('sample_doctor', 'DELETE', f'/api/doctor/schedule/exceptions/{latest_exception(b.ids["sample_doctor"])}')),
+    scenario('DELETE', '/api/doctor/schedule/exceptions/<int:exception_id>', 'sample_doctor',
+             before=add_exception, path=lambda b, s: f'/api/doctor/schedule/exceptions/{s["exception"]}'),
+    scenario('POST', '/api/doctor/treatment', 'doctor', status=201,
+             body=lambda b, s: {'appointment_id': b.ids['untreated'], 'diagnosis': 'Benchmark', 'prescription': '', 'notes': ''},
+             after=lambda b, s, r: delete_treatment(b.ids['untreated'])),
+    scenario('PUT', '/api/doctor/treatment', 'doctor', body=lambda b, s: b.ids['treatment']),
+
+    # auth
+    scenario('POST', '/api/login', None, body={'email': 'ram@gmail.com', 'password': 'ram123'}),
+    scenario('POST', '/api/logout', 'ram', before=lambda b, s: b.login('ram', 'ram@gmail.com', 'ram123')),
+    scenario('POST', '/api/register', None, status=201,
+             body=lambda b, s: {'email': new_user('patient', s), 'password': 'bench123', 'name': 'Bench Patient', 'address': 'Delhi',
+                                'pincode': '110001', 'phone': '9000000000', 'blood_group': 'O+', 'gender': 'Female',
+                                'date_of_birth': '1990-01-01'},
+             after=lambda b, s, r: delete_user(r.json['user_id'])),
+
+    # patient
+    scenario('GET', '/api/patient/dashboard', 'patient'),
+    scenario('GET', '/api/patient/dashboard', 'patient', **revalidate('patient', '/api/patient/dashboard')),
+    scenario('GET', '/api/patient/doctors', 'patient'),
+    scenario('GET', '/api/patient/appointments', 'patient'),
+    scenario('GET', '/api/patient/appointments', 'patient', **revalidate('patient', '/api/patient/appointments')),
+    scenario('POST', '/api/patient/appointments', 'patient', status=201,
+             body=lambda b, s: dict(b.ids['slots'][0], doctor_id=b.ids['quiet_doctor'], reason='Benchmark'),
+             after=lambda b, s, r: b.call('patient', 'DELETE', f'/api/patient/appointments/{r.json["appointment_id"]}')),
+    # Reschedules one appointment back and forth between two slots; each move
+    # after the first takes over the row the previous one cancelled
+    scenario('PUT', '/api/patient/appointments/<int:appointment_id>', 'patient',
+             setup=lambda b, s: s.update(appointment=book(b, b.ids['slots'][1])),
+             path=lambda b, s: f'/api/patient/appointments/{s["appointment"]}',
+             body=lambda b, s: b.ids['slots'][3 if s['i'] % 2 == 0 else 1],
+             after=lambda b, s, r: s.update(appointment=r.json['appointment_id']),
+             teardown=cancel_rescheduled),
+    scenario('DELETE', '/api/patient/appointments/<int:appointment_id>', 'patient',
+             before=lambda b, s: s.update(appointment=book(b, b.ids['slots'][2])),
+             path=lambda b, s: f'/api/patient/appointments/{s["appointment"]}'),
+    scenario('GET', '/api/patient/profile', 'patient'),
+    scenario('PUT', '/api/patient/profile', 'patient', body=lambda b, s: {'name': b.ids['patient_name']}),
+    scenario('GET', '/api/patient/treatment-history', 'patient'),
+    scenario('GET', '/api/patient/search', 'patient', variant='specialization', path='/api/patient/search?type=specialization&q=Cardio'),
+    scenario('GET', '/api/patient/search', 'patient', variant='doctor', path='/api/patient/search?type=doctor&q=Sharma'),
+]
+
+def uncovered():
+    """(method, rule) pairs under /api/ that no scenario requests."""
+    covered = {(s['method'], s['rule']) for s in SCENARIOS}
+    routes = {(method, rule.rule) for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')
+              for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    return sorted(routes - covered)
+
+# --- Measurement
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.n = 0
+        event.listen(engine, 'before_cursor_execute', self.count)
+
+    def count(self, *_):
+        self.n += 1
+
+def value(field, b, s):
+    return field(b, s) if callable(field) else field
+
+def measure(b, counter, sc):
+    s = {}
+    if sc['setup']:
+        sc['setup'](b, s)
+    latencies, statements, peak, errors = [], [], 0, []
+    # Garbage of the previous route should not be collected on this one's clock
+    gc.collect()
+    warmup = min(args.warmup, sc['warmup']) if sc['warmup'] is not None else args.warmup
+    repeat = min(args.repeat, sc['repeat']) if sc['repeat'] is not None else args.repeat
+    total = warmup + repeat + 1
+    try:
+        for i in range(total):
+            s['i'] = i
+            traced = i == total - 1
+            if sc['before']:
+                sc['before'](b, s)
+            path, body, headers = value(sc['path'], b, s), value(sc['body'], b, s), value(sc['headers'], b, s)
+            if traced:
+                tracemalloc.start()
+            counter.n = 0
+            began = clock.perf_counter()
+            response = b.open(sc['role'], sc['method'], path, body, headers)
+            elapsed = clock.perf_counter() - began
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            elif i >= warmup:
+                latencies.append(elapsed)
+                statements.append(counter.n)
+            if response.status_code != sc['status']:
+                errors.append(f'{response.status_code} {" ".join(response.get_data(as_text=True).split())[:160]}')
+                break
+            if sc['after']:
+                sc['after'](b, s, response)
+    finally:
+        if sc['teardown']:
+            sc['teardown'](b, s)
+    if errors:
+        return {'error': errors[0]}
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        'queries': max(statements),
+        'peak_kib': peak / 1024,
+    }
+
+def check(result, budget):
+    """Budget violations of one route."""
+    if 'error' in result:
+        return [f'expected another status, got {result["error"]}']
+    if budget is None:
+        return ['no budget (run with --write-budgets)']
+    problems = []
+    if result['queries'] > budget['queries']:
+        problems.append(f'{result["queries"]} statements > budget {budget["queries"]}')
+    if result['p95_ms'] > budget['p95_ms'] * (1 + args.latency_threshold):
+        problems.append(f'p95 {result["p95_ms"]:.1f} ms > budget {budget["p95_ms"]} ms +{args.latency_threshold:.0%}')
+    return problems
+
+def main():
+    prepare()
+    b = Bench()
+    fixtures(b)
+    with app.app_context():
+        counter = StatementCounter(db.engine)
+
+    scenarios = [sc for sc in SCENARIOS if not args.only or args.only in sc['name']]
+    missing = [] if args.only else uncovered()
+    budgets = {}
+    if os.path.exists(args.budgets):
+        with open(args.budgets) as f:
+            budgets = json.load(f)
+
+    print(f'{args.repeat} requests per route after {args.warmup} warm-up; p95 threshold +{args.latency_threshold:.0%}')
+    print(f'{"route":66} {"p50 ms":>8} {"p95 ms":>8} {"SQL":>4} {"peak KiB":>9}')
+    results, failed = {}, bool(missing)
+    for sc in scenarios:
+        result = results[sc['name']] = measure(b, counter, sc)
+        problems = [] if args.write_budgets and 'error' not in result else check(result, budgets.get(sc['name']))
+        failed = failed or bool(problems)
+        if 'error' in result:
+            print(f'{sc["name"]:66} FAILED')
+        else:
+            print(f'{sc["name"]:66} {result["p50_ms"]:8.1f} {result["p95_ms"]:8.1f} {result["queries"]:4} {result["peak_kib"]:9.0f}')
+        for problem in problems:
+            print(f'    ! {problem}')
+    for method, rule in missing:
+        print(f'no scenario for {method} {rule}')
+
+    if args.write_budgets:
+        for name, result in results.items():
+            if 'error' not in result:
+                # Latency budgets below 20 ms would only measure noise
+                budgets[name] = {'queries': result['queries'], 'p95_ms': max(20, math.ceil(result['p95_ms']))}
+        with open(args.budgets, 'w') as f:
+            json.dump(dict(sorted(budgets.items())), f, indent=2)
+            f.write('\n')
+        print(f'budgets written to {args.budgets}')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Shows how the curated indexes change the plan and timing of the hot query
+shapes behind each endpoint.
+
+    python -m benchmarks.index_plans --db sqlite:////tmp/curanet-bench.db
+
+The database is filled with synthetic rows on first use. Each query is planned
+and timed with the declared indexes dropped, then again after ensure_indexes().
+Works against PostgreSQL too by passing its URL.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time as clock
+from datetime import date, time, timedelta
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='sqlite:////tmp/curanet-bench.db')
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--appointments', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+args = parse_args()
+os.environ['DATABASE_URL'] = args.db
+
+from sqlalchemy import func, insert, select, text
+from backend.app import app
+from backend.createData import seed
+from backend.extensions import db
+from backend.indexes import ensure_indexes
+from backend.models import User, UserRoles, Role, Doctor, Patient, Appointment, DoctorAvailability
+
+def fill(conn):
+    if conn.scalar(select(func.count()).select_from(Appointment)) >= args.appointments:
+        return
+    rng = random.Random(42)
+    today = date.today()
+    doctor_role = conn.scalar(select(Role.id).where(Role.name == 'doctor'))
+    patient_role = conn.scalar(select(Role.id).where(Role.name == 'patient'))
+    first_user = (conn.scalar(select(func.max(User.id))) or 0) + 1
+    users = [{'id': first_user + i, 'email': f'bench{first_user + i}@example.com', 'name': f'Bench User {i}',
+              'password': 'x', 'fs_uniquifier': f'bench-{first_user + i}', 'active': True}
+             for i in range(args.doctors + args.patients)]
+    conn.execute(insert(User), users)
+    doctor_users = [u['id'] for u in users[:args.doctors]]
+    patient_users = [u['id'] for u in users[args.doctors:]]
+    conn.execute(insert(UserRoles), [{'user_id': u, 'role_id': doctor_role} for u in doctor_users]
+                 + [{'user_id': u, 'role_id': patient_role} for u in patient_users])
+    first_doctor = (conn.scalar(select(func.max(Doctor.id))) or 0) + 1
+    conn.execute(insert(Doctor), [{'id': first_doctor + i, 'user_id': u, 'specialization': rng.choice(['Cardiology', 'Neurology', 'Orthopedics', 'Pediatrics']),
+                                   'department_id': rng.randint(1, 4), 'qualification': 'MD', 'experience': '5', 'bio': 'Bench',
+                                   'is_active': rng.random() > 0.1} for i, u in enumerate(doctor_users)])
+    first_patient = (conn.scalar(select(func.max(Patient.id))) or 0) + 1
+    conn.execute(insert(Patient), [{'id': first_patient + i, 'user_id': u, 'date_of_birth': date(1990, 1, 1), 'gender': 'Female',
+                                    'blood_group': 'A+', 'is_active': rng.random() > 0.1} for i, u in enumerate(patient_users)])
+    doctors = range(first_doctor, first_doctor + args.doctors)
+    conn.execute(insert(DoctorAvailability), [{'doctor_id': d, 'date': today + timedelta(days=day), 'start_time': time(h), 'end_time': time(h + 1),
+                                               'is_available': True} for d in doctors for day in range(1, 15) for h in range(9, 17)])
+    seen, rows = set(), []
+    while len(rows) < args.appointments:
+        key = (rng.choice(doctors), today + timedelta(days=rng.randint(-700, 30)), time(rng.randint(0, 23), rng.choice([0, 15, 30, 45])))
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.append({'doctor_id': key[0], 'date': key[1], 'time': key[2], 'patient_id': rng.randint(first_patient, first_patient + args.patients - 1),
+                     'status': 'Booked' if key[1] >= today else rng.choice(['Completed', 'Completed', 'Cancelled'])})
+    for i in range(0, len(rows), 10000):
+        conn.execute(insert(Appointment), rows[i:i + 10000])
+
+def shapes(conn):
+    today = date.today()
+    doctor_id = conn.scalar(select(Appointment.doctor_id).group_by(Appointment.doctor_id).order_by(func.count().desc()).limit(1))
+    patient_id = conn.scalar(select(Appointment.patient_id).group_by(Appointment.patient_id).order_by(func.count().desc()).limit(1))
+    user_id = conn.scalar(select(Patient.user_id).where(Patient.id == patient_id))
+    return [
+        ('GET /api/admin/dashboard (upcoming)', select(func.count()).select_from(Appointment).where(Appointment.date >= today, Appointment.status == 'Booked')),
+        ('GET /api/admin/appointments', select(Appointment.id).order_by(Appointment.date.desc(), Appointment.time.desc(), Appointment.id.desc()).limit(100)),
+        ('GET /api/admin/patients', select(Patient.id).where(Patient.is_active == True).order_by(Patient.id).limit(100)),
+        ('GET /api/admin/doctors (by department)', select(Doctor.id).where(Doctor.is_active == True, Doctor.department_id == 2)),
+        ('GET /api/doctor/dashboard (week)', select(func.count()).select_from(Appointment).where(
+            Appointment.doctor_id == doctor_id, Appointment.date >= today, Appointment.date <= today + timedelta(days=7), Appointment.status == 'Booked')),
+        ('GET /api/doctor/appointments', select(Appointment.id).where(Appointment.doctor_id == doctor_id, Appointment.date >= today).order_by(Appointment.date, Appointment.time)),
+        ('GET /api/patient/dashboard (upcoming)', select(Appointment.id).where(Appointment.patient_id == patient_id, Appointment.date >= today, Appointment.status == 'Booked')),
+        ('GET /api/patient/appointments', select(Appointment.id).where(Appointment.patient_id == patient_id).order_by(Appointment.date.desc(), Appointment.time.desc(), Appointment.id.desc()).limit(100)),
+        ('GET /api/patient/doctors (open slots)', select(DoctorAvailability.id).where(
+            DoctorAvailability.doctor_id == doctor_id, DoctorAvailability.date >= today, DoctorAvailability.is_available == True)),
+        ('auth role lookup', select(UserRoles.role_id).where(UserRoles.user_id == user_id)),
+    ]
+
+def explain(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'sqlite':
+        return ' | '.join(row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql))
+    return ' | '.join(row[0].strip() for row in conn.exec_driver_sql('EXPLAIN ' + sql))
+
+def timed(conn, stmt):
+    samples = []
+    for _ in range(args.repeat):
+        start = clock.perf_counter()
+        conn.execute(stmt).all()
+        samples.append(clock.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def measure(conn):
+    return {name: (explain(conn, stmt), timed(conn, stmt)) for name, stmt in shapes(conn)}
+
+def main():
+    with app.app_context():
+        seed()
+        with db.engine.begin() as conn:
+            fill(conn)
+        declared = [ix for table in db.metadata.sorted_tables for ix in table.indexes]
+        with db.engine.begin() as conn:
+            for ix in declared:
+                conn.execute(text(f'DROP INDEX IF EXISTS {ix.name}'))
+            if conn.dialect.name == 'sqlite':
+                conn.exec_driver_sql('ANALYZE')
+        with db.engine.connect() as conn:
+            before = measure(conn)
+        ensure_indexes()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+        with db.engine.connect() as conn:
+            after = measure(conn)
+    for name in before:
+        plan_before, ms_before = before[name]
+        plan_after, ms_after = after[name]
+        print(f'{name}\n  without: {ms_before:8.2f} ms  {plan_before}\n  with:    {ms_after:8.2f} ms  {plan_after}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Serializing and encoding appointment rows: strftime plus Flask's stdlib
+JSON provider against the cached formatters plus FastJSONProvider.
+
+    python -m benchmarks.json_encoding --rows 100000
+
+The rows are plain objects shaped like the ORM ones, so only formatting and
+encoding are timed. Each stage runs --repeat times and the best run counts;
+the two pipelines must produce the same JSON document.
+"""
+import argparse
+import json
+import random
+import sys
+import time as clock
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+from flask.json.provider import DefaultJSONProvider
+from backend.app import app
+from backend import jsonProvider, serializers
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+def rows(n):
+    rng = random.Random(1)
+    user = lambda i: SimpleNamespace(name=f'Person {i}', email=f'person{i}@example.com')
+    doctors = [SimpleNamespace(user=user(i), specialization='Cardiology') for i in range(200)]
+    patients = [SimpleNamespace(user=user(i)) for i in range(5000)]
+    first_day = date(2025, 1, 1)
+    slots = [time(hour, minute) for hour in range(9, 17) for minute in (0, 30)]
+    created = datetime(2024, 12, 1)
+    return [SimpleNamespace(
+        id=i, patient_id=i % 5000, doctor_id=i % 200, patient=rng.choice(patients), doctor=rng.choice(doctors),
+        date=first_day + timedelta(days=rng.randrange(365)), time=rng.choice(slots), status='Booked', reason='Checkup',
+        created_at=created + timedelta(seconds=rng.randrange(30000000))
+    ) for i in range(n)]
+
+def legacy_admin_appointment(apt):
+    """serializers.admin_appointment as it was, with strftime."""
+    return {
+        'id': apt.id,
+        'patient_id': apt.patient_id,
+        'patient_name': apt.patient.user.name,
+        'patient_email': apt.patient.user.email,
+        'doctor_id': apt.doctor_id,
+        'doctor_name': apt.doctor.user.name,
+        'doctor_specialization': apt.doctor.specialization,
+        'date': apt.date.strftime('%Y-%m-%d'),
+        'time': apt.time.strftime('%H:%M'),
+        'status': apt.status,
+        'reason': apt.reason,
+        'created_at': apt.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        began = clock.perf_counter()
+        result = fn()
+        times.append(clock.perf_counter() - began)
+    return min(times), result
+
+def main():
+    args = parse_args()
+    stdlib, fast = DefaultJSONProvider(app), app.json
+    # Compact, as out of debug mode
+    stdlib.compact = fast.compact = True
+    appointments = rows(args.rows)
+    print(f'{args.rows} rows, best of {args.repeat}; FastJSONProvider encodes with '
+          + ('orjson' if jsonProvider.orjson else 'json (orjson is not installed)'))
+
+    results = {}
+    for name, dump, provider in (('strftime + json', legacy_admin_appointment, stdlib),
+                                 ('cached + FastJSONProvider', serializers.admin_appointment.dump, fast)):
+        serializers.format_date.cache_clear()
+        serializers.format_time.cache_clear()
+        serialize, dicts = best(lambda: [dump(apt) for apt in appointments], args.repeat)
+        with app.app_context():
+            encode, response = best(lambda: provider.response(dicts), args.repeat)
+        results[name] = response.get_data()
+        print(f'{name:28} serialize {serialize * 1000:7.1f} ms   encode {encode * 1000:7.1f} ms   '
+              f'total {(serialize + encode) * 1000:7.1f} ms   {(serialize + encode) / args.rows * 1e6:5.2f} us/row')
+
+    old, new = results.values()
+    if json.loads(old) != json.loads(new):
+        print('the two pipelines produced different documents')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Login burst: N clients log in back to back while one client keeps reading
+its profile, to see what password hashing does to the rest of the app.
+
+    python -m benchmarks.login_throughput --db sqlite:////tmp/curanet-login.db --clients 32 --seconds 10
+    python -m benchmarks.login_throughput --workers 0      # hash inline, as before the pool
+
+Prints logins per second (in total and per core used for hashing), login
+latency, how many logins were turned away with 503, and the latency of the
+profile reads that ran during the burst. --rounds sets BCRYPT_ROUNDS.
+"""
+import argparse
+import os
+import sys
+import threading
+import time as clock
+from collections import Counter
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='sqlite:////tmp/curanet-login.db')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=None, help='PASSWORD_HASH_WORKERS (0 = inline)')
+    parser.add_argument('--queue', type=int, default=None, help='PASSWORD_HASH_QUEUE')
+    parser.add_argument('--rounds', type=int, default=None, help='BCRYPT_ROUNDS')
+    return parser.parse_args()
+
+args = parse_args()
+os.environ['DATABASE_URL'] = args.db
+for name, value in (('PASSWORD_HASH_WORKERS', args.workers), ('PASSWORD_HASH_QUEUE', args.queue), ('BCRYPT_ROUNDS', args.rounds)):
+    if value is not None:
+        os.environ[name] = str(value)
+
+from backend.app import app
+from backend.createData import seed
+from backend.passwords import password_hasher
+
+EMAIL, PASSWORD = 'ram@gmail.com', 'ram123'
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float('nan')
+
+def main():
+    with app.app_context():
+        seed()
+    # Log in once so the stored hash already has the configured cost
+    token = app.test_client().post('/api/login', json={'email': EMAIL, 'password': PASSWORD}).json['auth_token']
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    statuses = Counter()
+    login_times, probe_times = [], []
+
+    def login_client():
+        http = app.test_client(use_cookies=False)
+        while not stop.is_set():
+            began = clock.perf_counter()
+            response = http.post('/api/login', json={'email': EMAIL, 'password': PASSWORD})
+            with lock:
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    login_times.append(clock.perf_counter() - began)
+            if response.status_code == 503:
+                stop.wait(float(response.headers.get('Retry-After', 1)))
+
+    def probe_client():
+        http = app.test_client(use_cookies=False)
+        while not stop.is_set():
+            began = clock.perf_counter()
+            http.get('/api/patient/profile', headers={'Auth-Token': token})
+            probe_times.append(clock.perf_counter() - began)
+            clock.sleep(0.05)
+
+    threads = [threading.Thread(target=login_client) for _ in range(args.clients)] + [threading.Thread(target=probe_client)]
+    began = clock.perf_counter()
+    for thread in threads:
+        thread.start()
+    clock.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = clock.perf_counter() - began
+
+    cores = min(password_hasher.workers or os.cpu_count() or 1, os.cpu_count() or 1)
+    rate = statuses[200] / elapsed
+    mode = f'{password_hasher.workers} hash workers, queue {password_hasher.queue_limit}' if password_hasher.workers else 'inline hashing'
+    print(f'{args.clients} clients, {mode}, bcrypt rounds {app.config["SECURITY_PASSWORD_HASH_PASSLIB_OPTIONS"]["bcrypt__rounds"]}, {elapsed:.1f}s')
+    print(f'logins: {rate:.1f}/s ({rate / cores:.1f}/s per core, {cores} core(s)), '
+          f'p50 {percentile(login_times, 0.5):.0f} ms, p95 {percentile(login_times, 0.95):.0f} ms')
+    print('responses:', dict(sorted(statuses.items())))
+    print(f'profile reads during the burst: {len(probe_times)}, '
+          f'p50 {percentile(probe_times, 0.5):.1f} ms, p95 {percentile(probe_times, 0.95):.1f} ms')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Times the admin patient search through the search index against the plain
+ILIKE scan it replaces.
+
+    python -m benchmarks.patient_search --db sqlite:////tmp/curanet-search.db --patients 1000000
+
+Synthetic patients are inserted on first use (bulk inserts bypass the flush
+events, so the index is rebuilt afterwards).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time as clock
+from datetime import date
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='sqlite:////tmp/curanet-search.db')
+    parser.add_argument('--patients', type=int, default=200000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+args = parse_args()
+os.environ['DATABASE_URL'] = args.db
+
+from sqlalchemy import func, insert, or_, select
+from backend.app import app
+from backend.createData import seed
+from backend.extensions import db
+from backend.models import User, Patient
+from backend.searchIndex import rebuild_search_index, search_patients
+
+FIRST = ['Aarav', 'Vivaan', 'Aditya', 'Ishaan', 'Ananya', 'Diya', 'Saanvi', 'Meera', 'Rohan', 'Kavya', 'Arjun', 'Priya']
+LAST = ['Sharma', 'Verma', 'Gupta', 'Iyer', 'Reddy', 'Nair', 'Patel', 'Singh', 'Das', 'Menon', 'Kapoor', 'Joshi']
+TERMS = ['meera', 'Priya Nair', 'kapo', 'patient12345', '98450']
+
+def fill():
+    with db.engine.begin() as conn:
+        have = conn.scalar(select(func.count()).select_from(Patient))
+        if have >= args.patients:
+            return False
+        rng = random.Random(7)
+        first_user = (conn.scalar(select(func.max(User.id))) or 0) + 1
+        for start in range(have, args.patients, 20000):
+            ids = range(first_user + start, first_user + min(start + 20000, args.patients))
+            conn.execute(insert(User), [{
+                'id': i, 'email': f'patient{i}@example.com', 'name': f'{rng.choice(FIRST)} {rng.choice(LAST)}',
+                'password': 'x', 'fs_uniquifier': f'search-{i}', 'active': True, 'phone': f'9{rng.randrange(10 ** 9):09d}'
+            } for i in ids])
+            conn.execute(insert(Patient), [{'user_id': i, 'date_of_birth': date(1990, 1, 1), 'gender': 'Female', 'blood_group': 'A+', 'is_active': True} for i in ids])
+    return True
+
+def scan(term, limit):
+    return [patient_id for (patient_id,) in db.session.query(Patient.id).join(User, User.id == Patient.user_id).filter(
+        Patient.is_active == True,
+        or_(User.name.ilike(f'%{term}%'), User.email.ilike(f'%{term}%'), User.phone.ilike(f'%{term}%'))
+    ).limit(limit)]
+
+def timed(fn, term):
+    samples = []
+    for _ in range(args.repeat):
+        start = clock.perf_counter()
+        found = fn(term, args.limit)
+        samples.append(clock.perf_counter() - start)
+    return statistics.median(samples) * 1000, len(found)
+
+def main():
+    with app.app_context():
+        seed()
+        if fill():
+            rebuild_search_index()
+        for term in TERMS:
+            ms_scan, n_scan = timed(scan, term)
+            ms_index, n_index = timed(search_patients, term)
+            print(f'{term!r:16} ilike scan: {ms_scan:8.2f} ms ({n_scan} rows)   index: {ms_index:8.2f} ms ({n_index} rows)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""What it costs to bring the backend up, in fresh interpreters.
+
+    python -m benchmarks.startup_time --db sqlite:////tmp/curanet-startup.db --repeat 5
+
+Reports the median of --repeat runs for: importing the dependencies, importing
+backend.app (which builds the module-level app), building another app with
+create_app() (what a test does), the first request it serves, and `flask seed`
+on a fresh and on an already seeded database. Seeding is not part of startup;
+it is shown for comparison.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='sqlite:////tmp/curanet-startup.db')
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+# Runs in a child interpreter and prints its timings as JSON
+CHILD = r'''
+import json, sys, time as clock
+began = clock.perf_counter()
+import flask, flask_security, sqlalchemy, celery
+import backend.extensions, backend.models
+deps = clock.perf_counter()
+from backend.app import create_app
+imported = clock.perf_counter()
+app = create_app()
+built = clock.perf_counter()
+app.test_client().post('/api/login', json={'email': 'nobody@example.com', 'password': 'x'})
+served = clock.perf_counter()
+seeded = served
+if sys.argv[1] == 'seed':
+    from backend.createData import seed
+    with app.app_context():
+        seed()
+    seeded = clock.perf_counter()
+print(json.dumps({'dependencies': deps - began, 'import backend.app': imported - deps,
+                  'create_app()': built - imported, 'first request': served - built, 'seed': seeded - served}))
+'''
+
+def child(db, mode):
+    env = dict(os.environ, DATABASE_URL=db)
+    out = subprocess.run([sys.executable, '-c', CHILD, mode], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def median(runs, key):
+    return statistics.median(run[key] for run in runs) * 1000
+
+def main():
+    args = parse_args()
+    child(args.db, 'seed')  # the first request needs the tables
+    runs = [child(args.db, 'start') for _ in range(args.repeat)]
+    print(f'startup, median of {args.repeat} fresh interpreters:')
+    for key in ('dependencies', 'import backend.app', 'create_app()', 'first request'):
+        print(f'  {key:18} {median(runs, key):8.1f} ms')
+
+    seeded = [child(args.db, 'seed')['seed'] for _ in range(args.repeat)]
+    fresh = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.repeat):
+            fresh.append(child(f'sqlite:///{tmp}/fresh-{i}.db', 'seed')['seed'])
+    print('flask seed (not part of startup):')
+    print(f'  {"seeded database":18} {statistics.median(seeded) * 1000:8.1f} ms')
+    print(f'  {"fresh database":18} {statistics.median(fresh) * 1000:8.1f} ms')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
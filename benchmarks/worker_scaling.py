@@ -0,0 +1,122 @@
+"""Throughput of the API under gunicorn for several worker layouts.
+
+    python -m benchmarks.worker_scaling --db sqlite:////tmp/curanet-scaling.db
+    python -m benchmarks.worker_scaling --configs sync:1x1 sync:4x1 gthread:1x8 gthread:4x8 gevent:4x50
+
+Each config is CLASS:WORKERSxTHREADS (for gevent, the second number is
+worker_connections; gevent layouts need requirements-gevent.txt). Every layout is started from gunicorn.conf.py with
+--preload where the class allows it, then --clients keep-alive clients read
+the patient dashboard and doctor list as fast as they can for --seconds.
+Prints requests/s, latency and any non-200 answers per layout.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time as clock
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ['/api/patient/dashboard', '/api/patient/doctors']
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='sqlite:////tmp/curanet-scaling.db')
+    parser.add_argument('--configs', nargs='+', default=['sync:1x1', 'sync:4x1', 'gthread:1x4', 'gthread:4x4', 'gevent:4x50'])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    return parser.parse_args()
+
+def request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                 headers={'Content-Type': 'application/json', **(headers or {})})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+def wait_until_up(port, server, timeout=30):
+    deadline = clock.monotonic() + timeout
+    while clock.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {server.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            clock.sleep(0.1)
+    raise RuntimeError('gunicorn did not start')
+
+def run(config, args):
+    worker_class, layout = config.split(':')
+    workers, per_worker = layout.split('x')
+    env = dict(os.environ, DATABASE_URL=args.db, GUNICORN_BIND=f'127.0.0.1:{args.port}', GUNICORN_WORKER_CLASS=worker_class,
+               GUNICORN_WORKERS=workers, GUNICORN_THREADS=per_worker, GUNICORN_WORKER_CONNECTIONS=per_worker, GUNICORN_ACCESS_LOG='')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn'], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(args.port, server)
+        conn = http.client.HTTPConnection('127.0.0.1', args.port)
+        status, body = request(conn, 'POST', '/api/login', {'email': 'ram@gmail.com', 'password': 'ram123'})
+        headers = {'Auth-Token': json.loads(body)['auth_token']}
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        statuses = Counter()
+        latencies = []
+
+        def client(i):
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=30)
+            n = i
+            while not stop.is_set():
+                began = clock.perf_counter()
+                try:
+                    status, _ = request(conn, 'GET', PATHS[n % len(PATHS)], headers=headers)
+                except (OSError, http.client.HTTPException):
+                    status = 'error'
+                    conn.close()
+                    conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=30)
+                with lock:
+                    statuses[status] += 1
+                    latencies.append(clock.perf_counter() - began)
+                n += 1
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+        began = clock.perf_counter()
+        for thread in threads:
+            thread.start()
+        clock.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = clock.perf_counter() - began
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    return {
+        'rps': statuses[200] / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[int(len(latencies) * 0.95)] * 1000,
+        'other': {str(k): v for k, v in statuses.items() if k != 200}
+    }
+
+def main():
+    args = parse_args()
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'backend.app', 'seed'], cwd=ROOT,
+                   env=dict(os.environ, DATABASE_URL=args.db), check=True, capture_output=True)
+    print(f'{args.clients} clients, {args.seconds:.0f}s per layout, {os.cpu_count()} CPU(s)')
+    failed = False
+    for config in args.configs:
+        result = run(config, args)
+        failed = failed or bool(result['other'])
+        print(f'{config:14} {result["rps"]:8.1f} req/s   p50 {result["p50"]:6.1f} ms   p95 {result["p95"]:6.1f} ms'
+              + (f'   non-200: {result["other"]}' if result['other'] else ''))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
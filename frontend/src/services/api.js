@@ -16,6 +16,17 @@ function removeAuthToken() {
   localStorage.removeItem('user')
 }
 
+// List endpoints answer one page at a time and send X-Next-Cursor while more
+// rows follow. Fetches the page of `url` that starts at `cursor` (null for the
+// first) and returns its items with the cursor of the page after it, if any.
+export async function fetchPage(url, options = {}, cursor = null) {
+  const pageUrl = new URL(url, window.location.origin)
+  if (cursor) pageUrl.searchParams.set('cursor', cursor)
+  const response = await fetch(pageUrl, options)
+  if (!response.ok) return { response, items: [], nextCursor: null }
+  return { response, items: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') }
+}
+
 // Helper function to make API requests
 async function apiRequest(endpoint, options = {}) {
   const token = getAuthToken()
@@ -51,16 +62,37 @@ async function apiRequest(endpoint, options = {}) {
   }
 }
 
+// apiRequest for paginated list endpoints: returns { items, nextCursor } of
+// the page starting at `cursor`
+async function apiRequestPage(endpoint, cursor = null, options = {}) {
+  const token = getAuthToken()
+  const headers = {
+    'Content-Type': 'application/json',
+    ...options.headers
+  }
+
+  if (token) {
+    headers['Authorization'] = `Bearer ${token}`
+  }
+
+  const { response, items, nextCursor } = await fetchPage(`${API_BASE_URL}${endpoint}`, { ...options, headers }, cursor)
+  if (!response.ok) {
+    const data = await response.json()
+    throw new Error(data.message || `Request failed with status ${response.status}`)
+  }
+  return { items, nextCursor }
+}
+
 export const adminAPI = {
   getDashboard: () => 
     fetch('/api/admin/dashboard'),
 
   // Logic: If search exists, hit the search endpoint; otherwise get all
-  getDoctors: (search = '') => {
+  getDoctors: (search = '', cursor = null) => {
     if (search) {
       return apiRequest(`/api/admin/search?type=doctor&q=${encodeURIComponent(search)}`);
     }
-    return apiRequest('/api/admin/doctors');
+    return apiRequestPage('/api/admin/doctors', cursor);
   },
 
   getDoctor: (id) => 
@@ -84,11 +116,11 @@ export const adminAPI = {
     }),
 
   // Logic: If search exists, hit the search endpoint; otherwise get all
-  getPatients: (search = '') => {
+  getPatients: (search = '', cursor = null) => {
     if (search) {
       return apiRequest(`/api/admin/search?type=patient&q=${encodeURIComponent(search)}`);
     }
-    return apiRequest('/api/admin/patients');
+    return apiRequestPage('/api/admin/patients', cursor);
   },
 
   getPatient: (id) => 
@@ -105,11 +137,11 @@ export const adminAPI = {
       method: 'DELETE'
     }),
 
-  getAppointments: (status = '', upcoming = false) => {
+  getAppointments: (status = '', upcoming = false, cursor = null) => {
     const params = new URLSearchParams();
     if (status) params.append('status', status);
     if (upcoming) params.append('upcoming', 'true');
-    return apiRequest(`/api/admin/appointments?${params.toString()}`);
+    return apiRequestPage(`/api/admin/appointments?${params.toString()}`, cursor);
   },
 
   // Fixed: Argument should be patientId, and URL matches backend route
@@ -202,12 +234,12 @@ export const patientAPI = {
   getDoctorAvailability: (doctorId) =>
     apiRequest(`/patient/doctors/${doctorId}/availability`),
   
-  getAppointments: (status = '', upcoming = false, past = false) => {
+  getAppointments: (status = '', upcoming = false, past = false, cursor = null) => {
     const params = new URLSearchParams()
     if (status) params.append('status', status)
     if (upcoming) params.append('upcoming', 'true')
     if (past) params.append('past', 'true')
-    return apiRequest(`/patient/appointments?${params.toString()}`)
+    return apiRequestPage(`/patient/appointments?${params.toString()}`, cursor)
   },
   
   bookAppointment: (appointmentData) =>
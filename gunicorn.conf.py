@@ -0,0 +1,41 @@
+# Production server settings, read by `gunicorn` from the working directory:
+#
+#     gunicorn                                      # gthread workers (default)
+#     GUNICORN_WORKER_CLASS=sync gunicorn
+#     GUNICORN_WORKER_CLASS=gevent gunicorn         # needs requirements-gevent.txt
+#
+# Run `flask --app backend.app seed` once before the first start.
+import multiprocessing
+import os
+
+wsgi_app = 'backend.app:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Read by backend.config: caches kept per worker need BUS_REDIS_URL to stay in
+# step once there is more than one
+os.environ['WEB_CONCURRENCY'] = str(workers)
+# gthread: threads per worker; each request still gets its own app context
+# and database session
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+# gevent: concurrent requests per worker. Password hashing (backend.passwords)
+# runs on greenlets there and holds up the worker while it runs, so prefer
+# gthread where logins are frequent.
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+# Load the app once in the master and fork workers from it: faster boots and
+# shared memory. backend.app resets database pools in every forked child.
+# gevent patches the standard library only when a worker boots, which is too
+# late for modules the master already imported, so it loads per worker.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1' and worker_class != 'gevent'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+# Empty GUNICORN_ACCESS_LOG turns the access log off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
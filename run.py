@@ -1,4 +1,8 @@
 from backend.app import app
+from backend.createData import seed
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Development server: create the schema and sample accounts on first run
+    with app.app_context():
+        seed()
+    app.run(debug=True, port=5000)
@@ -0,0 +1,59 @@
+from backend.app import create_app
+from backend.config import LocalDevelopmentConfig
+from backend.createData import seed
+import pytest
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(LocalDevelopmentConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        DEBUG = False
+        SECURITY_PASSWORD_HASH_PASSLIB_OPTIONS = {'bcrypt__rounds': 4}
+        PASSWORD_HASH_WORKERS = 0
+        METRICS_ENABLED = False
+        SLOW_QUERY_MS = 0
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        seed()
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def login(client, email, password):
+    response = client.post('/api/login', json={'email': email, 'password': password})
+    assert response.status_code == 200, response.json
+    return {'Auth-Token': response.json['auth_token']}
+
+def add_doctor(app, email, password='doctor123', department='Neurology'):
+    """Creates an active doctor without schedule templates and returns its id."""
+    from backend.extensions import db
+    from backend.models import Department, Doctor
+    from flask_security import hash_password
+    with app.app_context():
+        user = app.security.datastore.create_user(email=email, name=f'Dr. {email.split("@")[0]}',
+                                                  password=hash_password(password), roles=['doctor'], active=True)
+        db.session.flush()
+        department = Department.query.filter_by(name=department).one()
+        doctor = Doctor(user_id=user.id, specialization=department.name, department_id=department.id,
+                        qualification='MBBS', experience='5', bio=f'{department.name} specialist')
+        db.session.add(doctor)
+        db.session.commit()
+        return doctor.id
+
+def add_patient(app, email, password='patient123'):
+    """Creates an active patient and returns its id."""
+    from backend.extensions import db
+    from backend.models import Patient
+    from flask_security import hash_password
+    from datetime import date
+    with app.app_context():
+        user = app.security.datastore.create_user(email=email, name=email.split('@')[0],
+                                                  password=hash_password(password), roles=['patient'], active=True)
+        db.session.flush()
+        patient = Patient(user_id=user.id, date_of_birth=date(1990, 1, 1), gender='Female', blood_group='A+')
+        db.session.add(patient)
+        db.session.commit()
+        return patient.id
@@ -0,0 +1,50 @@
+from backend.authCache import token_cache
+from backend.extensions import db
+from backend.models import Patient, User
+from conftest import login
+import backend.authCache as auth_cache
+
+def ram_ids(app):
+    with app.app_context():
+        return db.session.query(User.id, Patient.id).join(Patient, Patient.user_id == User.id).filter(User.email == 'ram@gmail.com').one()
+
+def test_deactivating_a_user_drops_their_tokens(app):
+    patient, admin = app.test_client(), app.test_client()
+    headers = login(patient, 'ram@gmail.com', 'ram123')
+    assert patient.get('/api/patient/profile', headers=headers).status_code == 200
+    assert token_cache.get(headers['Auth-Token']) is not None
+
+    _, patient_id = ram_ids(app)
+    response = admin.delete(f'/api/admin/patients/{patient_id}', headers=login(admin, 'admin@gmail.com', 'helloadmin'))
+    assert response.status_code == 200
+    assert token_cache.get(headers['Auth-Token']) is None
+    # Unauthenticated: redirected to the login page
+    assert patient.get('/api/patient/profile', headers=headers).status_code == 302
+
+def test_changing_roles_drops_the_users_tokens(app):
+    client = app.test_client()
+    headers = login(client, 'ram@gmail.com', 'ram123')
+    assert client.get('/api/patient/profile', headers=headers).status_code == 200
+
+    with app.app_context():
+        user = app.security.datastore.find_user(email='ram@gmail.com')
+        app.security.datastore.remove_role_from_user(user, 'patient')
+        db.session.commit()
+    assert token_cache.get(headers['Auth-Token']) is None
+    assert client.get('/api/patient/profile', headers=headers).status_code == 403
+
+def test_logout_drops_the_token(app):
+    client = app.test_client()
+    headers = login(client, 'ram@gmail.com', 'ram123')
+    assert client.get('/api/patient/profile', headers=headers).status_code == 200
+    assert client.post('/api/logout', headers=headers).status_code == 200
+    assert token_cache.get(headers['Auth-Token']) is None
+
+def test_entries_expire_with_the_token(app, monkeypatch):
+    app.config['SECURITY_TOKEN_MAX_AGE'] = 60
+    token = login(app.test_client(), 'ram@gmail.com', 'ram123')['Auth-Token']
+    assert token_cache.get(token) is not None
+
+    now = auth_cache.clock.monotonic()
+    monkeypatch.setattr(auth_cache.clock, 'monotonic', lambda: now + 61)
+    assert token_cache.get(token) is None
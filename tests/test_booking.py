@@ -0,0 +1,67 @@
+from backend.extensions import db
+from backend.models import Appointment, AppointmentDayStat, StatCounter
+from backend.stats import reconcile_stats
+from backend.schedules import horizon_end
+from datetime import timedelta
+from conftest import add_patient, login
+from test_schedules import next_weekday, seeded_doctor
+
+def book(app, client, headers, day, slot):
+    response = client.post('/api/patient/appointments', headers=headers,
+                           json={'doctor_id': seeded_doctor(app), 'date': day.isoformat(), 'time': slot})
+    assert response.status_code == 201, response.json
+    return response.json['appointment_id']
+
+def move(client, headers, appointment_id, day, slot):
+    return client.put(f'/api/patient/appointments/{appointment_id}', headers=headers,
+                      json={'date': day.isoformat(), 'time': slot})
+
+def statuses(app):
+    with app.app_context():
+        return {(row.date, row.time.strftime('%H:%M')): (row.status, row.patient_id) for row in Appointment.query}
+
+def counters(app):
+    with app.app_context():
+        days = {(row.doctor_id, row.date, row.status): row.count for row in AppointmentDayStat.query if row.count}
+        return days, {row.key: row.value for row in StatCounter.query if row.key != 'reconciled_at'}
+
+def test_reschedule_takes_over_a_cancelled_slot(app):
+    other_id = add_patient(app, 'other@example.com')
+    ram, other = app.test_client(), app.test_client()
+    ram_headers, other_headers = login(ram, 'ram@gmail.com', 'ram123'), login(other, 'other@example.com', 'patient123')
+    day = next_weekday(3)
+
+    cancelled = book(app, other, other_headers, day, '11:00')
+    assert other.delete(f'/api/patient/appointments/{cancelled}', headers=other_headers).status_code == 200
+    appointment_id = book(app, ram, ram_headers, day, '09:00')
+
+    response = move(ram, ram_headers, appointment_id, day, '11:00')
+    assert response.status_code == 200, response.json
+    assert response.json['appointment_id'] == cancelled
+    rows = statuses(app)
+    assert rows[(day, '11:00')][0] == 'Booked' and rows[(day, '11:00')][1] != other_id
+    assert rows[(day, '09:00')][0] == 'Cancelled'
+
+    # The freed slot can be booked again
+    book(app, other, other_headers, day, '09:00')
+
+    kept = counters(app)
+    with app.app_context():
+        reconcile_stats()
+    assert counters(app) == kept
+
+def test_reschedule_checks_the_slot_like_a_booking(app):
+    ram, other = app.test_client(), app.test_client()
+    add_patient(app, 'other@example.com')
+    ram_headers, other_headers = login(ram, 'ram@gmail.com', 'ram123'), login(other, 'other@example.com', 'patient123')
+    day = next_weekday(3)
+    appointment_id = book(app, ram, ram_headers, day, '09:00')
+    book(app, other, other_headers, day, '10:00')
+
+    assert move(ram, ram_headers, appointment_id, day, '10:00').status_code == 409
+    assert move(ram, ram_headers, appointment_id, day, '20:00').status_code == 400
+    assert move(ram, ram_headers, appointment_id, day, '09:00').status_code == 400
+    with app.app_context():
+        too_far = horizon_end() + timedelta(days=1)
+    assert move(ram, ram_headers, appointment_id, too_far, '09:00').status_code == 400
+    assert statuses(app)[(day, '09:00')][0] == 'Booked'
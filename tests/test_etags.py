@@ -0,0 +1,100 @@
+from conftest import login
+from test_booking import book, move
+from test_schedules import next_weekday, seeded_doctor
+
+class Watched:
+    """A GET whose ETag is expected to change after every write."""
+
+    def __init__(self, client, headers, path):
+        self.client, self.headers, self.path = client, headers, path
+        self.etag = self._fetch()
+
+    def _fetch(self):
+        response = self.client.get(self.path, headers=self.headers)
+        assert response.status_code == 200, response.json
+        return response.headers['ETag']
+
+    def assert_changed(self):
+        revalidated = self.client.get(self.path, headers=dict(self.headers, **{'If-None-Match': self.etag}))
+        assert revalidated.status_code == 200
+        etag = self._fetch()
+        assert etag != self.etag
+        self.etag = etag
+
+    def assert_unchanged(self):
+        assert self.client.get(self.path, headers=dict(self.headers, **{'If-None-Match': self.etag})).status_code == 304
+
+def test_patient_appointments_change_after_each_write(app):
+    patient, doctor = app.test_client(), app.test_client()
+    headers, doctor_headers = login(patient, 'ram@gmail.com', 'ram123'), login(doctor, 'doctor@gmail.com', 'doctor123')
+    appointments = Watched(patient, headers, '/api/patient/appointments')
+    dashboard = Watched(patient, headers, '/api/patient/dashboard')
+    appointments.assert_unchanged()
+    day = next_weekday(3)
+
+    appointment_id = book(app, patient, headers, day, '09:00')
+    appointments.assert_changed()
+    dashboard.assert_changed()
+
+    appointment_id = move(patient, headers, appointment_id, day, '10:00').json['appointment_id']
+    appointments.assert_changed()
+
+    response = doctor.put(f'/api/doctor/appointments/{appointment_id}', json={'status': 'Completed'}, headers=doctor_headers)
+    assert response.status_code == 200, response.json
+    appointments.assert_changed()
+
+    response = doctor.post('/api/doctor/treatment', json={'appointment_id': appointment_id, 'diagnosis': 'Flu'}, headers=doctor_headers)
+    assert response.status_code == 201
+    appointments.assert_changed()
+    response = doctor.put('/api/doctor/treatment', json={'appointment_id': appointment_id, 'diagnosis': 'Cold'}, headers=doctor_headers)
+    assert response.status_code == 200, response.json
+    appointments.assert_changed()
+
+    other = book(app, patient, headers, day, '11:00')
+    appointments.assert_changed()
+    assert patient.delete(f'/api/patient/appointments/{other}', headers=headers).status_code == 200
+    appointments.assert_changed()
+    appointments.assert_unchanged()
+
+def test_doctor_availability_changes_after_each_write(app):
+    patient, doctor = app.test_client(), app.test_client()
+    headers, doctor_headers = login(patient, 'ram@gmail.com', 'ram123'), login(doctor, 'doctor@gmail.com', 'doctor123')
+    availability = Watched(doctor, doctor_headers, '/api/doctor/availability?days=30')
+    day = next_weekday(3)
+
+    appointment_id = book(app, patient, headers, day, '09:00')
+    availability.assert_changed()
+    assert patient.delete(f'/api/patient/appointments/{appointment_id}', headers=headers).status_code == 200
+    availability.assert_changed()
+
+    slot = {'date': day.isoformat(), 'start_time': '18:00', 'end_time': '19:00'}
+    assert doctor.post('/api/doctor/availability', json={'availabilities': [slot]}, headers=doctor_headers).status_code in (200, 201)
+    availability.assert_changed()
+
+    # Past the 14 days the slot POST above replaced
+    response = doctor.post('/api/doctor/schedule/exceptions', json={'date': next_weekday(20).isoformat()}, headers=doctor_headers)
+    assert response.status_code == 200 and response.json['deleted'], response.json
+    availability.assert_changed()
+    availability.assert_unchanged()
+
+def test_doctor_and_department_lists_change_after_admin_writes(app):
+    patient, admin = app.test_client(), app.test_client()
+    headers, admin_headers = login(patient, 'ram@gmail.com', 'ram123'), login(admin, 'admin@gmail.com', 'helloadmin')
+    dashboard = Watched(patient, headers, '/api/patient/dashboard')
+    appointments = Watched(patient, headers, '/api/patient/appointments')
+
+    response = admin.post('/api/admin/departments', json={'name': 'Dermatology'}, headers=admin_headers)
+    assert response.status_code == 201
+    dashboard.assert_changed()
+    appointments.assert_unchanged()
+
+    response = admin.post('/api/admin/doctors', headers=admin_headers, json={
+        'email': 'new@example.com', 'password': 'doctor123', 'name': 'Dr. New', 'specialization': 'Neurology',
+        'qualification': 'MBBS', 'experience': '3', 'bio': 'Neurologist'})
+    assert response.status_code == 201, response.json
+    dashboard.assert_changed()
+    appointments.assert_changed()
+
+    response = admin.delete(f'/api/admin/doctors/{seeded_doctor(app)}', headers=admin_headers)
+    assert response.status_code == 200, response.json
+    dashboard.assert_changed()
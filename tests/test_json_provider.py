@@ -0,0 +1,22 @@
+from datetime import date, time
+import backend.jsonProvider as json_provider
+import pytest
+
+BODY = {'name': 'Zoë Müller', 'date': date(2024, 5, 6), 'time': time(9, 30), 'b': 1, 'a': [1.5, None]}
+EXPECTED = '{"a":[1.5,null],"b":1,"date":"2024-05-06","name":"Zoë Müller","time":"09:30:00"}'
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def encoder(request, app, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    return app
+
+def test_dumps_writes_non_ascii_unescaped(encoder):
+    assert '"Zoë Müller"' in encoder.json.dumps(BODY)
+    assert encoder.json.loads(encoder.json.dumps(BODY))['date'] == '2024-05-06'
+
+def test_response_body(encoder):
+    with encoder.app_context():
+        response = encoder.json.response(BODY)
+    assert response.get_data() == (EXPECTED + '\n').encode('utf-8')
+    assert response.mimetype == 'application/json'
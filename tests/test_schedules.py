@@ -0,0 +1,79 @@
+from backend.extensions import db
+from backend.models import Doctor, DoctorAvailability
+from backend.schedules import horizon_end
+from datetime import date, time, timedelta
+from conftest import add_doctor, login
+
+def availability(app, doctor_id):
+    with app.app_context():
+        return {(row.date, row.start_time) for row in DoctorAvailability.query.filter_by(doctor_id=doctor_id)}
+
+def next_weekday(after_days):
+    day = date.today() + timedelta(days=after_days)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+def seeded_doctor(app):
+    with app.app_context():
+        return db.session.query(Doctor.id).join(Doctor.user).filter_by(email='doctor@gmail.com').scalar()
+
+def test_doctor_without_templates_keeps_manual_slots(app, client):
+    doctor_id = add_doctor(app, 'manual@example.com')
+    headers = login(client, 'manual@example.com', 'doctor123')
+    day = (date.today() + timedelta(days=2)).isoformat()
+    slots = [{'date': day, 'start_time': f'{hour:02d}:00', 'end_time': f'{hour + 1:02d}:00'} for hour in range(9, 14)]
+    assert client.post('/api/doctor/availability', json={'availabilities': slots}, headers=headers).json['inserted'] == 5
+
+    exception = {'date': (date.today() + timedelta(days=20)).isoformat(), 'reason': 'Leave'}
+    response = client.post('/api/doctor/schedule/exceptions', json=exception, headers=headers)
+    assert response.status_code == 200 and response.json['deleted'] == 0
+    response = client.put('/api/doctor/schedule', json={'templates': []}, headers=headers)
+    assert response.status_code == 200 and response.json['deleted'] == 0
+    assert len(availability(app, doctor_id)) == 5
+
+def test_exception_only_rewrites_template_slots_of_its_day(app, client):
+    doctor_id = seeded_doctor(app)
+    headers = login(client, 'doctor@gmail.com', 'doctor123')
+    day, other_day = next_weekday(3), next_weekday(10)
+    with app.app_context():
+        db.session.add(DoctorAvailability(doctor_id=doctor_id, date=day, start_time=time(18), end_time=time(19)))
+        db.session.commit()
+    before = availability(app, doctor_id)
+
+    response = client.post('/api/doctor/schedule/exceptions', json={'date': day.isoformat()}, headers=headers)
+    assert response.status_code == 200 and response.json['deleted'] == 8
+    after = availability(app, doctor_id)
+    assert {start for slot_day, start in after if slot_day == day} == {time(18)}
+    assert {slot for slot in after if slot[0] == other_day} == {slot for slot in before if slot[0] == other_day}
+
+    exception_id = client.get('/api/doctor/schedule', headers=headers).json['exceptions'][0]['id']
+    response = client.delete(f'/api/doctor/schedule/exceptions/{exception_id}', headers=headers)
+    assert response.status_code == 200 and response.json['inserted'] == 8
+    assert availability(app, doctor_id) == before
+
+def test_template_change_keeps_slots_outside_the_windows(app, client):
+    doctor_id = seeded_doctor(app)
+    headers = login(client, 'doctor@gmail.com', 'doctor123')
+    day = next_weekday(3)
+    with app.app_context():
+        db.session.add(DoctorAvailability(doctor_id=doctor_id, date=day, start_time=time(18), end_time=time(19)))
+        db.session.commit()
+
+    response = client.put('/api/doctor/schedule', json={'templates': []}, headers=headers)
+    assert response.status_code == 200 and response.json['deleted'] > 0
+    assert availability(app, doctor_id) == {(day, time(18))}
+
+def test_requests_never_materialize_past_the_horizon(app, client):
+    doctor_id = seeded_doctor(app)
+    patient = login(client, 'ram@gmail.com', 'ram123')
+    response = client.post('/api/patient/appointments', json={'doctor_id': doctor_id, 'date': '2090-01-02', 'time': '10:00'},
+                           headers=patient)
+    assert response.status_code == 400
+
+    doctor_client = app.test_client()
+    doctor = login(doctor_client, 'doctor@gmail.com', 'doctor123')
+    response = doctor_client.get('/api/doctor/availability?days=36500', headers=doctor)
+    assert response.status_code == 200
+    with app.app_context():
+        assert max(row.date for row in DoctorAvailability.query.filter_by(doctor_id=doctor_id)) <= horizon_end()
@@ -0,0 +1,57 @@
+from backend.extensions import db
+from backend.models import Department, Doctor, ScheduleTemplate
+from backend.schedules import rematerialize
+from backend.slotInventory import slot_inventory
+from flask_security import hash_password
+from sqlalchemy import event
+from datetime import time
+from conftest import login
+
+def add_doctors(app, count):
+    with app.app_context():
+        department = Department.query.filter_by(name='Neurology').one()
+        for n in range(count):
+            user = app.security.datastore.create_user(
+                email=f'doctor{n}@example.com', name=f'Dr. Test {n}', password=hash_password('doctor123'),
+                roles=['doctor'], active=True
+            )
+            db.session.flush()
+            doctor = Doctor(user_id=user.id, specialization='Neurology', department_id=department.id, qualification='MBBS', experience='5', bio='Neurologist')
+            db.session.add(doctor)
+            db.session.flush()
+            for weekday in range(7):
+                db.session.add(ScheduleTemplate(doctor_id=doctor.id, weekday=weekday, start_time=time(9, 0),
+                                                end_time=time(13, 0), slot_minutes=30))
+            db.session.flush()
+            rematerialize(doctor.id)
+        db.session.commit()
+
+def search(app, client, headers):
+    """Returns the doctors listed by a search over a cold slot inventory and
+    the SQL statements it ran."""
+    slot_inventory.invalidate()
+    statements = []
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get('/api/patient/doctors', headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200, response.json
+    return response.json, statements
+
+def test_statement_count_does_not_grow_with_doctors(app, client):
+    headers = login(client, 'ram@gmail.com', 'ram123')
+    # Authenticates the token once, so the counts below cover the search only
+    client.get('/api/patient/doctors', headers=headers)
+
+    doctors, one = search(app, client, headers)
+    assert len(doctors) == 1 and doctors[0]['availability']
+
+    add_doctors(app, 9)
+    doctors, many = search(app, client, headers)
+    assert len(doctors) == 10 and all(doctor['availability'] for doctor in doctors)
+    assert len(many) == len(one), many
@@ -0,0 +1,50 @@
+from backend.extensions import db
+from backend.models import Patient
+from backend.searchIndex import FTS_TABLE, search_patients
+from sqlalchemy import text
+from conftest import add_patient, login
+
+def found(client, headers, term):
+    response = client.get('/api/admin/search', query_string={'type': 'patient', 'q': term}, headers=headers)
+    assert response.status_code == 200, response.json
+    return [patient['id'] for patient in response.json]
+
+def indexed(app, patient_id):
+    with app.app_context():
+        return db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE} WHERE rowid = :id"), {'id': patient_id}).scalar()
+
+def test_new_patients_are_found_by_word_prefixes(app, client):
+    patient_id = add_patient(app, 'zoe.mueller@example.com')
+    headers = login(client, 'admin@gmail.com', 'helloadmin')
+    assert found(client, headers, 'zoe.mue') == [patient_id]
+    assert found(client, headers, 'zo mueller') == [patient_id]
+
+def test_edited_names_are_found(app, client):
+    patient_id = add_patient(app, 'edit@example.com')
+    headers = login(client, 'admin@gmail.com', 'helloadmin')
+    response = client.put(f'/api/admin/patients/{patient_id}', json={'name': 'Kavitha Ramanathan'}, headers=headers)
+    assert response.status_code == 200
+    assert found(client, headers, 'Kavitha') == [patient_id]
+    assert found(client, headers, 'ramanath') == [patient_id]
+
+    # Through the patient's own profile, which only touches the user row
+    patient = app.test_client()
+    patient_headers = login(patient, 'edit@example.com', 'patient123')
+    assert patient.put('/api/patient/profile', json={'name': 'Meera Iyer'}, headers=patient_headers).status_code == 200
+    assert found(client, headers, 'Meera') == [patient_id]
+    assert found(client, headers, 'Kavitha') == []
+
+def test_removed_patients_are_not_found(app, client):
+    patient_id = add_patient(app, 'gone@example.com')
+    headers = login(client, 'admin@gmail.com', 'helloadmin')
+    assert found(client, headers, 'gone') == [patient_id]
+    assert indexed(app, patient_id) == 1
+
+    assert client.delete(f'/api/admin/patients/{patient_id}', headers=headers).status_code == 200
+    assert found(client, headers, 'gone') == []
+
+    with app.app_context():
+        db.session.delete(db.session.get(Patient, patient_id))
+        db.session.commit()
+        assert search_patients('gone', 10) == []
+    assert indexed(app, patient_id) == 0
@@ -0,0 +1,106 @@
+from backend.models import Patient, User, StatCounter, AppointmentDayStat, DoctorPatientStat
+from backend.stats import ALL_DOCTORS, booked_count, reconcile_stats
+from collections import Counter
+from conftest import add_patient, login
+from test_booking import book
+from test_schedules import next_weekday, seeded_doctor
+import pytest
+
+def snapshot(app):
+    with app.app_context():
+        counts = Counter({row.key: row.value for row in StatCounter.query if row.key != 'reconciled_at'})
+        counts.update({(row.doctor_id, row.date, row.status): row.count for row in AppointmentDayStat.query})
+        counts.update({('pair', row.doctor_id, row.patient_id): row.appointments for row in DoctorPatientStat.query})
+        return counts
+
+def changes(before, after):
+    return {key: after[key] - before[key] for key in before.keys() | after.keys() if after[key] != before[key]}
+
+@pytest.fixture
+def users(app):
+    other_id = add_patient(app, 'other@example.com')
+    ram, other, doctor = app.test_client(), app.test_client(), app.test_client()
+    with app.app_context():
+        ram_id = Patient.query.join(User).filter(User.email == 'ram@gmail.com').one().id
+    return {
+        'ram': (ram, login(ram, 'ram@gmail.com', 'ram123'), ram_id),
+        'other': (other, login(other, 'other@example.com', 'patient123'), other_id),
+        'doctor': (doctor, login(doctor, 'doctor@gmail.com', 'doctor123'), seeded_doctor(app)),
+    }
+
+def test_booking_counts_a_booked_appointment(app, users):
+    client, headers, patient_id = users['ram']
+    doctor_id, day = seeded_doctor(app), next_weekday(3)
+    before = snapshot(app)
+    book(app, client, headers, day, '09:00')
+    assert changes(before, snapshot(app)) == {
+        'appointments.total': 1,
+        (doctor_id, day, 'Booked'): 1,
+        (ALL_DOCTORS, day, 'Booked'): 1,
+        ('pair', doctor_id, patient_id): 1,
+    }
+    with app.app_context():
+        assert booked_count(day, day, doctor_id) == 1
+
+def test_cancelling_moves_the_appointment_to_cancelled(app, users):
+    client, headers, _ = users['ram']
+    doctor_id, day = seeded_doctor(app), next_weekday(3)
+    appointment_id = book(app, client, headers, day, '09:00')
+    before = snapshot(app)
+    assert client.delete(f'/api/patient/appointments/{appointment_id}', headers=headers).status_code == 200
+    assert changes(before, snapshot(app)) == {
+        (doctor_id, day, 'Booked'): -1,
+        (ALL_DOCTORS, day, 'Booked'): -1,
+        (doctor_id, day, 'Cancelled'): 1,
+        (ALL_DOCTORS, day, 'Cancelled'): 1,
+    }
+    with app.app_context():
+        assert booked_count(day, day, doctor_id) == 0
+
+def test_rebooking_a_cancelled_slot_moves_it_to_the_new_patient(app, users):
+    ram, ram_headers, ram_id = users['ram']
+    other, other_headers, other_id = users['other']
+    doctor_id, day = seeded_doctor(app), next_weekday(3)
+    appointment_id = book(app, ram, ram_headers, day, '09:00')
+    ram.delete(f'/api/patient/appointments/{appointment_id}', headers=ram_headers)
+    before = snapshot(app)
+    book(app, other, other_headers, day, '09:00')
+    assert changes(before, snapshot(app)) == {
+        (doctor_id, day, 'Cancelled'): -1,
+        (ALL_DOCTORS, day, 'Cancelled'): -1,
+        (doctor_id, day, 'Booked'): 1,
+        (ALL_DOCTORS, day, 'Booked'): 1,
+        ('pair', doctor_id, ram_id): -1,
+        ('pair', doctor_id, other_id): 1,
+    }
+
+def test_status_change_by_the_doctor(app, users):
+    client, headers, _ = users['ram']
+    doctor, doctor_headers, doctor_id = users['doctor']
+    day = next_weekday(3)
+    appointment_id = book(app, client, headers, day, '09:00')
+    before = snapshot(app)
+    response = doctor.put(f'/api/doctor/appointments/{appointment_id}', json={'status': 'Completed'}, headers=doctor_headers)
+    assert response.status_code == 200
+    assert changes(before, snapshot(app)) == {
+        (doctor_id, day, 'Booked'): -1,
+        (ALL_DOCTORS, day, 'Booked'): -1,
+        (doctor_id, day, 'Completed'): 1,
+        (ALL_DOCTORS, day, 'Completed'): 1,
+    }
+
+def test_deactivation_and_counters_match_a_reconcile(app, users):
+    client, headers, patient_id = users['ram']
+    book(app, client, headers, next_weekday(3), '09:00')
+    admin = app.test_client()
+    admin_headers = login(admin, 'admin@gmail.com', 'helloadmin')
+    before = snapshot(app)
+    assert admin.delete(f'/api/admin/patients/{patient_id}', headers=admin_headers).status_code == 200
+    assert admin.delete(f'/api/admin/doctors/{seeded_doctor(app)}', headers=admin_headers).status_code == 200
+    assert changes(before, snapshot(app)) == {'patients.active': -1, 'doctors.active': -1}
+
+    # Counters decremented to zero keep their rows; a reconcile drops them
+    kept = snapshot(app)
+    with app.app_context():
+        reconcile_stats()
+    assert +snapshot(app) == +kept